@@ -0,0 +1,67 @@
+import sys
+import time
+
+from PySide2.QtCore import QCoreApplication, QEventLoop
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneScheduler import ParallelSceneEvaluator
+
+# independent branches of the graph, each BRANCH_LENGTH nodes long
+BRANCH_COUNT = 32
+BRANCH_LENGTH = 4
+# seconds a node waits, standing for I/O or work releasing the GIL
+NODE_WAIT = 0.01
+WORKER_COUNTS = (1, 2, 4, 8, 16, 32)
+
+
+class WaitNode(Node):
+    def __init__(self, scene):
+        super().__init__(scene, "Wait", inputs=[1], outputs=[1])
+
+    def compute(self, inputs):
+        time.sleep(NODE_WAIT)
+        return (inputs[0] or 0) + 1
+
+
+def buildGraph():
+    scene = Scene(headless=True)
+    source = WaitNode(scene)
+    for branch in range(BRANCH_COUNT):
+        previous = source
+        for ix in range(BRANCH_LENGTH):
+            node = WaitNode(scene)
+            Edge(scene, previous.outputs[0], node.inputs[0])
+            previous = node
+    return scene
+
+
+def evaluate(scheduler):
+    loop = QEventLoop()
+    scheduler.finished.connect(loop.quit)
+    scheduler.evaluate()
+    if scheduler.isRunning():
+        loop.exec_()
+    scheduler.finished.disconnect(loop.quit)
+
+
+if __name__ == '__main__':
+    app = QCoreApplication(sys.argv)
+    scene = buildGraph()
+    nodes = scene.nodes
+
+    start = time.perf_counter()
+    scene.evaluator.evaluate()
+    print("%d nodes, serial: %.0f ms" % (
+        len(nodes), (time.perf_counter() - start) * 1000))
+
+    scheduler = ParallelSceneEvaluator(scene)
+    for workers in WORKER_COUNTS:
+        scheduler.setMaxWorkers(workers)
+        nodes[0].markDirty()
+        start = time.perf_counter()
+        evaluate(scheduler)
+        print("%d nodes, %d threads: %.0f ms" % (
+            len(nodes), workers, (time.perf_counter() - start) * 1000))
+    scheduler.shutdown()
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import tempfile
+
+from PySide2.QtWidgets import QApplication
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+# node counts loaded, every node gets two incoming edges
+NODE_COUNTS = (2500, 5000, 10000)
+
+
+def writeGraph(filename, count):
+    """ Generated headless, only the loading is measured """
+    scene = Scene(headless=True)
+    columns = int(count ** 0.5)
+    nodes = []
+    for ix in range(count):
+        node = Node(scene, "Node %d" % ix, inputs=[0, 1], outputs=[2])
+        node.setPos((ix % columns) * 200, (ix // columns) * 260)
+        nodes.append(node)
+    for ix in range(count):
+        Edge(scene, nodes[ix - 1].outputs[0], nodes[ix].inputs[0])
+        Edge(scene, nodes[ix - 2].outputs[0], nodes[ix].inputs[1])
+    scene.saveToFile(filename, compact=True)
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+
+    directory = tempfile.mkdtemp()
+    for count in NODE_COUNTS:
+        filename = os.path.join(directory, "graph_%d.json" % count)
+        writeGraph(filename, count)
+
+        scene = Scene()
+        start = time.perf_counter()
+        scene.loadFromFile(filename)
+        elapsed = time.perf_counter() - start
+        os.remove(filename)
+
+        print("%d nodes, %d edges: %.0f ms (%.1f us per node)" % (
+            len(scene.nodes), len(scene.edges), elapsed * 1000, elapsed / count * 1e6))
+    os.rmdir(directory)
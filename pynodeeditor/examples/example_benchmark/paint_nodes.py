@@ -0,0 +1,104 @@
+import sys
+import time
+from PySide2.QtWidgets import *
+from PySide2.QtCore import *
+from PySide2.QtGui import *
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeGraphicsNode import QDMGraphicsNode
+
+NODE_COUNT = 1000
+FRAMES = 20
+IMAGE_SIZE = QSize(2000, 1600)
+
+
+def legacyPaint(self, painter, QStyleOptionGraphicsItem, QtWidgets=None):
+    """ QDMGraphicsNode.paint as it was before the chrome paths got shared """
+    path_title = QPainterPath()
+    path_title.setFillRule(Qt.WindingFill)
+    path_title.addRoundedRect(
+        0, 0, self.width, self.title_height, self.edge_size, self.edge_size)
+    path_title.addRect(0, self.title_height -
+                       self.edge_size, self.edge_size, self.edge_size)
+    path_title.addRect(self.width - self.edge_size, self.title_height -
+                       self.edge_size, self.edge_size, self.edge_size)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(self._brush_title)
+    painter.drawPath(path_title.simplified())
+
+    path_content = QPainterPath()
+    path_content.setFillRule(Qt.WindingFill)
+    path_content.addRoundedRect(0, self.title_height, self.width,
+                                self.height - self.title_height, self.edge_size, self.edge_size)
+    path_content.addRect(0, self.title_height,
+                         self.edge_size, self.edge_size)
+    path_content.addRect(self.width - self.edge_size,
+                         self.title_height, self.edge_size, self.edge_size)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(self._brush_background)
+    painter.drawPath(path_content.simplified())
+
+    path_outline = QPainterPath()
+    path_outline.addRoundedRect(
+        0, 0, self.width, self.height, self.edge_size, self.edge_size)
+    painter.setPen(self._pen_default if not self.isSelected()
+                   else self._pen_selected)
+    painter.setBrush(Qt.NoBrush)
+    painter.drawPath(path_outline.simplified())
+
+
+def addLegacyTitle(graphicsNode):
+    title_item = QGraphicsTextItem(graphicsNode)
+    title_item.setDefaultTextColor(graphicsNode._title_color)
+    title_item.setFont(graphicsNode._title_font)
+    title_item.setPos(graphicsNode._padding, 0)
+    title_item.setTextWidth(graphicsNode.width - 2*graphicsNode._padding)
+    title_item.setPlainText(graphicsNode.title)
+
+
+def buildScene(count, legacy):
+    scene = Scene()
+    # measured at full detail, however far the scene is scaled down
+    scene.graphicsScene.lodMediumScale = 0
+    scene.graphicsScene.lodLowScale = 0
+    columns = int(count ** 0.5)
+    for ix in range(count):
+        node = Node(scene, "Node %d" % ix, inputs=[0, 1], outputs=[2])
+        node.setPos((ix % columns) * 200, (ix // columns) * 260)
+        if legacy:
+            addLegacyTitle(node.graphicsNode)
+    return scene
+
+
+def measure(legacy):
+    original_paint = QDMGraphicsNode.paint
+    if legacy:
+        QDMGraphicsNode.paint = legacyPaint
+
+    try:
+        scene = buildScene(NODE_COUNT, legacy)
+        source = scene.graphicsScene.itemsBoundingRect()
+
+        # no view and no event loop, so no content widget gets built: only the node chrome is measured
+        image = QImage(IMAGE_SIZE, QImage.Format_ARGB32_Premultiplied)
+        timings = []
+        for frame in range(FRAMES):
+            painter = QPainter(image)
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+            start = time.perf_counter()
+            scene.graphicsScene.render(painter, QRectF(image.rect()), source)
+            timings.append(time.perf_counter() - start)
+            painter.end()
+        return sorted(timings)[len(timings) // 2]
+    finally:
+        QDMGraphicsNode.paint = original_paint
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+
+    legacy = measure(legacy=True)
+    cached = measure(legacy=False)
+    print("%d nodes, median frame: legacy %.2f ms, cached %.2f ms (%.1fx)" % (
+        NODE_COUNT, legacy * 1000, cached * 1000, legacy / cached))
@@ -16,18 +16,30 @@ class QDMNodeContentWidget(QWidget, Serializable):
 
         self.wdg_label = QLabel("Some Title")
         self.layout.addWidget(self.wdg_label)
-        self.layout.addWidget(QDMTextEdit("foo"))
+        self.wdg_text = QDMTextEdit("foo")
+        self.layout.addWidget(self.wdg_text)
 
     def setEditingFlag(self, value):
         self.node.scene.graphicsScene.views()[0].editingFlag = value
+        if not value:
+            # editing is over, the content may hold new data
+            self.node.scene.history.markChanged(self.node)
+            self.node.markDirty()
 
     def serialize(self):
+        # the widget is released when offscreen and rebuilt from this, see Node.releaseContent
         return OrderedDict([
-
+            ('label', self.wdg_label.text()),
+            ('text', self.wdg_text.toPlainText()),
         ])
 
     def deserialize(self, data, hashmap={}):
-        return False
+        # files saved before the content was serialized keep the defaults
+        if 'label' in data:
+            self.wdg_label.setText(data['label'])
+        if 'text' in data:
+            self.wdg_text.setPlainText(data['text'])
+        return True
 
 
 class QDMTextEdit(QTextEdit):
@@ -1,4 +1,4 @@
-from nodeeditor.NodeGraphicsEdge import *
+from nodeeditor.NodeSocket import *
 
 EDGE_TYPE_DIRECT = 1
 EDGE_TYPE_BEZIER = 2
@@ -13,6 +13,8 @@ class Edge(Serializable):
 
         self._start_socket = None
         self._end_socket = None
+        self._edge_type = None
+        self.graphicsEdge = None
 
         self.start_socket = start_socket
         self.end_socket = end_socket
@@ -30,6 +32,26 @@ class Edge(Serializable):
         # self.scene.graphicsScene.addItem(self.graphicsEdge)
         self.scene.addEdge(self)
 
+    def initGraphics(self):
+        from nodeeditor.NodeGraphicsEdge import QDMGraphicsEdgeDirect, QDMGraphicsEdgeBezier
+        if self.graphicsEdge is not None:
+            self.scene.graphicsScene.removeItem(self.graphicsEdge)
+
+        if self.edge_type == EDGE_TYPE_DIRECT:
+            self.graphicsEdge = QDMGraphicsEdgeDirect(self)
+        elif self.edge_type == EDGE_TYPE_BEZIER:
+            self.graphicsEdge = QDMGraphicsEdgeBezier(self)
+        else:
+            self.graphicsEdge = QDMGraphicsEdgeBezier(self)
+
+        self.scene.graphicsScene.addItem(self.graphicsEdge)
+
+        if self.start_socket is not None:
+            self.updatePositions()
+
+    def onIdChanged(self, old_id):
+        self.scene.onEdgeIdChanged(self, old_id)
+
     def __str__(self):
         return "<Edge %s..%s>" % (hex(id(self))[2:5], hex(id(self))[-3:])
 
@@ -39,12 +61,15 @@ class Edge(Serializable):
 
     @start_socket.setter
     def start_socket(self, value):
+        self._unlinkSockets()
         if self._start_socket is not None:
             self._start_socket.removeEdge(self)
 
         self._start_socket = value
         if self.start_socket is not None:
             self.start_socket.addEdge(self)
+        self._linkSockets()
+        self.scene.history.markChanged(self)
 
     @property
     def end_socket(self):
@@ -52,12 +77,27 @@ class Edge(Serializable):
 
     @end_socket.setter
     def end_socket(self, value):
+        self._unlinkSockets()
         if self._end_socket is not None:
             self._end_socket.removeEdge(self)
 
         self._end_socket = value
         if self.end_socket is not None:
             self.end_socket.addEdge(self)
+        self._linkSockets()
+        self.scene.history.markChanged(self)
+
+    def _linkSockets(self):
+        if self._start_socket is not None and self._end_socket is not None:
+            self._start_socket.addPeer(self._end_socket, self)
+            self._end_socket.addPeer(self._start_socket, self)
+            self.scene.evaluator.onEdgeLinked(self)
+
+    def _unlinkSockets(self):
+        if self._start_socket is not None and self._end_socket is not None:
+            self._start_socket.removePeer(self._end_socket, self)
+            self._end_socket.removePeer(self._start_socket, self)
+            self.scene.evaluator.onEdgeLinked(self)
 
     @property
     def edge_type(self):
@@ -65,36 +105,35 @@ class Edge(Serializable):
 
     @edge_type.setter
     def edge_type(self, value):
-        if hasattr(self, 'graphicsEdge') and self.graphicsEdge is not None:
-            self.scene.graphicsScene.removeItem(self.graphicsEdge)
-
+        changed = value != self._edge_type
         self._edge_type = value
-        if self.edge_type == EDGE_TYPE_DIRECT:
-            self.graphicsEdge = QDMGraphicsEdgeDirect(self)
-        elif self.edge_type == EDGE_TYPE_BEZIER:
-            self.graphicsEdge = QDMGraphicsEdgeBezier(self)
-        else:
-            self.graphicsEdge = QDMGraphicsEdgeBezier(self)
-
-        self.scene.graphicsScene.addItem(self.graphicsEdge)
-
-        if self.start_socket is not None:
-            self.updatePositions()
+        if self.scene.graphicsScene is not None:
+            # a graphics edge of the right type is kept as is
+            if changed or self.graphicsEdge is None:
+                self.initGraphics()
+            elif self.start_socket is not None:
+                self.updatePositions()
+        self.scene.history.markChanged(self)
 
     def updatePositions(self):
-        source_pos = self.start_socket.getSocketPosition()
-        source_pos[0] += self.start_socket.node.graphicsNode.pos().x()
-        source_pos[1] += self.start_socket.node.graphicsNode.pos().y()
+        if self.graphicsEdge is None:
+            return
+        if self.scene.isBulkConstructing():
+            self.scene.deferEdgeUpdate(self)
+            return
+        source_pos = self.start_socket.getScenePosition()
         self.graphicsEdge.setSource(*source_pos)
         if self.end_socket is not None:
-            end_pos = self.end_socket.getSocketPosition()
-            end_pos[0] += self.end_socket.node.graphicsNode.pos().x()
-            end_pos[1] += self.end_socket.node.graphicsNode.pos().y()
-            self.graphicsEdge.setDestination(*end_pos)
+            self.graphicsEdge.setDestination(
+                *self.end_socket.getScenePosition())
         else:
             self.graphicsEdge.setDestination(*source_pos)
         self.graphicsEdge.update()
 
+        rect = self.graphicsEdge.boundingRect()
+        self.scene.edgeIndex.update(
+            self, rect.left(), rect.top(), rect.right(), rect.bottom())
+
     def remove_from_sockets(self):
         self.end_socket = None
         self.start_socket = None
@@ -104,8 +143,10 @@ class Edge(Serializable):
             print("# Removing Edge", self)
             print("- remove edge from all sockets")
         self.remove_from_sockets()
-        self.scene.graphicsScene.removeItem(self.graphicsEdge)
-        self.graphicsEdge = None
+        self.scene.edgeIndex.remove(self)
+        if self.graphicsEdge is not None:
+            self.scene.graphicsScene.removeItem(self.graphicsEdge)
+            self.graphicsEdge = None
         try:
             self.scene.removeEdge(self)
         except ValueError:
@@ -0,0 +1,93 @@
+import math
+
+DEBUG = False
+
+# edges covering more cells than this are kept aside and checked on every query
+EDGE_INDEX_MAX_CELLS = 64
+
+
+class EdgeIndex():
+    """ Uniform grid over the edges' bounding boxes, narrows down the edges near a point or a segment """
+
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.clear()
+
+    def clear(self):
+        # (cell_x, cell_y) -> edges overlapping the cell (dict used as ordered set)
+        self._cells = {}
+        # edge -> cell range it is registered in
+        self._edge_cells = {}
+        self._oversized = {}
+
+    def __len__(self):
+        return len(self._edge_cells)
+
+    def _cellRange(self, left, top, right, bottom):
+        size = self.cell_size
+        return (int(math.floor(left / size)), int(math.floor(top / size)),
+                int(math.floor(right / size)), int(math.floor(bottom / size)))
+
+    def _isOversized(self, cells):
+        return (cells[2] - cells[0] + 1) * (cells[3] - cells[1] + 1) > EDGE_INDEX_MAX_CELLS
+
+    def update(self, edge, left, top, right, bottom):
+        cells = self._cellRange(left, top, right, bottom)
+        old_cells = self._edge_cells.get(edge)
+        if old_cells == cells:
+            return
+        if old_cells is not None:
+            self._unregister(edge, old_cells)
+
+        self._edge_cells[edge] = cells
+        if self._isOversized(cells):
+            self._oversized[edge] = None
+            return
+
+        for cx in range(cells[0], cells[2] + 1):
+            for cy in range(cells[1], cells[3] + 1):
+                self._cells.setdefault((cx, cy), {})[edge] = None
+
+    def remove(self, edge):
+        cells = self._edge_cells.pop(edge, None)
+        if cells is not None:
+            self._unregister(edge, cells)
+
+    def _unregister(self, edge, cells):
+        if self._isOversized(cells):
+            self._oversized.pop(edge, None)
+            return
+
+        for cx in range(cells[0], cells[2] + 1):
+            for cy in range(cells[1], cells[3] + 1):
+                cell = self._cells.get((cx, cy))
+                if cell is None:
+                    continue
+                cell.pop(edge, None)
+                if not cell:
+                    del self._cells[(cx, cy)]
+
+    def query(self, left, top, right, bottom):
+        """ Returns the edges whose cells overlap the given rectangle, each edge once """
+        cells = self._cellRange(left, top, right, bottom)
+        found = dict(self._oversized)
+
+        if self._isOversized(cells):
+            # a huge area, walking the occupied cells is cheaper
+            for (cx, cy), edges in self._cells.items():
+                if cells[0] <= cx <= cells[2] and cells[1] <= cy <= cells[3]:
+                    found.update(edges)
+        else:
+            for cx in range(cells[0], cells[2] + 1):
+                for cy in range(cells[1], cells[3] + 1):
+                    edges = self._cells.get((cx, cy))
+                    if edges:
+                        found.update(edges)
+
+        if DEBUG:
+            print("EdgeIndex::query", cells, "->", len(found), "candidates")
+        return list(found)
+
+    def querySegment(self, p1, p2):
+        return self.query(min(p1.x(), p2.x()), min(p1.y(), p2.y()),
+                          max(p1.x(), p2.x()), max(p1.y(), p2.y()))
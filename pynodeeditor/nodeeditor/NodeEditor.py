@@ -1,8 +1,19 @@
 import os
 import json
+import struct
 from PySide2.QtWidgets import *
 from PySide2.QtCore import *
 from nodeeditor.NodeEditorAppView import NodeEditorAppView
+from nodeeditor.NodeSceneClipboard import CLIPBOARD_MIME_TYPE
+
+# files from this size on (in bytes) are loaded progressively
+PROGRESSIVE_LOAD_SIZE = 1024 * 1024
+# time (ms) between saves of a modified graph to its file, 0 turns autosave off
+AUTOSAVE_INTERVAL = 60 * 1000
+# edits to the open file are journaled next to it, to recover them after a crash
+JOURNAL_ENABLED = True
+# nodes computed at the same time, None for as many as the cores allow
+EVALUATION_THREADS = None
 
 
 class NodeEditor(QMainWindow):
@@ -28,6 +39,15 @@ class NodeEditor(QMainWindow):
         # create node editor widget
         self.nodeeditor = NodeEditorAppView(self)
         self.nodeeditor.scene.addHasBeenModifiedListener(self.setTitle)
+        self.nodeeditor.loader.progress.connect(self.onLoadProgress)
+        self.nodeeditor.loader.finished.connect(self.onLoadFinished)
+        self.nodeeditor.loader.failed.connect(self.onLoadFailed)
+        self.nodeeditor.loader.cancelled.connect(self.onLoadCancelled)
+        self.nodeeditor.saver.saved.connect(self.onFileSaved)
+        self.nodeeditor.saver.failed.connect(self.onFileSaveFailed)
+        self.nodeeditor.setAutosaveInterval(AUTOSAVE_INTERVAL)
+        self.nodeeditor.setJournalEnabled(JOURNAL_ENABLED)
+        self.nodeeditor.setEvaluationThreads(EVALUATION_THREADS)
         self.setCentralWidget(self.nodeeditor)
 
         self.createStatusBar()
@@ -42,6 +62,15 @@ class NodeEditor(QMainWindow):
         self.statusBar().showMessage("")
         self.status_mouse_pos = QLabel("")
         self.statusBar().addPermanentWidget(self.status_mouse_pos)
+
+        self.status_load_progress = QProgressBar()
+        self.status_load_progress.setMaximumWidth(160)
+        self.status_load_progress.setVisible(False)
+        self.statusBar().addPermanentWidget(self.status_load_progress)
+        self.status_load_cancel = QPushButton("Cancel")
+        self.status_load_cancel.setVisible(False)
+        self.status_load_cancel.clicked.connect(self.onLoadCancel)
+        self.statusBar().addPermanentWidget(self.status_load_cancel)
         self.nodeeditor.view.scenePosChanged.connect(self.onScenePosChanged)
 
     def createActions(self):
@@ -68,6 +97,8 @@ class NodeEditor(QMainWindow):
                                 statusTip="Paste from clipboard", triggered=self.onEditPaste)
         self.actDelete = QAction('&Delete', self, shortcut='Del',
                                  statusTip="Delete selected items", triggered=self.onEditDelete)
+        self.actHistoryStats = QAction('&History Memory', self,
+                                       statusTip="Show the memory used by undo history", triggered=self.onEditHistoryStats)
 
     def createMenus(self):
         menubar = self.menuBar()
@@ -90,6 +121,8 @@ class NodeEditor(QMainWindow):
         self.editMenu.addAction(self.actPaste)
         self.editMenu.addSeparator()
         self.editMenu.addAction(self.actDelete)
+        self.editMenu.addSeparator()
+        self.editMenu.addAction(self.actHistoryStats)
 
     def setTitle(self):
         title = "Node Editor - "
@@ -98,6 +131,11 @@ class NodeEditor(QMainWindow):
 
     def closeEvent(self, event):
         if self.maybeSave():
+            self.getCurrentNodeEditorWidget().loader.cancel()
+            # the last save may still be written
+            self.getCurrentNodeEditorWidget().saver.wait()
+            self.getCurrentNodeEditorWidget().closeJournal()
+            self.getCurrentNodeEditorWidget().scheduler.shutdown()
             event.accept()
         else:
             event.ignore()
@@ -128,7 +166,7 @@ class NodeEditor(QMainWindow):
 
     def onFileNew(self):
         if self.maybeSave():
-            self.getCurrentNodeEditorWidget().scene.clear()
+            self.getCurrentNodeEditorWidget().fileNew()
             self.filename = None
             self.setTitle()
 
@@ -139,19 +177,55 @@ class NodeEditor(QMainWindow):
             if fname == '':
                 return
             if os.path.isfile(fname):
-                self.getCurrentNodeEditorWidget().scene.loadFromFile(fname)
+                nodeeditor = self.getCurrentNodeEditorWidget()
+                if os.path.getsize(fname) >= PROGRESSIVE_LOAD_SIZE:
+                    nodeeditor.fileLoadProgressive(fname)
+                    self.showLoadProgress(True)
+                    self.statusBar().showMessage("Loading %s..." % fname)
+                elif not nodeeditor.fileLoad(fname):
+                    return
                 self.filename = fname
                 self.setTitle()
 
+    def showLoadProgress(self, visible):
+        self.status_load_progress.setValue(0)
+        self.status_load_progress.setVisible(visible)
+        self.status_load_cancel.setVisible(visible)
+
+    def onLoadProgress(self, done, total):
+        self.status_load_progress.setMaximum(max(total, 1))
+        self.status_load_progress.setValue(done)
+
+    def onLoadFinished(self):
+        self.showLoadProgress(False)
+        self.statusBar().showMessage("Successfully loaded %s" %
+                                     self.getCurrentNodeEditorWidget().filename, 5000)
+        self.setTitle()
+
+    def onLoadFailed(self, message):
+        self.showLoadProgress(False)
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error loading file", message)
+        self.setTitle()
+
+    def onLoadCancel(self):
+        self.getCurrentNodeEditorWidget().loader.cancel()
+
+    def onLoadCancelled(self):
+        self.showLoadProgress(False)
+        self.statusBar().showMessage("Loading cancelled", 5000)
+        self.setTitle()
+
     def onFileSave(self):
         current_nodeeditor = self.getCurrentNodeEditorWidget()
         if current_nodeeditor is not None:
             if not current_nodeeditor.isFilenameSet():
                 return self.onFileSaveAs()
 
-            current_nodeeditor.fileSave()
-            self.statusBar().showMessage("Successfully saved %s" %
-                                         current_nodeeditor.filename, 5000)
+            if not current_nodeeditor.fileSave():
+                return False
+            self.statusBar().showMessage("Saving %s..." %
+                                         current_nodeeditor.filename)
 
             # support for MDI app
             if hasattr(current_nodeeditor, "setTitle"):
@@ -168,9 +242,10 @@ class NodeEditor(QMainWindow):
             if fname == '':
                 return False
 
-            current_nodeeditor.fileSave(fname)
-            self.statusBar().showMessage("Successfully saved as %s" %
-                                         current_nodeeditor.filename, 5000)
+            if not current_nodeeditor.fileSave(fname):
+                return False
+            self.statusBar().showMessage("Saving %s..." %
+                                         current_nodeeditor.filename)
 
             # support for MDI app
             if hasattr(current_nodeeditor, "setTitle"):
@@ -179,43 +254,87 @@ class NodeEditor(QMainWindow):
                 self.setTitle()
             return True
 
+    def onFileSaved(self, filename):
+        self.statusBar().showMessage("Successfully saved %s" % filename, 5000)
+        # autosaves clear the modified flag too
+        self.setTitle()
+
+    def onFileSaveFailed(self, filename, message):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error saving %s" %
+                            os.path.basename(filename), message)
+        self.setTitle()
+
     def onEditUndo(self):
+        if not self.getCurrentNodeEditorWidget().canEdit():
+            return
         self.getCurrentNodeEditorWidget().scene.history.undo()
 
     def onEditRedo(self):
+        if not self.getCurrentNodeEditorWidget().canEdit():
+            return
         self.getCurrentNodeEditorWidget().scene.history.redo()
 
     def onEditDelete(self):
-        self.getCurrentNodeEditorWidget().scene.grScene.views()[
-            0].deleteSelected()
+        if not self.getCurrentNodeEditorWidget().canEdit():
+            return
+        self.getCurrentNodeEditorWidget().view.deleteSelected()
+
+    def onEditHistoryStats(self):
+        stats = self.getCurrentNodeEditorWidget().scene.history.getMemoryStats()
+        self.statusBar().showMessage(
+            "History: %d stamps, %d KB in memory (%d KB packed), %d KB spilled, %d stamps unpacked" % (
+                stats['stamps'], stats['memory_bytes'] // 1024, stats['packed_bytes'] // 1024,
+                stats['spilled_bytes'] // 1024, stats['unpacked']), 10000)
 
     def onEditCut(self):
+        if not self.getCurrentNodeEditorWidget().canEdit():
+            return
         data = self.getCurrentNodeEditorWidget(
         ).scene.clipboard.serializeSelected(delete=True)
-        str_data = json.dumps(data, indent=4)
-        QApplication.instance().clipboard().setText(str_data)
+        self.setClipboardData(data)
 
     def onEditCopy(self):
         data = self.getCurrentNodeEditorWidget(
         ).scene.clipboard.serializeSelected(delete=False)
-        str_data = json.dumps(data, indent=4)
-        QApplication.instance().clipboard().setText(str_data)
+        self.setClipboardData(data)
 
-    def onEditPaste(self):
-        raw_data = QApplication.instance().clipboard().text()
+    def setClipboardData(self, data):
+        """ Puts the compact payload on the clipboard, with JSON text for other applications """
+        mime_data = QMimeData()
+        mime_data.setData(CLIPBOARD_MIME_TYPE, QByteArray(
+            self.getCurrentNodeEditorWidget().scene.clipboard.encode(data)))
+        mime_data.setText(json.dumps(data, separators=(',', ':')))
+        QApplication.instance().clipboard().setMimeData(mime_data)
 
-        try:
-            data = json.loads(raw_data)
-        except ValueError as e:
-            print("Pasting of not valid json data!", e)
+    def onEditPaste(self):
+        if not self.getCurrentNodeEditorWidget().canEdit():
             return
+        clipboard = self.getCurrentNodeEditorWidget().scene.clipboard
+        mime_data = QApplication.instance().clipboard().mimeData()
+
+        if mime_data.hasFormat(CLIPBOARD_MIME_TYPE):
+            try:
+                data = clipboard.decode(
+                    bytes(mime_data.data(CLIPBOARD_MIME_TYPE)))
+            except (ValueError, struct.error) as e:
+                print("Pasting of not valid clipboard data!", e)
+                return
+        else:
+            raw_data = mime_data.text()
+
+            try:
+                data = json.loads(raw_data)
+            except ValueError as e:
+                print("Pasting of not valid json data!", e)
+                return
 
         # check if the json data are correct
         if 'nodes' not in data:
             print("JSON does not contain any nodes!")
             return
 
-        self.getCurrentNodeEditorWidget().scene.clipboard.deserializeFromClipboard(data)
+        clipboard.deserializeFromClipboard(data)
 
     def readSettings(self):
         settings = QSettings(self.name_company, self.name_product)
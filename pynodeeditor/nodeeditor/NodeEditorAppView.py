@@ -3,10 +3,17 @@ from PySide2.QtWidgets import *
 from PySide2.QtGui import *
 from PySide2.QtCore import *
 
-from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeScene import Scene, InvalidFile
 from nodeeditor.NodeNode import Node
 from nodeeditor.NodeEdge import Edge, EDGE_TYPE_BEZIER
 from nodeeditor.NodeGraphicsView import QDMGraphicsView
+from nodeeditor.NodeSceneLoader import ProgressiveSceneLoader
+from nodeeditor.NodeSceneSaver import BackgroundSceneSaver
+from nodeeditor.NodeSceneJournal import SceneJournal, JOURNAL_SYNC_INTERVAL
+from nodeeditor.NodeSceneScheduler import ParallelSceneEvaluator
+
+# journal size (in bytes) from which it is folded into the scene file by saving it
+JOURNAL_COMPACT_SIZE = 4 * 1024 * 1024
 
 
 class NodeEditorAppView(QWidget):
@@ -32,6 +39,34 @@ class NodeEditorAppView(QWidget):
         self.view = QDMGraphicsView(self.scene.graphicsScene, self)
         self.layout.addWidget(self.view)
 
+        self.loader = ProgressiveSceneLoader(self.scene, self.view, self)
+        self.loader.started.connect(self.onLoadStarted)
+        self.loader.finished.connect(self.onLoadFinished)
+        self.loader.failed.connect(self.onLoadEnded)
+        self.loader.cancelled.connect(self.onLoadEnded)
+
+        self.saver = BackgroundSceneSaver(self.scene, self)
+        self.saver.saved.connect(self.onFileSaved)
+        self.saver.failed.connect(self.onFileSaveFailed)
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+
+        self.journal = SceneJournal(self.scene)
+        self.journal_enabled = False
+        self.scene.history.addHistoryModifiedListener(self.compactJournal)
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setInterval(int(JOURNAL_SYNC_INTERVAL * 1000))
+        self.journal_timer.timeout.connect(self.journal.sync)
+
+        self.scheduler = ParallelSceneEvaluator(self.scene, parent=self)
+        # dirty nodes are computed once the edits of the current event are done
+        self.evaluate_timer = QTimer(self)
+        self.evaluate_timer.setSingleShot(True)
+        self.evaluate_timer.setInterval(0)
+        self.evaluate_timer.timeout.connect(self.evaluate)
+        self.scene.evaluator.addDirtyListener(self.evaluate_timer.start)
+        self.evaluate_timer.start()
+
     def isModified(self):
         return self.scene.isModified()
 
@@ -56,37 +91,138 @@ class NodeEditorAppView(QWidget):
         return name + ("*" if self.isModified() else "")
 
     def fileNew(self):
+        self.journal.discard()
         self.scene.clear()
         self.filename = None
         self.scene.history.clear()
         self.scene.history.storeInitialHistoryStamp()
 
     def fileLoad(self, filename):
-        QApplication.setOverrideCursor(Qt.WaitCursor)
         try:
-            self.scene.loadFromFile(filename)
-            self.filename = filename
-            self.scene.history.clear()
-            self.scene.history.storeInitialHistoryStamp()
-            return True
-        except InvalidFile as e:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.scene.loadFromFile(filename)
+            finally:
+                QApplication.restoreOverrideCursor()
+        except (InvalidFile, OSError) as e:
+            # the scene and the journal of its file are left as they were
             print(e)
-            QApplication.restoreOverrideCursor()
             QMessageBox.warning(self, "Error loading %s" %
                                 os.path.basename(filename), str(e))
             return False
-        finally:
-            QApplication.restoreOverrideCursor()
+
+        self.journal.discard()
+        self.filename = filename
+        self.scene.history.clear()
+        self.scene.history.storeInitialHistoryStamp()
+        self.openJournal()
+        return True
+
+    def fileLoadProgressive(self, filename):
+        """ Starts loading the file while the scene stays in view, see self.loader for progress """
+        self.loader.load(filename)
+        # the view only pans and zooms until the scene is complete, edits would be lost with the
+        # history cleared once loading is over
+        self.view.setInteractive(False)
+        return True
+
+    def isLoading(self):
+        return self.loader.isLoading()
+
+    def canEdit(self):
+        return not self.isLoading()
+
+    def onLoadStarted(self):
+        # the file is parsed, the scene is being replaced with it
+        self.journal.discard()
+        self.filename = None
+
+    def onLoadEnded(self):
+        self.view.setInteractive(True)
+
+    def onLoadFinished(self):
+        self.onLoadEnded()
+        self.filename = self.loader.filename
+        self.openJournal()
+        self.evaluate_timer.start()
+
+    def evaluate(self):
+        # the scene is incomplete while loading, see onLoadFinished
+        if self.isLoading():
+            return
+        self.scheduler.evaluate()
+
+    def setEvaluationThreads(self, count):
+        """ Number of nodes computed at the same time, None for as many as the cores allow """
+        self.scheduler.setMaxWorkers(count)
+
+    def setJournalEnabled(self, enabled):
+        """ Journals the edits to the file of the scene, to get them back if the application does not close """
+        self.journal_enabled = enabled
+        if enabled:
+            self.journal_timer.start()
+            self.openJournal()
+        else:
+            self.journal_timer.stop()
+            self.journal.discard()
+
+    def openJournal(self):
+        """ Starts the journal of the scene file, replaying the edits it holds from a previous session """
+        if not self.journal_enabled or not self.isFilenameSet() or self.journal.isOpen():
+            return
+        if self.journal.open(self.filename):
+            # edits recovered from the journal are not in the file
+            self.scene.history.clear()
+            self.scene.history.storeInitialHistoryStamp()
+            self.scene.has_been_modified = True
+
+    def closeJournal(self):
+        """ The scene is either saved or its edits are no longer wanted """
+        self.journal.discard()
+
+    def compactJournal(self):
+        """ Folds a journal grown too large into the scene file, by saving it """
+        if self.journal.getSize() < JOURNAL_COMPACT_SIZE:
+            return
+        if self.isLoading() or self.saver.isSaving():
+            return
+        self.fileSave()
 
     def fileSave(self, filename=None):
+        """ Starts saving to the file on a worker thread, see self.saver for when it is written """
+        # the scene is incomplete while loading
+        if self.isLoading():
+            return False
         # when called with empty parameter, we won't store the filename
         if filename is not None:
             self.filename = filename
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        self.scene.saveToFile(self.filename)
-        QApplication.restoreOverrideCursor()
+        if self.journal_enabled:
+            self.journal.beginRebase()
+        self.saver.save(self.filename)
         return True
 
+    def onFileSaved(self, filename):
+        if self.journal_enabled:
+            self.journal.endRebase(filename, True)
+
+    def onFileSaveFailed(self, filename, message):
+        if self.journal_enabled:
+            self.journal.endRebase(filename, False)
+
+    def setAutosaveInterval(self, msecs):
+        """ Saves the modified scene to its file every ``msecs``, 0 turns autosave off """
+        if msecs > 0:
+            self.autosave_timer.start(msecs)
+        else:
+            self.autosave_timer.stop()
+
+    def autosave(self):
+        if not self.isFilenameSet() or not self.isModified():
+            return
+        if self.isLoading() or self.saver.isSaving():
+            return
+        self.fileSave()
+
     def addNodes(self):
         node1 = Node(self.scene, "Awesome Node 1",
                      inputs=[0, 0, 0], outputs=[1])
@@ -4,6 +4,7 @@ from PySide2.QtCore import *
 from PySide2.QtGui import *
 
 from nodeeditor.NodeSocket import *
+from nodeeditor.NodeGraphicsScene import LOD_LOW
 
 EDGE_CP_ROUNDNESS = 100
 
@@ -19,6 +20,10 @@ class QDMGraphicsEdge(QGraphicsPathItem):
         self.posSource = [0, 0]
         self.posDestination = [200, 100]
 
+        # built lazily from calcPath, dropped whenever an endpoint moves
+        self._path = None
+        self._bounding_rect = None
+
         self.initAssets()
         self.initUI()
 
@@ -48,33 +53,66 @@ class QDMGraphicsEdge(QGraphicsPathItem):
             self.onSelected()
 
     def setSource(self, x, y):
+        if self.posSource[0] == x and self.posSource[1] == y:
+            return
+        self.invalidatePath()
         self.posSource = [x, y]
 
     def setDestination(self, x, y):
+        if self.posDestination[0] == x and self.posDestination[1] == y:
+            return
+        self.invalidatePath()
         self.posDestination = [x, y]
 
+    def invalidatePath(self):
+        self.prepareGeometryChange()
+        self._path = None
+        self._bounding_rect = None
+
+    def getPath(self):
+        if self._path is None:
+            self._path = self.calcPath()
+            # leave room for the pen, otherwise repaints clip the stroke
+            margin = self._pen.widthF() / 2
+            self._bounding_rect = self._path.boundingRect().adjusted(
+                -margin, -margin, margin, margin)
+        return self._path
+
     def boundingRect(self):
-        return self.shape().boundingRect()
+        if self._bounding_rect is None:
+            self.getPath()
+        return self._bounding_rect
 
     def shape(self):
-        return self.calcPath()
+        return self.getPath()
 
     def paint(self, painter, QStyleOptionGraphicsItem, widget=None):
-        self.setPath(self.calcPath())
-
         if self.edge.end_socket is None:
             painter.setPen(self._pen_dragging)
         else:
             painter.setPen(self._pen if not self.isSelected()
                            else self._pen_selected)
         painter.setBrush(Qt.NoBrush)
-        painter.drawPath(self.path())
+
+        if self.edge.scene.graphicsScene.getPaintDetailLevel(
+                QStyleOptionGraphicsItem, painter) == LOD_LOW:
+            # curvature is not visible from that far, a plain line will do
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.drawLine(QLineF(self.posSource[0], self.posSource[1],
+                                    self.posDestination[0], self.posDestination[1]))
+            return
+
+        painter.drawPath(self.getPath())
 
     def intersectsWith(self, p1, p2):
         cutpath = QPainterPath(p1)
         cutpath.lineTo(p2)
-        path = self.calcPath()
-        return cutpath.intersects(path)
+        return cutpath.intersects(self.getPath())
+
+    def isNear(self, point, radius):
+        stroker = QPainterPathStroker()
+        stroker.setWidth(2 * radius)
+        return stroker.createStroke(self.getPath()).contains(point)
 
     def calcPath(self):
         """ Will handle drawing QPainterPath from Point A to B """
@@ -1,17 +1,62 @@
 from PySide2.QtWidgets import *
 from PySide2.QtCore import *
 from PySide2.QtGui import *
+from nodeeditor.NodeGraphicsScene import LOD_LOW, LOD_FULL
+from nodeeditor.NodeNode import NODE_TITLE_HEIGHT, NODE_EDGE_SIZE, NODE_PADDING
+
+# evaluation states shown under the title, see setEvaluationState
+EVAL_STATE_IDLE = 0
+EVAL_STATE_PENDING = 1
+EVAL_STATE_RUNNING = 2
+EVAL_STATE_ERROR = 3
+
+# (width, height, title_height, edge_size) -> simplified title/content/outline paths
+_chrome_paths = {}
+
+
+def getChromePaths(width, height, title_height, edge_size):
+    """ Returns the node frame paths, built once and shared by all nodes of the same size """
+    key = (width, height, title_height, edge_size)
+    paths = _chrome_paths.get(key)
+    if paths is not None:
+        return paths
+
+    path_title = QPainterPath()
+    path_title.setFillRule(Qt.WindingFill)
+    path_title.addRoundedRect(
+        0, 0, width, title_height, edge_size, edge_size)
+    path_title.addRect(0, title_height - edge_size, edge_size, edge_size)
+    path_title.addRect(width - edge_size, title_height -
+                       edge_size, edge_size, edge_size)
+
+    path_content = QPainterPath()
+    path_content.setFillRule(Qt.WindingFill)
+    path_content.addRoundedRect(0, title_height, width,
+                                height - title_height, edge_size, edge_size)
+    path_content.addRect(0, title_height, edge_size, edge_size)
+    path_content.addRect(width - edge_size, title_height, edge_size, edge_size)
+
+    path_outline = QPainterPath()
+    path_outline.addRoundedRect(0, 0, width, height, edge_size, edge_size)
+
+    paths = (path_title.simplified(), path_content.simplified(),
+             path_outline.simplified())
+    _chrome_paths[key] = paths
+    return paths
 
 
 class QDMGraphicsNode(QGraphicsItem):
     def __init__(self, node, parent=None):
         super().__init__(parent)
         self.node = node
-        self.content = self.node.content
 
         self._was_moved = False
         self._last_selected_state = False
 
+        self._eval_state = EVAL_STATE_IDLE
+        # fraction of the computation done, None when the node does not tell
+        self._eval_progress = None
+
         self.initSizes()
         self.initAssets()
         self.initUI()
@@ -19,6 +64,7 @@ class QDMGraphicsNode(QGraphicsItem):
     def initUI(self):
         self.setFlag(QGraphicsItem.ItemIsSelectable)
         self.setFlag(QGraphicsItem.ItemIsMovable)
+        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
 
         self.initTitle()
         self.title = self.node.title
@@ -28,11 +74,11 @@ class QDMGraphicsNode(QGraphicsItem):
         self.initContent()
 
     def initSizes(self):
-        self.width = 180
-        self.height = 240
-        self.edge_size = 10.0
-        self.title_height = 24.0
-        self._padding = 4.0
+        self.width = self.node.width
+        self.height = self.node.height
+        self.edge_size = NODE_EDGE_SIZE
+        self.title_height = NODE_TITLE_HEIGHT
+        self._padding = NODE_PADDING
 
     def initAssets(self):
 
@@ -45,22 +91,49 @@ class QDMGraphicsNode(QGraphicsItem):
         self._brush_title = QBrush(QColor("#FF313131"))
         self._brush_background = QBrush(QColor("#E3212121"))
 
+        self._brush_eval_pending = QBrush(QColor("#FF5A5A5A"))
+        self._brush_eval_running = QBrush(QColor("#FF37A6FF"))
+        self._brush_eval_error = QBrush(QColor("#FFE04040"))
+        self._eval_bar_height = 3.0
+
+    def setEvaluationState(self, state, progress=None):
+        if state == self._eval_state and progress == self._eval_progress:
+            return
+        self._eval_state = state
+        self._eval_progress = progress
+        self.update(0, self.title_height - self._eval_bar_height,
+                    self.width, self._eval_bar_height)
+
+    def setSize(self, width, height):
+        self.prepareGeometryChange()
+        self.width = self.node.width = width
+        self.height = self.node.height = height
+        self._title_text.setTextWidth(self.width - 2*self._padding)
+        self.node.invalidateSocketPositions()
+
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            self.node.onMoved(value.x(), value.y())
+        return super().itemChange(change, value)
+
     def onSelected(self):
         self.node.scene.graphicsScene.itemSelected.emit()
 
     def mouseMoveEvent(self, event):
         super().mouseMoveEvent(event)
-        for node in self.scene().scene.nodes:
-            if node.graphicsNode.isSelected():
-                node.updateConnectedEdges()
-        # self.node.updateConnectedEdges()
-        self._was_moved = True
+        graphicsScene = self.node.scene.graphicsScene
+        if not self._was_moved:
+            graphicsScene.startNodesDrag()
+            self._was_moved = True
+        graphicsScene.scheduleDragUpdate()
 
     def mouseReleaseEvent(self, event):
         super().mouseReleaseEvent(event)
 
         if self._was_moved:
             self._was_moved = False
+            for node in self.node.scene.graphicsScene.endNodesDrag():
+                self.node.scene.history.markChanged(node)
             self.node.scene.history.storeHistory(
                 "Node moved", setModified=True)
 
@@ -82,7 +155,8 @@ class QDMGraphicsNode(QGraphicsItem):
     @title.setter
     def title(self, value):
         self._title = value
-        self.title_item.setPlainText(self._title)
+        self._title_text.setText(self._title)
+        self.update()
 
     def boundingRect(self):
         return QRectF(
@@ -93,55 +167,109 @@ class QDMGraphicsNode(QGraphicsItem):
         ).normalized()
 
     def initTitle(self):
-        self.title_item = QGraphicsTextItem(self)
-        self.title_item.node = self.node
-        self.title_item.setDefaultTextColor(self._title_color)
-        self.title_item.setFont(self._title_font)
-        self.title_item.setPos(self._padding, 0)
-        self.title_item.setTextWidth(
-            self.width - 2*self._padding
-        )
+        # laid out once and redrawn as is, instead of a QGraphicsTextItem per node
+        self._title_text = QStaticText()
+        self._title_text.setTextFormat(Qt.PlainText)
+        self._title_text.setTextWidth(self.width - 2*self._padding)
+        # matches the default document margin of the text item used before
+        self._title_margin = 4.0
 
     def initContent(self):
+        # the proxy widget is created on demand by attachContent,
+        # the view asks for it once the node is visible up close
+        self.graphicsContent = None
+
+    def getContentRect(self):
+        return QRectF(self.edge_size, self.title_height + self.edge_size,
+                      self.width - 2*self.edge_size, self.height - 2*self.edge_size-self.title_height)
+
+    def attachContent(self):
+        if self.graphicsContent is not None:
+            return
+        content = self.node.content
+        content.setGeometry(self.getContentRect().toRect())
         self.graphicsContent = QGraphicsProxyWidget(self)
-        self.content.setGeometry(self.edge_size, self.title_height + self.edge_size,
-                                 self.width - 2*self.edge_size, self.height - 2*self.edge_size-self.title_height)
-        self.graphicsContent.setWidget(self.content)
+        self.graphicsContent.setWidget(content)
+        self.onDetailLevelChanged(
+            self.node.scene.graphicsScene.detail_level)
+
+    def releaseContent(self):
+        """ Drops the proxy and the content widget, returns a snapshot to paint instead """
+        if self.graphicsContent is None:
+            return None
+        proxy = self.graphicsContent
+        self.graphicsContent = None
+
+        snapshot = proxy.widget().grab()
+        self.node.releaseContent()
+        # the proxy owns the widget, both go away together
+        proxy.setVisible(False)
+        proxy.deleteLater()
+        self.update()
+        return snapshot
+
+    def isEditingContent(self):
+        return self.graphicsContent is not None and self.graphicsContent.hasFocus()
+
+    def onDetailLevelChanged(self, level):
+        # proxy widgets are the most expensive part, only shown when legible
+        if self.graphicsContent is not None:
+            self.graphicsContent.setVisible(level == LOD_FULL)
+
+    def paintEvaluationState(self, painter):
+        """ A bar along the bottom of the title """
+        width = self.width - 2*self.edge_size
+        if self._eval_state == EVAL_STATE_PENDING:
+            brush = self._brush_eval_pending
+        elif self._eval_state == EVAL_STATE_ERROR:
+            brush = self._brush_eval_error
+        else:
+            brush = self._brush_eval_running
+            if self._eval_progress is not None:
+                width *= min(max(self._eval_progress, 0.0), 1.0)
+        painter.fillRect(QRectF(self.edge_size, self.title_height - self._eval_bar_height,
+                                width, self._eval_bar_height), brush)
 
     def initSockets(self):
         pass
 
     def paint(self, painter, QStyleOptionGraphicsItem, QtWidgets=None):
+        level = self.node.scene.graphicsScene.getPaintDetailLevel(
+            QStyleOptionGraphicsItem, painter)
+        if level == LOD_LOW:
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.fillRect(self.boundingRect(), self._brush_background if not self.isSelected()
+                             else self._pen_selected.brush())
+            return
+
+        path_title, path_content, path_outline = getChromePaths(
+            self.width, self.height, self.title_height, self.edge_size)
+
         # title
-        path_title = QPainterPath()
-        path_title.setFillRule(Qt.WindingFill)
-        path_title.addRoundedRect(
-            0, 0, self.width, self.title_height, self.edge_size, self.edge_size)
-        path_title.addRect(0, self.title_height -
-                           self.edge_size, self.edge_size, self.edge_size)
-        path_title.addRect(self.width - self.edge_size, self.title_height -
-                           self.edge_size, self.edge_size, self.edge_size)
         painter.setPen(Qt.NoPen)
         painter.setBrush(self._brush_title)
-        painter.drawPath(path_title.simplified())
-
-        path_content = QPainterPath()
-        path_content.setFillRule(Qt.WindingFill)
-        path_content.addRoundedRect(0, self.title_height, self.width,
-                                    self.height - self.title_height, self.edge_size, self.edge_size)
-        path_content.addRect(0, self.title_height,
-                             self.edge_size, self.edge_size)
-        path_content.addRect(self.width - self.edge_size,
-                             self.title_height, self.edge_size, self.edge_size)
-        painter.setPen(Qt.NoPen)
+        painter.drawPath(path_title)
+
         painter.setBrush(self._brush_background)
-        painter.drawPath(path_content.simplified())
+        painter.drawPath(path_content)
 
         # outline
-        path_outline = QPainterPath()
-        path_outline.addRoundedRect(
-            0, 0, self.width, self.height, self.edge_size, self.edge_size)
         painter.setPen(self._pen_default if not self.isSelected()
                        else self._pen_selected)
         painter.setBrush(Qt.NoBrush)
-        painter.drawPath(path_outline.simplified())
+        painter.drawPath(path_outline)
+
+        if self._eval_state != EVAL_STATE_IDLE:
+            self.paintEvaluationState(painter)
+
+        painter.setFont(self._title_font)
+        painter.setPen(self._title_color)
+        painter.drawStaticText(QPointF(self._padding + self._title_margin,
+                                       self._title_margin), self._title_text)
+
+        if level == LOD_FULL and self.graphicsContent is None:
+            snapshot = self.node.scene.graphicsScene.getContentSnapshot(
+                self.node)
+            if snapshot is not None:
+                painter.drawPixmap(self.getContentRect(),
+                                   snapshot, QRectF(snapshot.rect()))
@@ -1,9 +1,29 @@
 import math
+import time
+from collections import OrderedDict
 
 from PySide2.QtWidgets import *
 from PySide2.QtCore import *
 from PySide2.QtGui import *
 
+# levels of detail, from the overview to the fully drawn nodes
+LOD_LOW = 1
+LOD_MEDIUM = 2
+LOD_FULL = 3
+
+# grid lines closer than this (in pixels) are not drawn
+GRID_MIN_SPACING = 8
+# biggest grid tile rendered, in pixels
+GRID_MAX_TILE = 1024
+
+# content snapshots kept around for nodes whose widgets were released
+CONTENT_SNAPSHOT_LIMIT = 256
+
+# milliseconds between refreshes of the dragged edges, None follows the refresh rate of the screen
+DRAG_UPDATE_INTERVAL = None
+# refresh rate assumed when the screen does not tell
+DEFAULT_REFRESH_RATE = 60.0
+
 
 class QDMGraphicsScene(QGraphicsScene):
     itemSelected = Signal()
@@ -32,34 +52,175 @@ class QDMGraphicsScene(QGraphicsScene):
 
         self.setBackgroundBrush(self._color_background)
 
+        # node -> time its content was last seen legible, for nodes holding a content widget
+        self._content_last_seen = {}
+        # node -> pixmap of its released content widget, least recently stored first
+        self._content_snapshots = OrderedDict()
+
+        # grid texture brushes keyed by grid settings, colours and zoom bucket
+        self._grid_brushes = {}
+
+        # view scales under which the medium/low levels of detail are used
+        self.lodMediumScale = 0.6
+        self.lodLowScale = 0.3
+        self.detail_level = LOD_FULL
+
+        # nodes being dragged and the edges attached to them, collected once per drag
+        self._dragged_nodes = []
+        self._dragged_edges = []
+        self._drag_update_timer = QTimer(self)
+        self._drag_update_timer.setSingleShot(True)
+        self._drag_update_timer.setTimerType(Qt.PreciseTimer)
+        self._drag_update_timer.timeout.connect(self.updateDraggedEdges)
+
+    def beginBulkConstruction(self, suspend_index=True):
+        # the BSP tree is rebuilt once at the end instead of on every insertion
+        self._bulk_index_method = self.itemIndexMethod()
+        if suspend_index and self._bulk_index_method != QGraphicsScene.NoIndex:
+            self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self._bulk_signals_blocked = self.blockSignals(True)
+
+    def endBulkConstruction(self):
+        self.blockSignals(self._bulk_signals_blocked)
+        if self.itemIndexMethod() != self._bulk_index_method:
+            self.setItemIndexMethod(self._bulk_index_method)
+
     def setGraphicsScene(self, width: int, height: int):
         self.setSceneRect(-width//2, -height//2, width, height)
 
+    def getDetailLevel(self, scale):
+        if scale < self.lodLowScale:
+            return LOD_LOW
+        if scale < self.lodMediumScale:
+            return LOD_MEDIUM
+        return LOD_FULL
+
+    def getPaintDetailLevel(self, option, painter):
+        return self.getDetailLevel(option.levelOfDetailFromTransform(painter.worldTransform()))
+
+    def setDetailLevel(self, level):
+        """ Called by the view when its scale crosses a threshold """
+        if level == self.detail_level:
+            return
+        self.detail_level = level
+        for node in self._content_last_seen:
+            node.graphicsNode.onDetailLevelChanged(level)
+
+    def showContents(self, nodes):
+        """ Makes sure the nodes have their content widgets, called for the nodes in view """
+        now = time.monotonic()
+        for node in nodes:
+            node.graphicsNode.attachContent()
+            self._content_last_seen[node] = now
+
+    def releaseStaleContents(self, timeout):
+        """ Releases the content widgets not seen for ``timeout`` seconds """
+        deadline = time.monotonic() - timeout
+        stale = [node for node, last_seen in self._content_last_seen.items()
+                 if last_seen < deadline]
+        for node in stale:
+            if node.graphicsNode.isEditingContent():
+                continue
+            del self._content_last_seen[node]
+            snapshot = node.graphicsNode.releaseContent()
+            if snapshot is not None:
+                self._content_snapshots.pop(node, None)
+                self._content_snapshots[node] = snapshot
+        while len(self._content_snapshots) > CONTENT_SNAPSHOT_LIMIT:
+            self._content_snapshots.popitem(last=False)
+
+    def getContentSnapshot(self, node):
+        return self._content_snapshots.get(node)
+
+    def forgetContent(self, node):
+        self._content_last_seen.pop(node, None)
+        self._content_snapshots.pop(node, None)
+
+    def startNodesDrag(self):
+        self._dragged_nodes = [item.node for item in self.selectedItems()
+                               if hasattr(item, 'node')]
+
+        edges = {}
+        for node in self._dragged_nodes:
+            for edge in node.getConnectedEdges():
+                edges[edge] = None
+        self._dragged_edges = list(edges)
+        self._drag_update_timer.setInterval(self.getDragUpdateInterval())
+
+    def getDragUpdateInterval(self):
+        """ The dragged edges are moved at most once per frame of the screen """
+        if DRAG_UPDATE_INTERVAL is not None:
+            return DRAG_UPDATE_INTERVAL
+        screen = QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return int(1000 / (rate if rate > 0 else DEFAULT_REFRESH_RATE))
+
+    def scheduleDragUpdate(self):
+        if not self._drag_update_timer.isActive():
+            self._drag_update_timer.start()
+
+    def updateDraggedEdges(self):
+        for edge in self._dragged_edges:
+            edge.updatePositions()
+
+    def endNodesDrag(self):
+        """ Flushes the pending edge updates, returns the nodes which were dragged """
+        self._drag_update_timer.stop()
+        self.updateDraggedEdges()
+
+        nodes = self._dragged_nodes
+        self._dragged_nodes = []
+        self._dragged_edges = []
+        return nodes
+
+    def getGridBrush(self, scale):
+        """ Returns a texture brush holding one period of the grid at about the given scale """
+        # half-octave zoom buckets, so zooming doesn't re-render the tile on every step
+        bucket = round(math.log2(scale) * 2)
+        key = (self.gridSize, self.gridSquares, self._pen_light.color().rgba(),
+               self._pen_dark.color().rgba(), bucket)
+        brush = self._grid_brushes.get(key)
+        if brush is not None:
+            return brush
+
+        bucket_scale = 2 ** (bucket / 2)
+        light_step = self.gridSize
+        dark_step = self.gridSize * self.gridSquares
+        draw_light = light_step * bucket_scale >= GRID_MIN_SPACING
+        # zoomed far out, the major lines get sparser instead of merging
+        while dark_step * bucket_scale < GRID_MIN_SPACING:
+            dark_step *= self.gridSquares
+
+        resolution = min(bucket_scale, GRID_MAX_TILE / dark_step)
+        tile_size = max(1, int(round(dark_step * resolution)))
+        resolution = tile_size / dark_step
+
+        tile = QPixmap(tile_size, tile_size)
+        tile.fill(Qt.transparent)
+        painter = QPainter(tile)
+        if draw_light:
+            painter.setPen(self._pen_light)
+            for ix in range(1, self.gridSquares):
+                pos = int(round(ix * light_step * resolution))
+                painter.drawLine(pos, 0, pos, tile_size)
+                painter.drawLine(0, pos, tile_size, pos)
+        painter.setPen(self._pen_dark)
+        # drawn on both edges, each copy of the tile shows half of the line
+        for pos in (0, tile_size):
+            painter.drawLine(pos, 0, pos, tile_size)
+            painter.drawLine(0, pos, tile_size, pos)
+        painter.end()
+
+        brush = QBrush(tile)
+        brush.setTransform(QTransform.fromScale(1 / resolution, 1 / resolution))
+
+        if len(self._grid_brushes) > 16:
+            self._grid_brushes.clear()
+        self._grid_brushes[key] = brush
+        return brush
+
     def drawBackground(self, painter, rect):
         super().drawBackground(painter, rect)
 
-        left = int(math.floor(rect.left()))
-        right = int(math.ceil(rect.right()))
-        top = int(math.floor(rect.top()))
-        bottom = int(math.ceil(rect.bottom()))
-
-        first_left = left - (left % self.gridSize)
-        first_top = top - (top % self.gridSize)
-
-        lines_light, lines_dark = [], []
-        for x in range(first_left, right, self.gridSize):
-            if (x % (self.gridSize*self.gridSquares) != 0):
-                lines_light.append(QLine(x, top, x, bottom))
-            else:
-                lines_dark.append(QLine(x, top, x, bottom))
-
-        for y in range(first_top, bottom, self.gridSize):
-            if (y % (self.gridSize*self.gridSquares) != 0):
-                lines_light.append(QLine(left, y, right, y))
-            else:
-                lines_dark.append(QLine(left, y, right, y))
-
-        painter.setPen(self._pen_light)
-        painter.drawLines(lines_light)
-        painter.setPen(self._pen_light)
-        painter.drawLines(lines_dark)
+        painter.fillRect(rect, self.getGridBrush(
+            painter.worldTransform().m11()))
@@ -1,6 +1,7 @@
 from PySide2.QtWidgets import *
 from PySide2.QtGui import *
 from PySide2.QtCore import *
+from nodeeditor.NodeGraphicsScene import LOD_LOW
 
 
 class QDMGraphicsSocket(QGraphicsItem):
@@ -26,6 +27,9 @@ class QDMGraphicsSocket(QGraphicsItem):
         self._brush = QBrush(self._color_background)
 
     def paint(self, painter, QStyleOptionGraphicsItem, widget=None):
+        if self.socket.node.scene.graphicsScene.getPaintDetailLevel(
+                QStyleOptionGraphicsItem, painter) == LOD_LOW:
+            return
 
         painter.setBrush(self._brush)
         painter.setPen(self._pen)
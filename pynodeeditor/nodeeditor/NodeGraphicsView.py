@@ -3,6 +3,8 @@ from PySide2.QtCore import *
 from PySide2.QtGui import *
 
 from nodeeditor.NodeGraphicsSocket import QDMGraphicsSocket
+from nodeeditor.NodeGraphicsNode import QDMGraphicsNode
+from nodeeditor.NodeGraphicsScene import LOD_FULL
 from nodeeditor.NodeGraphicsEdge import QDMGraphicsEdge
 from nodeeditor.NodeEdge import Edge, EDGE_TYPE_BEZIER
 from nodeeditor.NodeGraphicsCutLine import QDMCutLine
@@ -11,6 +13,13 @@ MODE_NOOP = 1
 MODE_EDGE_DRAG = 2
 MODE_EDGE_CUT = 3
 EDGE_DRAG_START_THRESHOLD = 10
+# content widgets are built this long (ms) after the view stopped moving
+CONTENT_UPDATE_DELAY = 50
+# content widgets offscreen for longer than this (s) are released
+CONTENT_RELEASE_TIMEOUT = 10.0
+CONTENT_SWEEP_INTERVAL = 2000
+# how far from an edge (in view pixels) a click still picks it
+EDGE_PICK_TOLERANCE = 4
 
 DEBUG = True
 
@@ -21,6 +30,17 @@ class QDMGraphicsView(QGraphicsView):
     def __init__(self, graphicsScene, parent=None):
         super().__init__(parent)
         self.graphicsScene = graphicsScene
+
+        # scrolling may already happen while the view is being set up
+        self._content_timer = QTimer(self)
+        self._content_timer.setSingleShot(True)
+        self._content_timer.setInterval(CONTENT_UPDATE_DELAY)
+        self._content_timer.timeout.connect(self.updateVisibleContents)
+        self._content_sweep_timer = QTimer(self)
+        self._content_sweep_timer.setInterval(CONTENT_SWEEP_INTERVAL)
+        self._content_sweep_timer.timeout.connect(self.sweepContents)
+        self._content_sweep_timer.start()
+
         self.initUI()
 
         self.setScene(self.graphicsScene)
@@ -28,6 +48,8 @@ class QDMGraphicsView(QGraphicsView):
         self.mode = MODE_NOOP
         self.editingFlag = False
         self.rubberBandDraggingRectangle = False
+        # where pasted items go, before the mouse ever moved over the view
+        self.last_scene_mouse_position = QPointF(0, 0)
 
         self.zoomInFactor = 1.25
         self.zoomClamp = True
@@ -38,6 +60,8 @@ class QDMGraphicsView(QGraphicsView):
         self.cutline = QDMCutLine()
         self.graphicsScene.addItem(self.cutline)
 
+        self.updateDetailLevel()
+
     def initUI(self):
         self.setRenderHints(QPainter.Antialiasing | QPainter.HighQualityAntialiasing |
                             QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
@@ -52,6 +76,9 @@ class QDMGraphicsView(QGraphicsView):
     def mousePressEvent(self, event):
         if event.button() == Qt.MiddleButton:
             self.middleMouseButtonPress(event)
+        elif not self.isInteractive():
+            # only panning while the scene takes no edits, see setInteractive
+            super().mousePressEvent(event)
         elif event.button() == Qt.LeftButton:
             self.leftMouseButtonPress(event)
         elif event.button() == Qt.RightButton:
@@ -62,6 +89,8 @@ class QDMGraphicsView(QGraphicsView):
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MiddleButton:
             self.middleMouseButtonRelease(event)
+        elif not self.isInteractive():
+            super().mouseReleaseEvent(event)
         elif event.button() == Qt.LeftButton:
             self.leftMouseButtonRelease(event)
         elif event.button() == Qt.RightButton:
@@ -102,6 +131,15 @@ class QDMGraphicsView(QGraphicsView):
                 super().mousePressEvent(fakeEvent)
                 return
 
+        if isinstance(item, QDMGraphicsEdge) and item is not self.itemAt(event.pos()):
+            # picked by tolerance only, Qt would not select it on its own
+            if self.mode == MODE_NOOP and not event.modifiers() & Qt.ControlModifier:
+                self.graphicsScene.clearSelection()
+                item.setSelected(True)
+                item._last_selected_state = True
+                item.onSelected()
+                return
+
         if type(item) is QDMGraphicsSocket:
             if self.mode == MODE_NOOP:
                 self.mode = MODE_EDGE_DRAG
@@ -189,10 +227,10 @@ class QDMGraphicsView(QGraphicsView):
             if item is None:
                 print('SCENE:')
                 print('  Nodes:')
-                for node in self.grScene.scene.nodes:
+                for node in self.graphicsScene.scene.nodes:
                     print('    ', node)
                 print('  Edges:')
-                for edge in self.grScene.scene.edges:
+                for edge in self.graphicsScene.scene.edges:
                     print('    ', edge)
 
     def rightMouseButtonRelease(self, event):
@@ -233,8 +271,8 @@ class QDMGraphicsView(QGraphicsView):
         elif event.key() == Qt.Key_Z and event.modifiers() & Qt.ControlModifier and event.modifiers() & Qt.ShiftModifier:
             self.graphicsScene.scene.history.redo()
         elif event.key() == Qt.Key_H:
-            print("HISTORY:     len(%d)" % len(self.grScene.scene.history.history_stack),
-                  " -- current_step", self.grScene.scene.history.history_current_step)
+            print("HISTORY:     len(%d)" % len(self.graphicsScene.scene.history.history_stack),
+                  " -- current_step", self.graphicsScene.scene.history.history_current_step)
             ix = 0
             for item in self.graphicsScene.scene.history.history_stack:
                 print("#", ix, "--", item['desc'])
@@ -244,26 +282,30 @@ class QDMGraphicsView(QGraphicsView):
             super().keyPressEvent(event)
 
     def cutIntersectingEdges(self):
+        edge_index = self.graphicsScene.scene.edgeIndex
+        cut_edges = {}
         for ix in range(len(self.cutline.line_points) - 1):
             p1 = self.cutline.line_points[ix]
             p2 = self.cutline.line_points[ix + 1]
 
-            for edge in self.graphicsScene.scene.edges:
-                if edge.graphicsEdge.intersectsWith(p1, p2):
-                    edge.remove()
+            for edge in edge_index.querySegment(p1, p2):
+                if edge not in cut_edges and edge.graphicsEdge.intersectsWith(p1, p2):
+                    cut_edges[edge] = None
 
-        self.graphicsScene.scene.history.storeHistory(
-            'Delete cutted edges', setModified=True)
+        with self.graphicsScene.scene.history.transaction('Delete cutted edges', setModified=True):
+            for edge in cut_edges:
+                edge.remove()
 
     def deleteSelected(self):
-        for item in self.graphicsScene.selectedItems():
-            if isinstance(item, QDMGraphicsEdge):
-                item.edge.remove()
-            elif hasattr(item, 'node'):
-                item.node.remove()
-
-        self.graphicsScene.scene.history.storeHistory(
-            'Delete selected', setModified=True)
+        scene = self.graphicsScene.scene
+        with scene.history.transaction('Delete selected', setModified=True):
+            for item in self.graphicsScene.selectedItems():
+                if isinstance(item, QDMGraphicsEdge):
+                    # may be gone already with one of its nodes
+                    if scene.hasEdge(item.edge):
+                        item.edge.remove()
+                elif hasattr(item, 'node'):
+                    item.node.remove()
 
     def debug_modifiers(self, event):
         out = "MODS: "
@@ -278,8 +320,21 @@ class QDMGraphicsView(QGraphicsView):
     def getItemAtClick(self, event):
         pos = event.pos()
         obj = self.itemAt(pos)
+        if obj is None:
+            obj = self.getEdgeAt(self.mapToScene(pos))
         return obj
 
+    def getEdgeAt(self, scene_pos):
+        radius = EDGE_PICK_TOLERANCE / self.transform().m11()
+        candidates = self.graphicsScene.scene.edgeIndex.query(
+            scene_pos.x() - radius, scene_pos.y() - radius,
+            scene_pos.x() + radius, scene_pos.y() + radius)
+
+        for edge in candidates:
+            if edge.end_socket is not None and edge.graphicsEdge.isNear(scene_pos, radius):
+                return edge.graphicsEdge
+        return None
+
     def edgeDragStart(self, item):
         if DEBUG:
             print('View::edgeDragStart ~ Start dragging edge')
@@ -304,6 +359,12 @@ class QDMGraphicsView(QGraphicsView):
             if item.socket != self.drag_start_socket:
                 # if we released dragging on a socket (other then the beginning socket)
 
+                # the very same connection exists already, nothing to do
+                if self.drag_start_socket.isConnectedTo(item.socket):
+                    if DEBUG:
+                        print("View::edgeDragEnd ~  sockets already connected")
+                    return True
+
                 # we wanna keep all the edges comming from target socket
                 if not item.socket.is_multi_edges:
                     item.socket.removeAllEdges()
@@ -318,7 +379,7 @@ class QDMGraphicsView(QGraphicsView):
                     print("View::edgeDragEnd ~  created new edge:", new_edge,
                           "connecting", new_edge.start_socket, "<-->", new_edge.end_socket)
 
-                self.grScene.scene.history.storeHistory(
+                self.graphicsScene.scene.history.storeHistory(
                     "Created new edge by dragging", setModified=True)
                 return True
 
@@ -353,3 +414,31 @@ class QDMGraphicsView(QGraphicsView):
 
         if not clamped or self.zoomClamp is False:
             self.scale(zoomFactor, zoomFactor)
+            self.updateDetailLevel()
+
+    def updateDetailLevel(self):
+        self.graphicsScene.setDetailLevel(
+            self.graphicsScene.getDetailLevel(self.transform().m11()))
+        self.scheduleContentUpdate()
+
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self.scheduleContentUpdate()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.scheduleContentUpdate()
+
+    def scheduleContentUpdate(self):
+        self._content_timer.start()
+
+    def updateVisibleContents(self):
+        if self.graphicsScene.detail_level != LOD_FULL:
+            return
+        visible_rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        self.graphicsScene.showContents([item.node for item in self.graphicsScene.items(visible_rect)
+                                         if isinstance(item, QDMGraphicsNode)])
+
+    def sweepContents(self):
+        self.updateVisibleContents()
+        self.graphicsScene.releaseStaleContents(CONTENT_RELEASE_TIMEOUT)
@@ -1,7 +1,12 @@
-from nodeeditor.NodeGraphicsNode import QDMGraphicsNode
-from nodeeditor.NodeContentWidget import QDMNodeContentWidget
 from nodeeditor.NodeSocket import *
 
+# node frame sizes, the socket positions are laid out from them with or without graphics
+NODE_WIDTH = 180
+NODE_HEIGHT = 240
+NODE_TITLE_HEIGHT = 24.0
+NODE_EDGE_SIZE = 10.0
+NODE_PADDING = 4.0
+
 
 class Node(Serializable):
     def __init__(self, scene, title="Undefined Node", inputs=[], outputs=[]):
@@ -9,18 +14,34 @@ class Node(Serializable):
         self._title = title
         self.scene = scene
 
-        self.content = QDMNodeContentWidget(self)
-        self.graphicsNode = QDMGraphicsNode(self)
-        self.title = title
+        # scene position, mirrored from the graphics node when there is one
+        self._pos_x = 0.0
+        self._pos_y = 0.0
+        # mirrored to the graphics node, see QDMGraphicsNode.setSize
+        self.width = NODE_WIDTH
+        self.height = NODE_HEIGHT
 
-        self.scene.addNode(self)
-        self.scene.graphicsScene.addItem(self.graphicsNode)
+        # the content widget is only built once somebody asks for it, see content
+        self._content = None
+        self._content_data = OrderedDict()
 
         self.socket_spacing = 22
 
+        # edges attached to input/output sockets -> number of attachments
+        self._input_edges = {}
+        self._output_edges = {}
+
         self.inputs = []
         self.outputs = []
 
+        # headless scenes have no graphics, see initGraphics
+        self.graphicsNode = None
+        if self.scene.graphicsScene is not None:
+            self.initGraphics()
+        self.title = title
+
+        self.scene.addNode(self)
+
         counter = 0
 
         for item in inputs:
@@ -36,15 +57,86 @@ class Node(Serializable):
             counter += 1
             self.outputs.append(socket)
 
+    def initGraphics(self):
+        """ Creates the graphics node and the graphics of the sockets already there """
+        from nodeeditor.NodeGraphicsNode import QDMGraphicsNode
+        self.graphicsNode = QDMGraphicsNode(self)
+        self.graphicsNode.setPos(self._pos_x, self._pos_y)
+        self.scene.graphicsScene.addItem(self.graphicsNode)
+
+        for socket in (self.inputs + self.outputs):
+            socket.initGraphics()
+
+    def onIdChanged(self, old_id):
+        self.scene.onNodeIdChanged(self, old_id)
+
     def __str__(self):
         return "<Node %s..%s>" % (hex(id(self))[2:5], hex(id(self))[-3:])
 
     @property
     def pos(self):
+        if self.graphicsNode is None:
+            return self._pos_x, self._pos_y
         return self.graphicsNode.pos()
 
     def setPos(self, x, y):
-        self.graphicsNode.setPos(x, y)
+        if self.graphicsNode is not None:
+            self.graphicsNode.setPos(x, y)
+        else:
+            self.onMoved(float(x), float(y))
+        self.scene.history.markChanged(self)
+
+    def onMoved(self, x, y):
+        self._pos_x = x
+        self._pos_y = y
+
+    def getScenePosition(self):
+        return self._pos_x, self._pos_y
+
+    @property
+    def content(self):
+        if self._content is None:
+            from nodeeditor.NodeContentWidget import QDMNodeContentWidget
+            self._content = QDMNodeContentWidget(self)
+            self._content.deserialize(self._content_data)
+        return self._content
+
+    def hasContent(self):
+        return self._content is not None
+
+    def releaseContent(self):
+        """ Drops the content widget, keeping its data for the next time it is built """
+        if self._content is not None:
+            self._content_data = self._content.serialize()
+            self._content = None
+
+    def getContentData(self):
+        if self._content is not None:
+            return self._content.serialize()
+        return self._content_data
+
+    def setContentData(self, data):
+        self._content_data = data
+        if self._content is not None:
+            self._content.deserialize(data)
+        self.markDirty()
+
+    def markDirty(self):
+        """ To be called whenever what compute returns may have changed """
+        self.scene.evaluator.markDirty(self)
+
+    def compute(self, inputs):
+        """ Overridden by nodes that compute something. ``inputs`` holds the value connected to each
+        input socket, a list of values for multi edge ones. Returns a list with a value per output socket.
+        May run on a worker thread, see ParallelSceneEvaluator, so it must not touch the graphics or content """
+        return None
+
+    def reportProgress(self, fraction):
+        """ Can be called from compute to tell how much (0..1) of it is done """
+        self.scene.evaluator.reportProgress(self, fraction)
+
+    def getOutputValue(self, index=0):
+        return self.scene.evaluator.getOutputValue(self.outputs[index])
 
     @property
     def title(self):
@@ -53,35 +145,73 @@ class Node(Serializable):
     @title.setter
     def title(self, value):
         self._title = value
-        self.graphicsNode.title = self._title
+        if self.graphicsNode is not None:
+            self.graphicsNode.title = self._title
+        self.scene.history.markChanged(self)
+
+    def invalidateSocketPositions(self):
+        """ Has to be called whenever the node size or the socket layout changes """
+        for socket in (self.inputs + self.outputs):
+            socket.invalidatePosition()
+        self.updateConnectedEdges()
 
     def getSocketPosition(self, index, position):
         x = 0 if (position in (LEFT_TOP, LEFT_BOTTOM)
-                  ) else self.graphicsNode.width
+                  ) else self.width
 
         if position in (LEFT_BOTTOM, RIGHT_BOTTOM):
-            y = self.graphicsNode.height - self.graphicsNode.edge_size - \
-                self.graphicsNode._padding - index*self.socket_spacing
+            y = self.height - NODE_EDGE_SIZE - \
+                NODE_PADDING - index*self.socket_spacing
         else:
-            y = self.graphicsNode.title_height+self.graphicsNode._padding + \
-                self.graphicsNode.edge_size+index*self.socket_spacing
+            y = NODE_TITLE_HEIGHT+NODE_PADDING + \
+                NODE_EDGE_SIZE+index*self.socket_spacing
 
         return [x, y]
 
+    def onEdgeConnected(self, socket, edge):
+        edges = self._input_edges if socket.is_input else self._output_edges
+        edges[edge] = edges.get(edge, 0) + 1
+
+    def onEdgeDisconnected(self, socket, edge):
+        edges = self._input_edges if socket.is_input else self._output_edges
+        count = edges.get(edge, 0) - 1
+        if count > 0:
+            edges[edge] = count
+        else:
+            edges.pop(edge, None)
+
+    def getUpstreamEdges(self):
+        """ Edges attached to the input sockets """
+        return list(self._input_edges)
+
+    def getDownstreamEdges(self):
+        """ Edges attached to the output sockets """
+        return list(self._output_edges)
+
+    def getConnectedEdges(self):
+        edges = dict(self._input_edges)
+        edges.update(self._output_edges)
+        return list(edges)
+
     def updateConnectedEdges(self):
-        for socket in self.inputs + self.outputs:
-            for edge in socket.edges:
+        for edge in self._input_edges:
+            edge.updatePositions()
+        for edge in self._output_edges:
+            if edge not in self._input_edges:
                 edge.updatePositions()
 
     def remove(self):
+        for edge in self.getConnectedEdges():
+            if DEBUG:
+                print("    - removing edge:", edge)
+            edge.remove()
+
         for socket in (self.inputs + self.outputs):
-            for edge in socket.edges:
-                if DEBUG:
-                    print(
-                        "    - removing from socket:", socket, "edge:", edge)
-                edge.remove()
+            self.scene.removeSocket(socket)
 
-        self.scene.graphicsScene.removeItem(self.graphicsNode)
+        if self.graphicsNode is not None:
+            self.scene.graphicsScene.forgetContent(self)
+            self.scene.graphicsScene.removeItem(self.graphicsNode)
         self.scene.removeNode(self)
 
     def serialize(self):
@@ -95,11 +225,11 @@ class Node(Serializable):
         return OrderedDict([
             ('id', self.id),
             ('title', self.title),
-            ('pos_x', self.graphicsNode.scenePos().x()),
-            ('pos_y', self.graphicsNode.scenePos().y()),
+            ('pos_x', self._pos_x),
+            ('pos_y', self._pos_y),
             ('inputs', inputs),
             ('outputs', outputs),
-            ('content', self.content.serialize())
+            ('content', self.getContentData())
         ])
 
     def deserialize(self, data, hashmap={}, restore_id=True):
@@ -109,21 +239,27 @@ class Node(Serializable):
 
         self.setPos(data['pos_x'], data['pos_y'])
         self.title = data['title']
+        if 'content' in data:
+            self.setContentData(data['content'])
 
-        data['inputs'].sort(
-            key=lambda socket: socket['index']+socket['position']*10000)
-        data['outputs'].sort(
-            key=lambda socket: socket['index']+socket['position']*10000)
+        # sorted copies, the data may be shared with history or a snapshot being saved
+        inputs = sorted(data['inputs'],
+                        key=lambda socket: socket['index']+socket['position']*10000)
+        outputs = sorted(data['outputs'],
+                         key=lambda socket: socket['index']+socket['position']*10000)
+
+        for socket in (self.inputs + self.outputs):
+            self.scene.removeSocket(socket)
 
         self.inputs = []
-        for socket_data in data['inputs']:
+        for socket_data in inputs:
             new_socket = Socket(
                 node=self, index=socket_data['index'], position=socket_data['position'], socket_type=socket_data['socket_type'])
             new_socket.deserialize(socket_data, hashmap, restore_id)
             self.inputs.append(new_socket)
 
         self.outputs = []
-        for socket_data in data['outputs']:
+        for socket_data in outputs:
             new_socket = Socket(
                 node=self, index=socket_data['index'], position=socket_data['position'], socket_type=socket_data['socket_type'])
             new_socket.deserialize(socket_data, hashmap, restore_id)
@@ -1,18 +1,75 @@
-import json
+import gc
+import io
+import os
+import struct
+import tempfile
 from collections import OrderedDict
+from contextlib import contextmanager
 from nodeeditor.NodeSerializable import Serializable
-from nodeeditor.NodeGraphicsScene import QDMGraphicsScene
 from nodeeditor.NodeNode import Node
 from nodeeditor.NodeEdge import Edge
 from nodeeditor.NodeSceneHistory import SceneHistory
+from nodeeditor.NodeSceneEvaluator import SceneEvaluator
 from nodeeditor.NodeSceneClipboard import SceneClipBoard
+from nodeeditor.NodeEdgeIndex import EdgeIndex
+from nodeeditor.NodeSceneJson import SceneJsonReader, SceneJsonWriter
+from nodeeditor.NodeSceneBinary import SceneBinaryReader, SceneBinaryWriter, isSceneBinary, mapSceneBinary
+
+DEBUG = False
+
+# permissions of newly saved files, existing files keep their own
+SAVE_FILE_MODE = 0o644
+
+
+@contextmanager
+def openAtomic(filename, mode="w"):
+    """ Opens a temporary file next to ``filename`` which replaces it once completely written,
+    a failed write leaves the previous file untouched """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_filename = tempfile.mkstemp(
+        prefix='.' + os.path.basename(filename) + '.', suffix='.tmp', dir=directory)
+    try:
+        encoding = None if 'b' in mode else 'utf-8'
+        with os.fdopen(fd, mode, encoding=encoding) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(filename):
+            os.chmod(temp_filename, os.stat(filename).st_mode & 0o7777)
+        else:
+            os.chmod(temp_filename, SAVE_FILE_MODE)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def writeSnapshot(filename, data, compact=False, binary=False):
+    """ Writes data returned by Scene.snapshot, does not touch the scene so any thread can call it """
+    if binary:
+        with openAtomic(filename, "wb") as file:
+            SceneBinaryWriter(file).writeSnapshot(data)
+    else:
+        with openAtomic(filename, "w") as file:
+            SceneJsonWriter(file, compact).writeSnapshot(data)
+
+
+class InvalidFile(ValueError):
+    """ Raised by Scene.loadFromFile for files which are not scene files or are damaged """
+    pass
 
 
 class Scene(Serializable):
-    def __init__(self):
+    def __init__(self, headless=False):
         super().__init__()
-        self.nodes = []
-        self.edges = []
+        # registries keyed by id, dicts keep the insertion order
+        self._nodes = {}
+        self._edges = {}
+        self._sockets = {}
+        self.edgeIndex = EdgeIndex()
 
         self.scene_width = 64000
         self.scene_height = 64000
@@ -24,19 +81,26 @@ class Scene(Serializable):
         self._item_selected_listeners = []
         self._items_deselected_listeners = []
 
-        self.initUI()
+        # nesting depth of bulkConstruction, with the work it put off
+        self._bulk_depth = 0
+        self._bulk_edges = {}
+        self._bulk_modified = False
+        self._bulk_gc = False
 
         self.history = SceneHistory(self)
+        self.evaluator = SceneEvaluator(self)
         self.clipboard = SceneClipBoard(self)
 
-        self.graphicsScene.itemSelected.connect(self.onItemSelected)
-        self.graphicsScene.itemsDeselected.connect(self.onItemsDeselected)
+        # a headless scene is a plain model, usable without Qt, see attachGraphics
+        self.graphicsScene = None
+        if not headless:
+            self.initUI()
 
     def onItemSelected(self):
         current_selected_items = self.getSelectedItems()
         if current_selected_items != self._last_selected_items:
             self._last_selected_items = current_selected_items
-            self.history.storeHistory("Selection Changed")
+            self.history.storeSelection("Selection Changed")
             for callback in self._item_selected_listeners:
                 callback()
 
@@ -44,14 +108,19 @@ class Scene(Serializable):
         self.resetLastSelectedStates()
         if self._last_selected_items != []:
             self._last_selected_items = []
-            self.history.storeHistory("Deselected Everything")
+            self.history.storeSelection("Deselected Everything")
             for callback in self._items_deselected_listeners:
                 callback()
 
     def isModified(self):
         return self.has_been_modified
 
+    def isHeadless(self):
+        return self.graphicsScene is None
+
     def getSelectedItems(self):
+        if self.graphicsScene is None:
+            return []
         return self.graphicsScene.selectedItems()
 
     @property
@@ -63,8 +132,11 @@ class Scene(Serializable):
         if not self._has_been_modified and value:
             self._has_been_modified = value
 
-            for callback in self._has_been_modified_listeners:
-                callback()
+            if self._bulk_depth:
+                self._bulk_modified = True
+            else:
+                for callback in self._has_been_modified_listeners:
+                    callback()
 
         self._has_been_modified = value
 
@@ -72,10 +144,71 @@ class Scene(Serializable):
         self._has_been_modified_listeners.append(callback)
 
     def initUI(self):
+        self.attachGraphics()
+
+    def attachGraphics(self):
+        """ Creates the graphics scene and the graphics of the nodes/edges already there """
+        if self.graphicsScene is not None:
+            return
+        from nodeeditor.NodeGraphicsScene import QDMGraphicsScene
         self.graphicsScene = QDMGraphicsScene(self)
         self.graphicsScene.setGraphicsScene(
             self.scene_width, self.scene_height)
 
+        self.graphicsScene.itemSelected.connect(self.onItemSelected)
+        self.graphicsScene.itemsDeselected.connect(self.onItemsDeselected)
+
+        with self.bulkConstruction():
+            for node in self._nodes.values():
+                node.initGraphics()
+            for edge in self._edges.values():
+                edge.initGraphics()
+
+    def isBulkConstructing(self):
+        return self._bulk_depth > 0
+
+    @contextmanager
+    def bulkConstruction(self, suspend_index=True):
+        """ Puts off item indexing, graphics scene signals, modified-listeners and edge geometry
+        until the outermost block is left, for adding or removing many items at once.
+        Without ``suspend_index`` the graphics scene keeps indexing items as they are added,
+        for short blocks repeated many times """
+        self._bulk_depth += 1
+        if self._bulk_depth == 1:
+            # every new node/socket/edge adds to what the cyclic collector walks,
+            # collections during a large load make it quadratic
+            self._bulk_gc = gc.isenabled()
+            gc.disable()
+            if self.graphicsScene is not None:
+                self.graphicsScene.beginBulkConstruction(suspend_index)
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                self._endBulkConstruction()
+
+    def deferEdgeUpdate(self, edge):
+        self._bulk_edges[edge] = None
+
+    def _endBulkConstruction(self):
+        edges, self._bulk_edges = self._bulk_edges, {}
+        if DEBUG:
+            print("Scene::bulkConstruction", "updating", len(edges), "edges")
+        for edge in edges:
+            edge.updatePositions()
+
+        if self.graphicsScene is not None:
+            self.graphicsScene.endBulkConstruction()
+        if self._bulk_gc:
+            gc.enable()
+
+        if self._bulk_modified:
+            self._bulk_modified = False
+            if self._has_been_modified:
+                for callback in self._has_been_modified_listeners:
+                    callback()
+
     def addItemSelectedListener(self, callback):
         self._item_selected_listeners.append(callback)
 
@@ -85,78 +218,225 @@ class Scene(Serializable):
     # custom flag to detect node or edge has been selected....
 
     def resetLastSelectedStates(self):
-        for node in self.nodes:
+        if self.graphicsScene is None:
+            return
+        for node in self._nodes.values():
             node.graphicsNode._last_selected_state = False
-        for edge in self.edges:
+        for edge in self._edges.values():
             edge.graphicsEdge._last_selected_state = False
 
+    @property
+    def nodes(self):
+        return list(self._nodes.values())
+
+    @property
+    def edges(self):
+        return list(self._edges.values())
+
+    def iterNodes(self):
+        """ Live view of the nodes with no copy, not to be iterated while adding or removing nodes """
+        return self._nodes.values()
+
+    def iterEdges(self):
+        """ Live view of the edges with no copy, not to be iterated while adding or removing edges """
+        return self._edges.values()
+
+    def getNodeById(self, node_id):
+        return self._nodes.get(node_id)
+
+    def getEdgeById(self, edge_id):
+        return self._edges.get(edge_id)
+
+    def getSocketById(self, socket_id):
+        return self._sockets.get(socket_id)
+
+    def hasNode(self, node):
+        return self._nodes.get(node.id) is node
+
+    def hasEdge(self, edge):
+        return self._edges.get(edge.id) is edge
+
     def addNode(self, node):
-        self.nodes.append(node)
+        self._register(self._nodes, node)
+        self.history.markChanged(node)
+        self.evaluator.onNodeAdded(node)
 
     def addEdge(self, edge):
-        self.edges.append(edge)
+        self._register(self._edges, edge)
+        self.history.markChanged(edge)
+
+    def addSocket(self, socket):
+        self._register(self._sockets, socket)
 
     def removeNode(self, node):
-        if node in self.nodes:
-            self.nodes.remove(node)
+        if self.hasNode(node):
+            del self._nodes[node.id]
+            self.history.markChanged(node)
+            self.evaluator.onNodeRemoved(node)
         else:
             print("!W:", "Scene::removeNode", "wanna remove node",
                   node, "from self.nodes but it's not in the list!")
 
     def removeEdge(self, edge):
-        if edge in self.edges:
-            self.edges.remove(edge)
+        if self.hasEdge(edge):
+            del self._edges[edge.id]
+            self.history.markChanged(edge)
         else:
             print("!W:", "Scene::removeEdge", "wanna remove edge",
                   edge, "from self.edges but it's not in the list!")
 
+    def removeSocket(self, socket):
+        if self._sockets.get(socket.id) is socket:
+            del self._sockets[socket.id]
+
+    def _freeId(self, registry, item_id):
+        while item_id in registry:
+            item_id += 1
+        return item_id
+
+    def _register(self, registry, item):
+        # default ids are memory addresses, they can clash with ids restored from a file
+        if registry.get(item.id, item) is not item:
+            item.id = self._freeId(registry, item.id)
+        registry[item.id] = item
+
+    def _reindex(self, registry, item, old_id):
+        if registry.get(old_id) is not item:
+            return
+        occupant = registry.get(item.id)
+        if occupant is not None and occupant is not item:
+            # the restored id wins, the occupant is still on its default id
+            occupant.id = self._freeId(registry, item.id)
+        del registry[old_id]
+        registry[item.id] = item
+
+    def onNodeIdChanged(self, node, old_id):
+        self._reindex(self._nodes, node, old_id)
+
+    def onEdgeIdChanged(self, edge, old_id):
+        self._reindex(self._edges, edge, old_id)
+
+    def onSocketIdChanged(self, socket, old_id):
+        self._reindex(self._sockets, socket, old_id)
+
     def clear(self):
-        while len(self.nodes) > 0:
-            self.nodes[0].remove()
+        with self.bulkConstruction():
+            # removing edits the registries, they are iterated from a copy
+            for node in list(self._nodes.values()):
+                node.remove()
+            # edges not connected to any node, like one left half built by a failed load
+            for edge in list(self._edges.values()):
+                edge.remove()
 
         self.has_been_modified = False
 
-    def saveToFile(self, filename):
-        with open(filename, "w") as file:
-            file.write(json.dumps(self.serialize(), indent=4))
+    def saveToFile(self, filename, compact=False, binary=False):
+        """ Streams the scene to the file, ``compact`` leaves out the indentation,
+        ``binary`` writes the binary format instead of JSON """
+        if binary:
+            with openAtomic(filename, "wb") as file:
+                SceneBinaryWriter(file).write(self)
+        else:
+            with openAtomic(filename, "w") as file:
+                SceneJsonWriter(file, compact).write(self)
         print("saving to", filename, "was successfull.")
 
         self.has_been_modified = False
 
     def loadFromFile(self, filename):
-        with open(filename, "r") as file:
-            raw_data = file.read()
-            data = json.loads(raw_data, encoding='utf-8')
-            self.deserialize(data)
-
-            self.has_been_modified = False
+        """ Loads both the JSON and the binary format. Raises InvalidFile when the file cannot be
+        read as a scene, OSError when it cannot be read at all, the scene is then left as it was """
+        try:
+            if isSceneBinary(filename):
+                with mapSceneBinary(filename) as reader:
+                    self.deserializeItems(reader.items())
+            else:
+                with open(filename, "r", encoding='utf-8') as file:
+                    self.deserializeItems(SceneJsonReader(file).items())
+        except (ValueError, KeyError, TypeError, IndexError, struct.error) as e:
+            raise InvalidFile("%s is not a valid scene file: %s" %
+                              (os.path.basename(filename), e)) from e
 
-    def serialize(self):
-        nodes, edges = [], []
-        for node in self.nodes:
-            nodes.append(node.serialize())
-        for edge in self.edges:
-            edges.append(edge.serialize())
+        self.has_been_modified = False
 
+    def serializeHeader(self):
+        """ The scene fields besides the nodes and the edges """
         return OrderedDict([
             ('id', self.id),
             ('scene_width', self.scene_width),
             ('scene_height', self.scene_height),
-            ('nodes', nodes),
-            ('edges', edges),
         ])
 
-    def deserialize(self, data, hashmap={}, restore_id=True):
-        print("deserializating data", data)
+    def serialize(self):
+        nodes, edges = [], []
+        for node in self._nodes.values():
+            nodes.append(node.serialize())
+        for edge in self._edges.values():
+            edges.append(edge.serialize())
 
-        self.clear()
-        hashmap = {}
+        data = self.serializeHeader()
+        data['nodes'] = nodes
+        data['edges'] = edges
+        return data
 
-        if restore_id:
-            self.id = data['id']
+    def snapshot(self):
+        """ Serialized scene like serialize, but reusing the states kept by history for every node/edge
+        not changed since the last stamp. Nothing in it is modified later, it can be written from another thread """
+        nodes, edges = self.history.serializeStates()
+        data = self.serializeHeader()
+        data['nodes'] = nodes
+        data['edges'] = edges
+        return data
 
-        for node_data in data['nodes']:
-            Node(self).deserialize(node_data, hashmap, restore_id)
-        for edge_data in data['edges']:
-            Edge(self).deserialize(edge_data, hashmap, restore_id)
+    def deserialize(self, data, hashmap={}, restore_id=True):
+        if DEBUG:
+            print("deserializating data", data)
+
+        items = [('id', data['id'])]
+        items.extend(('node', node_data) for node_data in data['nodes'])
+        items.extend(('edge', edge_data) for edge_data in data['edges'])
+        return self.deserializeItems(items, restore_id)
+
+    def serializeBinary(self):
+        file = io.BytesIO()
+        SceneBinaryWriter(file).write(self)
+        return file.getvalue()
+
+    def deserializeBinary(self, data, restore_id=True):
+        with SceneBinaryReader(data) as reader:
+            return self.deserializeItems(reader.items(), restore_id)
+
+    def deserializeItems(self, items, restore_id=True):
+        """ Rebuilds the scene from ``(key, value)`` pairs as yielded by SceneJsonReader.items,
+        nodes have to come before the edges connecting them. The items are all parsed before
+        the scene is touched, the scene is left as it was when they cannot be parsed or built """
+        items = list(items)
+        previous = self.serialize() if self._nodes else None
+        modified = self.has_been_modified
+        try:
+            self._buildItems(items, restore_id)
+        except Exception:
+            previous_items = []
+            if previous is not None:
+                previous_items = [('id', previous['id'])]
+                previous_items.extend(('node', node_data)
+                                      for node_data in previous['nodes'])
+                previous_items.extend(('edge', edge_data)
+                                      for edge_data in previous['edges'])
+            self._buildItems(previous_items, True)
+            self.has_been_modified = modified
+            raise
         return True
+
+    def _buildItems(self, items, restore_id):
+        with self.bulkConstruction():
+            self.clear()
+            hashmap = {}
+
+            for key, value in items:
+                if key == 'node':
+                    Node(self).deserialize(value, hashmap, restore_id)
+                elif key == 'edge':
+                    Edge(self).deserialize(value, hashmap, restore_id)
+                elif key == 'id' and restore_id:
+                    self.id = value
@@ -0,0 +1,323 @@
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections import OrderedDict
+
+DEBUG = False
+
+SCENE_BINARY_MAGIC = b'NDSCENE\x00'
+SCENE_BINARY_VERSION = 1
+
+# magic, version, node count, socket count, edge count, string count, padding,
+# then the offsets of the metadata, node, socket, edge and string sections
+_HEADER = struct.Struct('<8sIIIIII5Q')
+
+# one array per column, a node's sockets are the next inputs + outputs rows of the socket table
+NODE_COLUMNS = (('id', 'q'), ('pos_x', 'd'), ('pos_y', 'd'), ('title', 'I'),
+                ('content', 'I'), ('inputs', 'I'), ('outputs', 'I'))
+SOCKET_COLUMNS = (('id', 'q'), ('index', 'i'), ('position', 'i'),
+                  ('multi_edges', 'B'), ('socket_type', 'I'))
+# start/end are rows of the socket table
+EDGE_COLUMNS = (('id', 'q'), ('edge_type', 'i'), ('start', 'I'), ('end', 'I'))
+
+_SECTION_ALIGN = 8
+
+_decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+
+
+def _align(offset):
+    return (offset + _SECTION_ALIGN - 1) // _SECTION_ALIGN * _SECTION_ALIGN
+
+
+def _columnOffsets(columns, count, offset):
+    """ Returns the offset of every column of a table starting at ``offset`` and the offset past it """
+    offsets = {}
+    for name, typecode in columns:
+        offsets[name] = offset
+        offset = _align(offset + count * array(typecode).itemsize)
+    return offsets, offset
+
+
+def isSceneBinary(filename):
+    with open(filename, "rb") as file:
+        return file.read(len(SCENE_BINARY_MAGIC)) == SCENE_BINARY_MAGIC
+
+
+class SceneBinaryWriter():
+    """ Writes a scene as column arrays, titles, socket types and contents are interned strings """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, scene):
+        self._writeItems(scene.serializeHeader(),
+                         (node.serialize() for node in scene.iterNodes()),
+                         (edge.serialize() for edge in scene.iterEdges()))
+
+    def writeSnapshot(self, data):
+        """ Writes already serialized scene data, as returned by Scene.snapshot """
+        header = OrderedDict((key, value) for key, value in data.items()
+                             if key not in ('nodes', 'edges'))
+        self._writeItems(header, data['nodes'], data['edges'])
+
+    def _writeItems(self, header, node_items, edge_items):
+        strings = {}
+
+        def intern(text):
+            ix = strings.get(text)
+            if ix is None:
+                ix = strings[text] = len(strings)
+            return ix
+
+        nodes = dict((name, array(typecode)) for name, typecode in NODE_COLUMNS)
+        sockets = dict((name, array(typecode))
+                       for name, typecode in SOCKET_COLUMNS)
+        edges = dict((name, array(typecode)) for name, typecode in EDGE_COLUMNS)
+        socket_rows = {}
+
+        # serialized data keeps the file and the JSON format in step
+        for data in node_items:
+            nodes['id'].append(data['id'])
+            nodes['pos_x'].append(data['pos_x'])
+            nodes['pos_y'].append(data['pos_y'])
+            nodes['title'].append(intern(data['title']))
+            nodes['content'].append(intern(json.dumps(data['content'])))
+            nodes['inputs'].append(len(data['inputs']))
+            nodes['outputs'].append(len(data['outputs']))
+
+            for socket_data in (data['inputs'] + data['outputs']):
+                socket_rows[socket_data['id']] = len(sockets['id'])
+                sockets['id'].append(socket_data['id'])
+                sockets['index'].append(socket_data['index'])
+                sockets['position'].append(socket_data['position'])
+                sockets['multi_edges'].append(
+                    1 if socket_data['multi_edges'] else 0)
+                sockets['socket_type'].append(
+                    intern(json.dumps(socket_data['socket_type'])))
+
+        for data in edge_items:
+            edges['id'].append(data['id'])
+            edges['edge_type'].append(data['edge_type'])
+            edges['start'].append(socket_rows[data['start']])
+            edges['end'].append(socket_rows[data['end']])
+
+        meta = json.dumps(header).encode('utf-8')
+        blobs = [text.encode('utf-8') for text in strings]
+        string_offsets = array('Q', [0])
+        for blob in blobs:
+            string_offsets.append(string_offsets[-1] + len(blob))
+
+        node_count, socket_count, edge_count = len(
+            nodes['id']), len(sockets['id']), len(edges['id'])
+        meta_offset = _align(_HEADER.size)
+        nodes_offset = _align(meta_offset + 4 + len(meta))
+        _, sockets_offset = _columnOffsets(
+            NODE_COLUMNS, node_count, nodes_offset)
+        _, edges_offset = _columnOffsets(
+            SOCKET_COLUMNS, socket_count, sockets_offset)
+        _, strings_offset = _columnOffsets(
+            EDGE_COLUMNS, edge_count, edges_offset)
+
+        self._written = 0
+        self._write(_HEADER.pack(SCENE_BINARY_MAGIC, SCENE_BINARY_VERSION,
+                                 node_count, socket_count, edge_count, len(blobs), 0,
+                                 meta_offset, nodes_offset, sockets_offset, edges_offset, strings_offset))
+        self._pad()
+        self._write(struct.pack('<I', len(meta)))
+        self._write(meta)
+        self._pad()
+        for columns, table in ((NODE_COLUMNS, nodes), (SOCKET_COLUMNS, sockets), (EDGE_COLUMNS, edges)):
+            for name, typecode in columns:
+                self._writeArray(table[name])
+                self._pad()
+        self._writeArray(string_offsets)
+        for blob in blobs:
+            self._write(blob)
+
+        if DEBUG:
+            print("SceneBinaryWriter:", node_count, "nodes,", edge_count, "edges,",
+                  len(blobs), "strings,", self._written, "bytes")
+
+    def _write(self, data):
+        self.file.write(data)
+        self._written += len(data)
+
+    def _writeArray(self, values):
+        if sys.byteorder != 'little':
+            values = array(values.typecode, values)
+            values.byteswap()
+        self._write(values.tobytes())
+
+    def _pad(self):
+        padding = _align(self._written) - self._written
+        if padding:
+            self._write(b'\x00' * padding)
+
+
+class SceneBinaryReader():
+    """ Reads a binary scene from any buffer, the columns are views into it and cost nothing until read """
+
+    def __init__(self, buffer):
+        self._mmap = None
+        self._view = memoryview(buffer)
+        try:
+            self._readHeader()
+        except Exception:
+            # the buffer cannot be closed while the view is exported
+            self._view.release()
+            raise
+
+    def _readHeader(self):
+        header = _HEADER.unpack_from(self._view, 0)
+        if header[0] != SCENE_BINARY_MAGIC:
+            raise ValueError("Not a binary scene file")
+        if header[1] > SCENE_BINARY_VERSION:
+            raise ValueError(
+                "Binary scene file version %d is not supported" % header[1])
+
+        self.node_count, self.socket_count, self.edge_count, self.string_count = header[2:6]
+        meta_offset, nodes_offset, sockets_offset, edges_offset, strings_offset = header[7:]
+
+        meta_size = struct.unpack_from('<I', self._view, meta_offset)[0]
+        self.meta = _decoder.decode(
+            bytes(self._view[meta_offset + 4:meta_offset + 4 + meta_size]).decode('utf-8'))
+
+        self._node_offsets, nodes_end = _columnOffsets(
+            NODE_COLUMNS, self.node_count, nodes_offset)
+        self._socket_offsets, sockets_end = _columnOffsets(
+            SOCKET_COLUMNS, self.socket_count, sockets_offset)
+        self._edge_offsets, edges_end = _columnOffsets(
+            EDGE_COLUMNS, self.edge_count, edges_offset)
+        self._strings_offset = strings_offset
+        self._string_data = strings_offset + (self.string_count + 1) * 8
+
+        # a truncated file fails here, instead of halfway through items with columns taken
+        size = len(self._view)
+        if max(nodes_end, sockets_end, edges_end, self._string_data) > size or \
+                self._string_data + struct.unpack_from(
+                    '<Q', self._view, self._string_data - 8)[0] > size:
+            raise ValueError("Binary scene file is truncated")
+        self._strings = {}
+        # decoded socket types/contents which are safe to share
+        self._values = {}
+
+    def close(self):
+        """ Any column taken from the reader has to be released before """
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _column(self, offset, typecode, count):
+        view = self._view[offset:offset + count * array(typecode).itemsize]
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return values
+
+    def getNodeColumn(self, name):
+        return self._column(self._node_offsets[name], dict(NODE_COLUMNS)[name], self.node_count)
+
+    def getSocketColumn(self, name):
+        return self._column(self._socket_offsets[name], dict(SOCKET_COLUMNS)[name], self.socket_count)
+
+    def getEdgeColumn(self, name):
+        return self._column(self._edge_offsets[name], dict(EDGE_COLUMNS)[name], self.edge_count)
+
+    def getNodePositions(self):
+        """ Returns the ``(pos_x, pos_y)`` columns, without decoding anything else """
+        return self.getNodeColumn('pos_x'), self.getNodeColumn('pos_y')
+
+    def getString(self, ix):
+        text = self._strings.get(ix)
+        if text is None:
+            start, end = struct.unpack_from(
+                '<QQ', self._view, self._strings_offset + ix * 8)
+            text = self._strings[ix] = bytes(
+                self._view[self._string_data + start:self._string_data + end]).decode('utf-8')
+        return text
+
+    def _getJson(self, ix):
+        if ix in self._values:
+            return self._values[ix]
+        value = _decoder.decode(self.getString(ix))
+        # nodes must not share their content dicts, only plain values are kept
+        if not isinstance(value, (dict, list)):
+            self._values[ix] = value
+        return value
+
+    def _readTable(self, columns, getter):
+        table = {}
+        for name, typecode in columns:
+            column = getter(name)
+            table[name] = column.tolist()
+            if isinstance(column, memoryview):
+                column.release()
+        return table
+
+    def items(self):
+        """ Yields the same ``(key, value)`` pairs as SceneJsonReader.items, as plain dicts """
+        for key, value in self.meta.items():
+            yield key, value
+
+        nodes = self._readTable(NODE_COLUMNS, self.getNodeColumn)
+        sockets = self._readTable(SOCKET_COLUMNS, self.getSocketColumn)
+        socket_ids = sockets['id']
+
+        def socketData(row):
+            return {
+                'id': socket_ids[row],
+                'index': sockets['index'][row],
+                'multi_edges': sockets['multi_edges'][row] != 0,
+                'position': sockets['position'][row],
+                'socket_type': self._getJson(sockets['socket_type'][row]),
+            }
+
+        row = 0
+        for ix in range(self.node_count):
+            input_count, output_count = nodes['inputs'][ix], nodes['outputs'][ix]
+            inputs = [socketData(jx) for jx in range(row, row + input_count)]
+            row += input_count
+            outputs = [socketData(jx) for jx in range(row, row + output_count)]
+            row += output_count
+
+            yield 'node', {
+                'id': nodes['id'][ix],
+                'title': self.getString(nodes['title'][ix]),
+                'pos_x': nodes['pos_x'][ix],
+                'pos_y': nodes['pos_y'][ix],
+                'inputs': inputs,
+                'outputs': outputs,
+                'content': self._getJson(nodes['content'][ix]),
+            }
+
+        edges = self._readTable(EDGE_COLUMNS, self.getEdgeColumn)
+        for ix in range(self.edge_count):
+            yield 'edge', {
+                'id': edges['id'][ix],
+                'edge_type': edges['edge_type'][ix],
+                'start': socket_ids[edges['start'][ix]],
+                'end': socket_ids[edges['end'][ix]],
+            }
+
+
+def mapSceneBinary(filename):
+    """ Opens a binary scene file as a SceneBinaryReader over a read-only memory map """
+    with open(filename, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        reader = SceneBinaryReader(buffer)
+    except Exception:
+        buffer.close()
+        raise
+    reader._mmap = buffer
+    return reader
@@ -1,10 +1,14 @@
+import io
 from collections import OrderedDict
-from nodeeditor.NodeGraphicsEdge import QDMGraphicsEdge
 from nodeeditor.NodeNode import Node
 from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneBinary import SceneBinaryReader, SceneBinaryWriter
 
 DEBUG = False
 
+# clipboard format of copied nodes/edges, put next to the JSON text
+CLIPBOARD_MIME_TYPE = 'application/x-nodeeditor-clipboard'
+
 
 class SceneClipBoard():
     def __init__(self, scene):
@@ -16,12 +20,12 @@ class SceneClipBoard():
 
         sel_nodes, sel_edges, sel_sockets = [], [], {}
 
-        for item in self.scene.graphicsScene.selectedItems():
+        for item in self.scene.getSelectedItems():
             if hasattr(item, 'node'):
                 sel_nodes.append(item.node.serialize())
                 for socket in (item.node.inputs+item.node.outputs):
                     sel_sockets[socket.id] = socket
-            elif isinstance(item, QDMGraphicsEdge):
+            elif hasattr(item, 'edge'):
                 sel_edges.append(item.edge)
 
         if DEBUG:
@@ -29,20 +33,13 @@ class SceneClipBoard():
             print("  EDGES\n    ", sel_edges)
             print("  SOCKETS\n", sel_sockets)
 
-        edges_to_remove = []
-        for edge in sel_edges:
-            if edge.start_socket.id in sel_sockets and edge.end_socket.id in sel_sockets:
-                pass
-            else:
-                if DEBUG:
-                    print('edge', edge, "is not connected with both sides")
-                edges_to_remove.append(edge)
-        for edge in edges_to_remove:
-            sel_edges.remove(edge)
-
+        # only edges with both ends among the copied nodes are kept
         edges_final = []
         for edge in sel_edges:
-            edges_final.append(edge.serialize())
+            if edge.start_socket.id in sel_sockets and edge.end_socket.id in sel_sockets:
+                edges_final.append(edge.serialize())
+            elif DEBUG:
+                print('edge', edge, "is not connected with both sides")
 
         if DEBUG:
             print("our final edge list:", edges_final)
@@ -53,14 +50,34 @@ class SceneClipBoard():
         ])
 
         if delete:
-            self.scene.graphicsScene.views()[0].deleteSelected()
-            self.scene.history.storeHistory(
-                "Cut out elements from scene", setModified=True)
+            with self.scene.history.transaction("Cut out elements from scene", setModified=True):
+                self.scene.graphicsScene.views()[0].deleteSelected()
+
+        return data
+
+    def encode(self, data):
+        """ Packs data from serializeSelected in the binary scene format, much smaller and faster to read than JSON """
+        file = io.BytesIO()
+        SceneBinaryWriter(file).writeSnapshot(data)
+        return file.getvalue()
 
+    def decode(self, payload):
+        """ Unpacks what encode returned into the data deserializeFromClipboard takes """
+        data = OrderedDict([
+            ('nodes', []),
+            ('edges', [])
+        ])
+        with SceneBinaryReader(payload) as reader:
+            for key, value in reader.items():
+                if key == 'node':
+                    data['nodes'].append(value)
+                elif key == 'edge':
+                    data['edges'].append(value)
         return data
 
     def deserializeFromClipboard(self, data):
-        print("deserializating from clipboard,data:", data)
+        if DEBUG:
+            print("deserializating from clipboard,data:", data)
 
         hashmap = {}
 
@@ -84,19 +101,21 @@ class SceneClipBoard():
         offset_x = mouse_scene_pos.x() - bbox_center_x
         offset_y = mouse_scene_pos.y() - bbox_center_y
 
-        for node_data in data['nodes']:
-            new_node = Node(self.scene)
-            new_node.deserialize(node_data, hashmap, restore_id=False)
-
-            # readjust the new node's position
-            pos = new_node.pos
-            new_node.setPos(pos.x() + offset_x, pos.y() + offset_y)
-
-        # create each edge
-        if 'edges' in data:
-            for edge_data in data['edges']:
-                new_edge = Edge(self.scene)
-                new_edge.deserialize(edge_data, hashmap, restore_id=False)
+        with self.scene.bulkConstruction():
+            for node_data in data['nodes']:
+                # built right at the new position, instead of being moved there
+                node_data = OrderedDict(node_data)
+                node_data['pos_x'] += offset_x
+                node_data['pos_y'] += offset_y
+
+                new_node = Node(self.scene)
+                new_node.deserialize(node_data, hashmap, restore_id=False)
+
+            # create each edge
+            if 'edges' in data:
+                for edge_data in data['edges']:
+                    new_edge = Edge(self.scene)
+                    new_edge.deserialize(edge_data, hashmap, restore_id=False)
 
         # store history
         self.scene.history.storeHistory("Pasted elements in scene")
@@ -0,0 +1,279 @@
+DEBUG = False
+
+
+class SceneEvaluator():
+    """ Evaluates the nodes of a scene along the edges, from outputs to the inputs they connect to.
+    Nodes are marked dirty when their content or incoming edges change, along with everything
+    downstream of them, only the dirty nodes are computed again, see Node.compute """
+
+    def __init__(self, scene):
+        self.scene = scene
+
+        # node -> None, dict used as an ordered set. Everything downstream of a dirty node is dirty too
+        self._dirty = {}
+        # node -> list of values, one per output socket
+        self._values = {}
+        # node -> exception raised computing it or a node upstream of it
+        self._errors = {}
+        # node -> position in topological order, None until somebody needs it
+        self._rank = None
+        # nodes on a cycle, ranked as one with the rest of their cycle
+        self._cyclic = set()
+
+        self._dirty_listeners = []
+        self._evaluated_listeners = []
+        self._progress_listeners = []
+
+    def addDirtyListener(self, callback):
+        """ Called when a node gets dirty while none was """
+        self._dirty_listeners.append(callback)
+
+    def addEvaluatedListener(self, callback):
+        """ Called with the nodes computed, after each evaluation """
+        self._evaluated_listeners.append(callback)
+
+    def addProgressListener(self, callback):
+        """ Called with a node and how much of it (0..1) is computed, from the thread computing it """
+        self._progress_listeners.append(callback)
+
+    def reportProgress(self, node, fraction):
+        for callback in self._progress_listeners:
+            callback(node, fraction)
+
+    def isDirty(self, node=None):
+        if node is None:
+            return len(self._dirty) > 0
+        return node in self._dirty
+
+    def getDirtyNodes(self):
+        return list(self._dirty)
+
+    def getValues(self, node):
+        """ Values of the output sockets of the node, None for those not computed """
+        values = self._values.get(node, ())
+        return [values[ix] if ix < len(values) else None for ix in range(len(node.outputs))]
+
+    def getOutputValue(self, socket):
+        values = self._values.get(socket.node, ())
+        return values[socket.index] if socket.index < len(values) else None
+
+    def getError(self, node):
+        return self._errors.get(node)
+
+    def getSources(self, socket):
+        """ Output sockets the input socket is connected to """
+        return [peer for peer in socket.getPeers() if not peer.is_input]
+
+    def getDownstreamNodes(self, node):
+        nodes = {}
+        for socket in node.outputs:
+            for peer in socket.getPeers():
+                if peer.is_input:
+                    nodes[peer.node] = None
+        return list(nodes)
+
+    def getUpstreamNodes(self, node):
+        nodes = {}
+        for socket in node.inputs:
+            for source in self.getSources(socket):
+                nodes[source.node] = None
+        return list(nodes)
+
+    def markDirty(self, node):
+        """ Marks the node and its downstream cone to be computed again """
+        was_dirty = len(self._dirty) > 0
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            # a dirty node has its downstream cone dirty already
+            if node in self._dirty or not self.scene.hasNode(node):
+                continue
+            self._dirty[node] = None
+            pending.extend(self.getDownstreamNodes(node))
+
+        if not was_dirty and self._dirty:
+            for callback in self._dirty_listeners:
+                callback()
+
+    def invalidateOrder(self):
+        self._rank = None
+
+    def onNodeAdded(self, node):
+        self.invalidateOrder()
+        self.markDirty(node)
+
+    def onNodeRemoved(self, node):
+        self.invalidateOrder()
+        self._dirty.pop(node, None)
+        self._values.pop(node, None)
+        self._errors.pop(node, None)
+
+    def onEdgeLinked(self, edge):
+        """ Called when the edge connects two sockets and when it disconnects them """
+        self.invalidateOrder()
+        for socket in (edge.start_socket, edge.end_socket):
+            if socket.is_input:
+                self.markDirty(socket.node)
+
+    def getOrder(self):
+        """ Nodes in topological order, the ones on a cycle are left out """
+        rank = self._getRank()
+        return sorted((node for node in rank if node not in self._cyclic), key=rank.get)
+
+    def _getRank(self):
+        if self._rank is not None:
+            return self._rank
+
+        nodes = self.scene.iterNodes()
+        incoming = {}
+        for node in nodes:
+            incoming[node] = len(self.getUpstreamNodes(node))
+        ready = [node for node in nodes if incoming[node] == 0]
+
+        self._rank = {}
+        while ready:
+            node = ready.pop()
+            self._rank[node] = len(self._rank)
+            for downstream in self.getDownstreamNodes(node):
+                incoming[downstream] -= 1
+                if incoming[downstream] == 0:
+                    ready.append(downstream)
+
+        self._cyclic = set()
+        if len(self._rank) != len(nodes):
+            self._rankCycles([node for node in nodes if node not in self._rank])
+            if DEBUG:
+                print("SceneEvaluator:", len(self._cyclic), "nodes on cycles")
+        return self._rank
+
+    def _rankCycles(self, nodes):
+        """ Ranks the nodes left out by _getRank, those on cycles or downstream of one. The strongly
+        connected components are found with Tarjan's algorithm, the nodes of a component get
+        consecutive ranks, the components come out downstream first """
+        index, lowlink, on_stack = {}, {}, set()
+        stack, components = [], []
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.getDownstreamNodes(root)))]
+            while work:
+                node, downstream = work[-1]
+                for next_node in downstream:
+                    if next_node not in index:
+                        index[next_node] = lowlink[next_node] = len(index)
+                        stack.append(next_node)
+                        on_stack.add(next_node)
+                        work.append(
+                            (next_node, iter(self.getDownstreamNodes(next_node))))
+                        break
+                    if next_node in on_stack:
+                        lowlink[node] = min(lowlink[node], index[next_node])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member is node:
+                                break
+                        components.append(component)
+
+        for component in reversed(components):
+            if len(component) > 1 or component[0] in self.getDownstreamNodes(component[0]):
+                self._cyclic.update(component)
+            for node in component:
+                self._rank[node] = len(self._rank)
+
+    def takeDirtyNodes(self, nodes=None):
+        """ Dirty nodes to compute, in topological order, and no longer dirty. With ``nodes``
+        given, only those and the dirty nodes upstream of them. Nodes on a cycle get an error,
+        the ones downstream of a cycle get it from getInputValues when they are computed """
+        if nodes is None:
+            dirty = list(self._dirty)
+        else:
+            dirty, pending = {}, list(nodes)
+            while pending:
+                node = pending.pop()
+                if node in self._dirty and node not in dirty:
+                    dirty[node] = None
+                    pending.extend(self.getUpstreamNodes(node))
+            dirty = list(dirty)
+
+        rank = self._getRank()
+        for node in dirty:
+            del self._dirty[node]
+            if node in self._cyclic:
+                self._values.pop(node, None)
+                self._errors[node] = RecursionError(
+                    "node %s is on a cycle" % node)
+        return sorted((node for node in dirty if node not in self._cyclic), key=rank.get)
+
+    def getInputValues(self, node):
+        """ What node.compute is given, with the values computed so far.
+        Raises the error of an upstream node which could not be computed """
+        inputs = []
+        for socket in node.inputs:
+            values = []
+            for source in self.getSources(socket):
+                error = self._errors.get(source.node)
+                if error is not None:
+                    raise error
+                values.append(self.getOutputValue(source))
+            if socket.is_multi_edges:
+                inputs.append(values)
+            else:
+                inputs.append(values[0] if values else None)
+        return inputs
+
+    def computeNode(self, node, inputs):
+        """ Returns the output values of the node and the error computing them """
+        try:
+            values = node.compute(inputs)
+        except Exception as e:
+            return None, e
+        if values is None:
+            values = []
+        elif len(node.outputs) == 1 and not isinstance(values, (list, tuple)):
+            values = [values]
+        return list(values), None
+
+    def setResult(self, node, values, error):
+        if error is not None:
+            if error is not self._errors.get(node) and DEBUG:
+                print("SceneEvaluator: computing", node, "failed:", error)
+            self._values.pop(node, None)
+            self._errors[node] = error
+        else:
+            self._values[node] = values
+            self._errors.pop(node, None)
+
+    def evaluate(self, nodes=None):
+        """ Computes the dirty nodes, or with ``nodes`` given, what is needed for their values.
+        Returns the nodes computed """
+        order = self.takeDirtyNodes(nodes)
+        for node in order:
+            try:
+                inputs = self.getInputValues(node)
+            except Exception as e:
+                # failed upstream, the error is passed on
+                self.setResult(node, None, e)
+                continue
+            self.setResult(node, *self.computeNode(node, inputs))
+
+        self.notifyEvaluated(order)
+        return order
+
+    def notifyEvaluated(self, nodes):
+        if DEBUG:
+            print("SceneEvaluator: computed", len(nodes), "nodes")
+        if nodes:
+            for callback in self._evaluated_listeners:
+                callback(nodes)
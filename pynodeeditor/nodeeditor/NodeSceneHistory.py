@@ -1,20 +1,60 @@
 import traceback
-from nodeeditor.NodeGraphicsEdge import QDMGraphicsEdge
+from contextlib import contextmanager
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneHistoryPacker import SceneHistoryPacker
 DEBUG = True
 
+# every stamp holds a full serialized copy of the scene
+HISTORY_MODE_SNAPSHOT = 1
+# every stamp holds only the states of the nodes/edges changed by it
+HISTORY_MODE_DELTA = 2
+
+# bytes of stamps kept in memory, the oldest are dropped (or spilled) beyond it
+HISTORY_MEMORY_BUDGET = 64 * 1024 * 1024
+# bytes of stamps kept in the spill file, when spilling
+HISTORY_SPILL_BUDGET = 1024 * 1024 * 1024
+# stamps on each side of the current one which keep their payload unpacked
+HISTORY_UNPACKED_STAMPS = 4
+
 
 class SceneHistory():
     def __init__(self, scene):
         self.scene = scene
 
+        self.mode = HISTORY_MODE_DELTA
+        self.packer = SceneHistoryPacker()
         self.clear()
-        self.history_limit = 32
+        # number of stamps kept, None leaves it to the budgets
+        self.history_limit = None
+        self.memory_budget = HISTORY_MEMORY_BUDGET
+        # old stamps go to a temporary file instead of being dropped
+        self.spill_to_disk = False
+        self.spill_budget = HISTORY_SPILL_BUDGET
+        # selection changes update the current stamp instead of getting their own
+        self.merge_selection = False
+
+        # nesting depth of transaction, whether storeHistory was called in it
+        self._transaction_depth = 0
+        self._transaction_stored = False
+        self._transaction_modified = False
 
         self._history_modified_listeners = []
+        self._states_collected_listeners = []
 
     def clear(self):
         self.history_stack = []
         self.history_current_step = -1
+        self.packer.reset()
+
+        # serialized nodes/edges as they were at the last stamp, keyed by id
+        self._shadow_nodes = {}
+        self._shadow_edges = {}
+        # nodes/edges touched since the last stamp (dict used as ordered set)
+        self._changed_items = {}
+        # changes collected since the last stamp, to be part of the next one
+        self._carried_nodes = {}
+        self._carried_edges = {}
 
     def storeInitialHistoryStamp(self):
         self.storeHistory("Initial History Stamp")
@@ -29,23 +69,58 @@ class SceneHistory():
         if DEBUG:
             print("UNDO")
 
-        if self.canRedo():
-            self.history_current_step -= 1
-            self.restoreHistory()
+        if self.canUndo():
+            self.revertPendingChanges()
+            self.packer.load(self.history_stack[self.history_current_step])
+            if self.history_stack[self.history_current_step].get('selection_only'):
+                # the scene is the same at both stamps
+                self.history_current_step -= 1
+                self.restoreSelection(
+                    self.history_stack[self.history_current_step]['selection'])
+                self.onHistoryRestored()
+                self.manageMemory()
+                return
+            if 'snapshot' not in self.history_stack[self.history_current_step]:
+                self.revertHistoryStamp(
+                    self.history_stack[self.history_current_step])
+                self.history_current_step -= 1
+                self.restoreSelection(
+                    self.history_stack[self.history_current_step]['selection'])
+                self.onHistoryRestored()
+            else:
+                self.history_current_step -= 1
+                self.restoreHistory()
             self.scene.has_been_modified = True
+            self.manageMemory()
 
     def redo(self):
         if DEBUG:
             print("REDO")
 
         if self.canRedo():
+            self.revertPendingChanges()
             self.history_current_step += 1
+            if self.history_stack[self.history_current_step].get('selection_only'):
+                self.restoreSelection(
+                    self.history_stack[self.history_current_step]['selection'])
+                self.onHistoryRestored()
+                self.manageMemory()
+                return
             self.restoreHistory()
             self.scene.has_been_modified = True
+            self.manageMemory()
 
     def addHistoryModifiedListener(self, callback):
         self._history_modified_listeners.append(callback)
 
+    def addStatesCollectedListener(self, callback):
+        """ ``callback(nodes, edges)`` gets the deltas of collectChanges, whenever the shadow changed """
+        self._states_collected_listeners.append(callback)
+
+    def onHistoryRestored(self):
+        for callback in self._history_modified_listeners:
+            callback()
+
     def restoreHistory(self):
         if DEBUG:
             print("Restoring history",
@@ -53,10 +128,25 @@ class SceneHistory():
                   "(%d)" % len(self.history_stack))
 
         self.restoreHistoryStamp(self.history_stack[self.history_current_step])
-        for callback in self._history_modified_listeners:
-            callback()
+        self.onHistoryRestored()
+
+    def storeSelection(self, desc):
+        """ Records a selection change, nothing gets serialized for it """
+        if self.merge_selection and self.history_stack and not self.hasPendingChanges():
+            self.history_stack[self.history_current_step]['selection'] = self.getSelectionState()
+            if DEBUG:
+                print("Merged selection into",
+                      '"%s"' % self.history_stack[self.history_current_step]['desc'])
+            return
+        self.storeHistory(desc, selection_only=True)
+
+    def storeHistory(self, desc, setModified=False, selection_only=False):
+        if self._transaction_depth:
+            # the transaction stores a single stamp once it is over
+            self._transaction_stored = True
+            self._transaction_modified = self._transaction_modified or setModified
+            return
 
-    def storeHistory(self, desc, setModified=False):
         if setModified:
             self.scene.has_been_modified = True
 
@@ -70,56 +160,428 @@ class SceneHistory():
             self.history_stack = self.history_stack[0:self.history_current_step+1]
 
         # history is outside of the limits
-        if self.history_current_step+1 >= self.history_limit:
-            self.history_stack = self.history_stack[1:]
-            self.history_current_step -= 1
+        if self.history_limit is not None:
+            while self.history_stack and self.history_current_step+1 >= self.history_limit:
+                self.dropOldestStamp()
 
-        hs = self.createHistoryStamp(desc)
+        hs = self.createHistoryStamp(desc, selection_only)
 
         self.history_stack.append(hs)
         self.history_current_step += 1
+        self.packer.schedule(hs)
+        self.manageMemory()
         if DEBUG:
             print("  -- setting step to:", self.history_current_step)
         for callback in self._history_modified_listeners:
             callback()
 
-    def createHistoryStamp(self, desc):
+    def markChanged(self, item):
+        """ Called whenever a node or an edge is added, removed or modified """
+        self._changed_items[item] = None
+
+    def getSelectionState(self):
         sel_obj = {
             'nodes': [],
             'edges': []
         }
-        for item in self.scene.graphicsScene.selectedItems():
-            if hasattr("item", 'node'):
+        for item in self.scene.getSelectedItems():
+            if hasattr(item, 'node'):
                 sel_obj['nodes'].append(item.node.id)
-            elif isinstance(item, QDMGraphicsEdge):
+            elif hasattr(item, 'edge'):
                 sel_obj['edges'].append(item.edge.id)
+        return sel_obj
+
+    def createHistoryStamp(self, desc, selection_only=False):
+        sel_obj = self.getSelectionState()
+
+        # with changes not stored yet, the scene differs from the previous stamp
+        if selection_only and self.history_stack and not self.hasPendingChanges():
+            # the scene states are the ones of the stamps before
+            return {
+                'desc': desc,
+                'selection': sel_obj,
+                'selection_only': True
+            }
+
+        if not self.history_stack:
+            # the first stamp is the base every delta is stacked on
+            self.resetShadow()
+        self.carryChanges()
+        nodes, edges = self._carried_nodes, self._carried_edges
+        self.dropCarriedChanges()
 
         history_stamp = {
             'desc': desc,
-            'snapshot': self.scene.serialize(),
             'selection': sel_obj
         }
+        if self.mode == HISTORY_MODE_DELTA:
+            history_stamp['nodes'] = nodes
+            history_stamp['edges'] = edges
+        else:
+            # unchanged nodes/edges share their states with the previous snapshot
+            history_stamp['snapshot'] = self.scene.snapshot()
 
         return history_stamp
 
+    def dropOldestStamp(self):
+        dropped = self.history_stack.pop(0)
+        self.history_current_step -= 1
+
+        first = self.history_stack[0] if self.history_stack else None
+        if first is not None and first.get('selection_only') and self.mode == HISTORY_MODE_SNAPSHOT:
+            # becomes a full stamp, with the snapshot it was taken on
+            del first['selection_only']
+            for key in ('snapshot', '_size', '_packed', '_spilled'):
+                if key in dropped:
+                    first[key] = dropped[key]
+            self.packer.schedule(first)
+
+    def manageMemory(self):
+        """ Packs the payload of stamps away from the current one, then keeps history within its budgets """
+        packer = self.packer
+        packer.collect()
+        for ix, stamp in enumerate(self.history_stack):
+            if abs(ix - self.history_current_step) > HISTORY_UNPACKED_STAMPS:
+                packer.packOut(stamp)
+
+        memory = sum(packer.memorySize(stamp) for stamp in self.history_stack)
+        if self.spill_to_disk:
+            spilled = sum(packer.spilledSize(stamp)
+                          for stamp in self.history_stack)
+            for stamp in self.history_stack:
+                if memory <= self.memory_budget:
+                    break
+                freed = packer.spill(stamp)
+                memory -= freed
+                spilled += freed
+            while self.history_current_step > 0 and spilled > self.spill_budget:
+                # the next stamp may take over the payload of the dropped one, see dropOldestStamp
+                spilled -= packer.spilledSize(self.history_stack[0]) + \
+                    packer.spilledSize(self.history_stack[1])
+                self.dropOldestStamp()
+                spilled += packer.spilledSize(self.history_stack[0])
+        else:
+            while self.history_current_step > 0 and memory > self.memory_budget:
+                memory -= packer.memorySize(self.history_stack[0]) + \
+                    packer.memorySize(self.history_stack[1])
+                self.dropOldestStamp()
+                memory += packer.memorySize(self.history_stack[0])
+        packer.compact(self.history_stack)
+
+    def getMemoryStats(self):
+        """ Counts and sizes in bytes of the stamps, see SceneHistoryPacker for how they are measured """
+        self.packer.collect()
+        stats = self.packer.getStats(self.history_stack)
+        stats['memory_budget'] = self.memory_budget
+        stats['spill_budget'] = self.spill_budget if self.spill_to_disk else 0
+        return stats
+
+    def resetShadow(self):
+        self._changed_items = {}
+        self.dropCarriedChanges()
+        self._shadow_nodes = {}
+        self._shadow_edges = {}
+        for node in self.scene.iterNodes():
+            self._shadow_nodes[node.id] = node.serialize()
+        for edge in self.scene.iterEdges():
+            if edge.end_socket is not None:
+                self._shadow_edges[edge.id] = edge.serialize()
+
+    def hasPendingChanges(self):
+        """ Whether anything changed since the last stamp """
+        return bool(self._changed_items or self._carried_nodes or self._carried_edges)
+
+    def carryChanges(self):
+        """ Collects the changes made so far into the ones the next stamp will hold """
+        nodes, edges = self.collectChanges()
+        self._carried_nodes = self._mergeDeltas(self._carried_nodes, nodes)
+        self._carried_edges = self._mergeDeltas(self._carried_edges, edges)
+
+    def dropCarriedChanges(self):
+        self._carried_nodes = {}
+        self._carried_edges = {}
+
+    def revertPendingChanges(self):
+        """ Brings the scene back to the current stamp, the changes not stored are lost like with snapshots """
+        self.carryChanges()
+        nodes, edges = self._carried_nodes, self._carried_edges
+        self.dropCarriedChanges()
+        if nodes or edges:
+            self.restoreStates(
+                dict((k, v[0]) for k, v in nodes.items()),
+                dict((k, v[0]) for k, v in edges.items()))
+
+    def _mergeDeltas(self, first, second):
+        """ One ``{id: (before, after)}`` delta doing what ``first`` followed by ``second`` does """
+        if not first:
+            return second
+        merged = dict(first)
+        for item_id, (before, after) in second.items():
+            if item_id in merged:
+                before = merged[item_id][0]
+            if before == after:
+                # back to how it was
+                merged.pop(item_id, None)
+            else:
+                merged[item_id] = (before, after)
+        return merged
+
+    @contextmanager
+    def transaction(self, desc, setModified=False):
+        """ Makes everything changed and stored in the block one stamp, stored when the outermost
+        transaction is over. The scene is put off like in Scene.bulkConstruction. If the block raises,
+        whatever it changed is reverted, from the states history keeps anyway """
+        # changes made before start from the shadow, the block can be reverted to it
+        self.carryChanges()
+        outermost = self._transaction_depth == 0
+        if outermost:
+            self._transaction_stored = False
+            self._transaction_modified = False
+
+        self._transaction_depth += 1
+        try:
+            # the index stays on, a transaction mostly touches a few items of a large scene
+            with self.scene.bulkConstruction(suspend_index=False):
+                yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            self.rollback()
+            raise
+        self._transaction_depth -= 1
+
+        if outermost:
+            self.carryChanges()
+        if outermost and (self._transaction_stored or self.hasPendingChanges()):
+            self.storeHistory(desc, setModified or self._transaction_modified,
+                              selection_only=not self.hasPendingChanges())
+
+    def rollback(self):
+        """ Reverts the changes not carried yet, see carryChanges """
+        if DEBUG:
+            print("Rolling back", len(self._changed_items), "changed items")
+        nodes, edges = self.collectChanges()
+        self.restoreStates(
+            dict((k, v[0]) for k, v in nodes.items()),
+            dict((k, v[0]) for k, v in edges.items()))
+
+    def collectChanges(self):
+        """ Returns ``(nodes, edges)`` as ``{id: (before, after)}`` for every node/edge
+        changed since the last stamp, ``None`` standing for a missing item """
+        live_nodes, live_edges = {}, {}
+        for item in self._changed_items:
+            if isinstance(item, Node):
+                state = item.serialize() if self.scene.hasNode(item) else None
+                states, shadow = live_nodes, self._shadow_nodes
+            elif isinstance(item, Edge):
+                state = item.serialize() if self.scene.hasEdge(item) and \
+                    item.end_socket is not None else None
+                states, shadow = live_edges, self._shadow_edges
+            else:
+                continue
+            # a dead object must not hide a live one sharing its id (undo re-creates ids)
+            if state is not None or item.id not in states:
+                states[item.id] = state
+        self._changed_items = {}
+
+        nodes = self._diffShadow(self._shadow_nodes, live_nodes)
+        edges = self._diffShadow(self._shadow_edges, live_edges)
+        if nodes or edges:
+            for callback in self._states_collected_listeners:
+                callback(nodes, edges)
+        return nodes, edges
+
+    def _diffShadow(self, shadow, states):
+        delta = {}
+        for item_id, after in states.items():
+            before = shadow.get(item_id)
+            if before == after:
+                continue
+            delta[item_id] = (before, after)
+            if after is None:
+                del shadow[item_id]
+            else:
+                shadow[item_id] = after
+        return delta
+
+    def serializeStates(self):
+        """ Returns the serialized ``(nodes, edges)`` of the scene, like in Scene.serialize. The ones
+        not changed since the last stamp are taken from the shadow instead of being serialized again """
+        # an empty history has no shadow yet
+        changed = self._changed_items if self.history_stack else None
+
+        nodes, edges = [], []
+        for node in self.scene.iterNodes():
+            data = None
+            # content widgets tell about edits once editing is over, see QDMNodeContentWidget.setEditingFlag
+            if changed is not None and node not in changed and not node.hasContent():
+                data = self._shadow_nodes.get(node.id)
+            nodes.append(data if data is not None else node.serialize())
+        for edge in self.scene.iterEdges():
+            # an edge being dragged is not part of the scene yet
+            if edge.end_socket is None:
+                continue
+            data = None
+            if changed is not None and edge not in changed:
+                data = self._shadow_edges.get(edge.id)
+            edges.append(data if data is not None else edge.serialize())
+        return nodes, edges
+
+    def restoreStates(self, nodes, edges):
+        """ Brings the nodes/edges with the given ids to the given serialized states,
+        ``None`` meaning the item should not exist """
+        # changes not stored yet are left out of history, like with snapshots
+        self.collectChanges()
+
+        scene = self.scene
+
+        with scene.bulkConstruction():
+            # edges first, so they never point to removed sockets
+            for edge_id, data in edges.items():
+                edge = scene.getEdgeById(edge_id)
+                if data is None and edge is not None:
+                    edge.remove()
+
+            for node_id, data in nodes.items():
+                node = scene.getNodeById(node_id)
+                if node is None:
+                    continue
+                if data is None or not self._canUpdateNode(node, data):
+                    node.remove()
+
+            for node_id, data in nodes.items():
+                if data is None:
+                    continue
+                node = scene.getNodeById(node_id)
+                if node is not None:
+                    self._updateNode(node, data)
+                else:
+                    Node(scene).deserialize(data, {}, restore_id=True)
+
+            for edge_id, data in edges.items():
+                if data is None:
+                    continue
+                hashmap = {
+                    data['start']: scene.getSocketById(data['start']),
+                    data['end']: scene.getSocketById(data['end']),
+                }
+                edge = scene.getEdgeById(edge_id)
+                if edge is not None and edge.end_socket is not None:
+                    self._updateEdge(edge, data, hashmap)
+                else:
+                    Edge(scene).deserialize(data, hashmap, restore_id=True)
+
+        # picks up whatever the restore touched, so the shadow matches the scene
+        self.collectChanges()
+
+    def restoreSnapshot(self, snapshot):
+        """ Restores a full snapshot by touching only the nodes/edges which differ from it """
+        # the shadow mirrors the live scene, so diffing needs no serialization
+        self.collectChanges()
+        nodes = self._diffSnapshot(self._shadow_nodes, snapshot['nodes'])
+        edges = self._diffSnapshot(self._shadow_edges, snapshot['edges'])
+
+        self.scene.id = snapshot['id']
+        self.restoreStates(nodes, edges)
+
+    def _diffSnapshot(self, shadow, items):
+        target = dict((data['id'], data) for data in items)
+        states = dict((item_id, None)
+                      for item_id in shadow if item_id not in target)
+        for item_id, data in target.items():
+            if shadow.get(item_id) != data:
+                states[item_id] = data
+        return states
+
+    def _canUpdateNode(self, node, data):
+        # sockets are never edited in place, a different layout means a new node
+        current = node.serialize()
+        return current['inputs'] == data['inputs'] and current['outputs'] == data['outputs']
+
+    def _updateNode(self, node, data):
+        node.setPos(data['pos_x'], data['pos_y'])
+        if node.title != data['title']:
+            node.title = data['title']
+        node.setContentData(data['content'])
+        node.updateConnectedEdges()
+
+    def _updateEdge(self, edge, data, hashmap):
+        start_socket, end_socket = hashmap[data['start']], hashmap[data['end']]
+        if edge.start_socket is not start_socket:
+            edge.start_socket = start_socket
+        if edge.end_socket is not end_socket:
+            edge.end_socket = end_socket
+        if edge.edge_type != data['edge_type']:
+            edge.edge_type = data['edge_type']
+        else:
+            edge.updatePositions()
+
+    def applyHistoryStamp(self, history_stamp):
+        """ Re-does a delta stamp """
+        self.packer.load(history_stamp)
+        self.restoreStates(
+            dict((k, v[1]) for k, v in history_stamp['nodes'].items()),
+            dict((k, v[1]) for k, v in history_stamp['edges'].items()))
+
+    def revertHistoryStamp(self, history_stamp):
+        """ Un-does a delta stamp """
+        if DEBUG:
+            print("Reverting", '"%s"' % history_stamp['desc'])
+
+        self.packer.load(history_stamp)
+        try:
+            self.restoreStates(
+                dict((k, v[0]) for k, v in history_stamp['nodes'].items()),
+                dict((k, v[0]) for k, v in history_stamp['edges'].items()))
+        except Exception as e:
+            print("EXCEPTION:", e)
+            traceback.print_tb(e.__traceback__)
+
+    def restoreSelection(self, selection):
+        if self.scene.graphicsScene is None:
+            return
+        self.scene.graphicsScene.clearSelection()
+
+        for edge_id in selection['edges']:
+            edge = self.scene.getEdgeById(edge_id)
+            if edge is not None:
+                edge.graphicsEdge.setSelected(True)
+        for node_id in selection['nodes']:
+            node = self.scene.getNodeById(node_id)
+            if node is not None:
+                node.graphicsNode.setSelected(True)
+
+        self.scene._last_selected_items = self.scene.getSelectedItems()
+
+    def findSnapshotStamp(self, history_stamp):
+        """ The stamp holding the scene states of a selection-only stamp """
+        found = None
+        for stamp in self.history_stack:
+            if stamp is history_stamp:
+                break
+            if not stamp.get('selection_only'):
+                found = stamp
+        return found
+
     def restoreHistoryStamp(self, history_stamp):
         if DEBUG:
-            print("RHS: ", history_stamp)
+            print("RHS: ", history_stamp['desc'])
 
         try:
-            self.scene.deserialize(history_stamp['snapshot'])
-
-            for edge_id in history_stamp['selection']['edges']:
-                for edge in self.scene.edges:
-                    if edge.id == edge_id:
-                        edge.graphicsEdge.setSelected(True)
-                        break
-
-            for node_id in history_stamp['selection']['nodes']:
-                for node in self.scene.nodes:
-                    if node.id == node_id:
-                        node.graphicsNode.setSelected(True)
-                        break
+            states_stamp = history_stamp
+            if history_stamp.get('selection_only'):
+                # nothing to apply for deltas, snapshots have to be restored from the stamps before
+                states_stamp = None
+                if self.mode == HISTORY_MODE_SNAPSHOT:
+                    states_stamp = self.findSnapshotStamp(history_stamp)
+
+            if states_stamp is not None:
+                self.packer.load(states_stamp)
+                if 'snapshot' in states_stamp:
+                    self.restoreSnapshot(states_stamp['snapshot'])
+                else:
+                    self.applyHistoryStamp(states_stamp)
+
+            self.restoreSelection(history_stamp['selection'])
         except Exception as e:
             print("EXCEPTION:", e)
             traceback.print_tb(e.__traceback__)
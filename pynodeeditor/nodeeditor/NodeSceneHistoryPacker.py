@@ -0,0 +1,197 @@
+import zlib
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEBUG = False
+
+# zlib level the stamps are compressed with, they are written far more often than read
+HISTORY_COMPRESS_LEVEL = 1
+# bytes counted for a stamp besides its payload (desc, selection, dict itself)
+HISTORY_STAMP_OVERHEAD = 512
+# the spill file is rewritten once it holds this many times the bytes still used
+HISTORY_SPILL_GARBAGE_RATIO = 2
+# bytes counted for a node/edge state of a stamp still being packed, until packed stamps tell better
+HISTORY_STATE_SIZE_ESTIMATE = 256
+
+# stamp keys holding the serialized scene states
+_PAYLOAD_KEYS = ('nodes', 'edges', 'snapshot')
+
+
+def _countStates(payload):
+    """ Number of node/edge states in a stamp payload, without serializing them """
+    count = 0
+    for key in ('nodes', 'edges'):
+        for before, after in payload.get(key, {}).values():
+            count += (before is not None) + (after is not None)
+    snapshot = payload.get('snapshot')
+    if snapshot is not None:
+        count += len(snapshot['nodes']) + len(snapshot['edges'])
+    return count
+
+
+def _pack(payload):
+    data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+    return len(data), zlib.compress(data, HISTORY_COMPRESS_LEVEL)
+
+
+class SceneHistoryPacker():
+    """ Keeps compressed copies of history stamps, made on a worker thread, so the stamps
+    can drop their payload and get it back when they are needed again.
+    Stamp sizes are those of the pickled payload, the live objects take a few times more """
+
+    def __init__(self):
+        self._executor = None
+        # stamp id -> (stamp, future, number of states) of the stamps being packed
+        self._pending = {}
+        # states and bytes of the stamps packed so far, to estimate the size of pending ones
+        self._packed_states = 0
+        self._packed_bytes = 0
+        self._spill_file = None
+        self._spill_size = 0
+
+    def reset(self):
+        # results of stamps being packed are not waited for, just dropped
+        self._pending = {}
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._spill_size = 0
+
+    def hasPayload(self, stamp):
+        for key in _PAYLOAD_KEYS:
+            if key in stamp:
+                return True
+        return False
+
+    def schedule(self, stamp):
+        """ Starts packing the stamp in the background """
+        if id(stamp) in self._pending or '_size' in stamp or not self.hasPayload(stamp):
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='SceneHistoryPacker')
+        payload = dict((key, stamp[key])
+                       for key in _PAYLOAD_KEYS if key in stamp)
+        self._pending[id(stamp)] = (
+            stamp, self._executor.submit(_pack, payload), _countStates(payload))
+
+    def collect(self):
+        """ Stores the packed copies made since the last call in their stamps """
+        for key, (stamp, future, states) in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[key]
+            stamp['_size'], stamp['_packed'] = future.result()
+            self._packed_states += states
+            self._packed_bytes += stamp['_size']
+            if DEBUG:
+                print("SceneHistoryPacker: packed", '"%s"' % stamp['desc'],
+                      stamp['_size'], "->", len(stamp['_packed']), "bytes")
+
+    def wait(self):
+        for stamp, future, states in list(self._pending.values()):
+            future.result()
+        self.collect()
+
+    def packOut(self, stamp):
+        """ Drops the payload of a stamp which has a packed copy, returns whether it did """
+        if not self.hasPayload(stamp) or ('_packed' not in stamp and '_spilled' not in stamp):
+            return False
+        for key in _PAYLOAD_KEYS:
+            stamp.pop(key, None)
+        return True
+
+    def load(self, stamp):
+        """ Gives a packed out stamp its payload back """
+        if self.hasPayload(stamp):
+            return
+        if '_packed' in stamp:
+            data = stamp['_packed']
+        elif '_spilled' in stamp:
+            offset, length = stamp['_spilled']
+            self._spill_file.seek(offset)
+            data = self._spill_file.read(length)
+        else:
+            return
+        stamp.update(pickle.loads(zlib.decompress(data)))
+
+    def spill(self, stamp):
+        """ Moves the packed copy of a packed out stamp to the spill file, returns the bytes freed """
+        if self.hasPayload(stamp) or '_packed' not in stamp:
+            return 0
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='nodeeditor-history-')
+            self._spill_size = 0
+        data = stamp.pop('_packed')
+        self._spill_file.seek(self._spill_size)
+        self._spill_file.write(data)
+        stamp['_spilled'] = (self._spill_size, len(data))
+        self._spill_size += len(data)
+        return len(data)
+
+    def compact(self, stamps):
+        """ Rewrites the spill file without the data of stamps no longer in history """
+        spilled = [stamp for stamp in stamps if '_spilled' in stamp]
+        used = sum(stamp['_spilled'][1] for stamp in spilled)
+        if self._spill_file is None or self._spill_size <= HISTORY_SPILL_GARBAGE_RATIO * used:
+            return
+        if DEBUG:
+            print("SceneHistoryPacker: compacting spill file",
+                  self._spill_size, "->", used, "bytes")
+
+        old_file, self._spill_file = self._spill_file, None
+        if spilled:
+            self._spill_file = tempfile.TemporaryFile(prefix='nodeeditor-history-')
+        self._spill_size = 0
+        for stamp in spilled:
+            offset, length = stamp['_spilled']
+            old_file.seek(offset)
+            self._spill_file.write(old_file.read(length))
+            stamp['_spilled'] = (self._spill_size, length)
+            self._spill_size += length
+        old_file.close()
+
+    def estimateSize(self, states):
+        if self._packed_states == 0:
+            return states * HISTORY_STATE_SIZE_ESTIMATE
+        return states * self._packed_bytes // self._packed_states
+
+    def memorySize(self, stamp):
+        size = HISTORY_STAMP_OVERHEAD + len(stamp.get('_packed', b''))
+        if self.hasPayload(stamp):
+            if '_size' in stamp:
+                size += stamp['_size']
+            elif id(stamp) in self._pending:
+                # still being packed, its size is not known yet
+                size += self.estimateSize(self._pending[id(stamp)][2])
+        return size
+
+    def spilledSize(self, stamp):
+        return stamp['_spilled'][1] if '_spilled' in stamp else 0
+
+    def getStats(self, stamps):
+        stats = {
+            'stamps': len(stamps),
+            'unpacked': 0,
+            'packed': 0,
+            'spilled': 0,
+            'pending': len(self._pending),
+            'memory_bytes': 0,
+            'payload_bytes': 0,
+            'packed_bytes': 0,
+            'spilled_bytes': 0,
+            'spill_file_bytes': self._spill_size,
+        }
+        for stamp in stamps:
+            stats['memory_bytes'] += self.memorySize(stamp)
+            if self.hasPayload(stamp):
+                stats['unpacked'] += 1
+                stats['payload_bytes'] += stamp.get('_size', 0)
+            if '_packed' in stamp:
+                stats['packed'] += 1
+                stats['packed_bytes'] += len(stamp['_packed'])
+            if '_spilled' in stamp:
+                stats['spilled'] += 1
+                stats['spilled_bytes'] += self.spilledSize(stamp)
+        return stats
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+from collections import OrderedDict
+
+from nodeeditor.NodeScene import openAtomic
+
+DEBUG = False
+
+JOURNAL_VERSION = 1
+# the journal of a scene file is this file name plus the suffix
+JOURNAL_SUFFIX = '.journal'
+# seconds records may stay written but not synced to the disk
+JOURNAL_SYNC_INTERVAL = 1.0
+
+_decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+
+
+def getJournalFilename(filename):
+    return filename + JOURNAL_SUFFIX
+
+
+def _baseStamp(filename):
+    """ What tells whether the scene file is still the one the journal was started on """
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _encodeRecord(nodes, edges):
+    return json.dumps(OrderedDict([
+        ('nodes', list(nodes.items())),
+        ('edges', list(edges.items())),
+    ]), separators=(',', ':')) + '\n'
+
+
+class SceneJournal():
+    """ Appends every change committed to the history of a scene to a file next to the scene file.
+    A record holds only the states of the nodes/edges changed, ``None`` for removed ones.
+    Replayed on top of the scene file, the records bring back the edits made since it was saved """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.filename = None
+
+        self._file = None
+        self._last_sync = 0.0
+        self._unsynced = False
+        # node/edge id -> state collected since the last record
+        self._nodes = OrderedDict()
+        self._edges = OrderedDict()
+        # records written since the first save still being written, see beginRebase
+        self._rebase_records = []
+        self._rebase_starts = []
+
+        scene.history.addStatesCollectedListener(self.onStatesCollected)
+        scene.history.addHistoryModifiedListener(self.writeRecord)
+
+    def isOpen(self):
+        return self._file is not None
+
+    def getSize(self):
+        return self._file.tell() if self._file is not None else 0
+
+    def open(self, filename):
+        """ Starts journaling the scene loaded from ``filename``. A journal left there by a session which
+        did not end is replayed first, returns the number of records replayed """
+        self.close()
+        self.filename = filename
+        journal_filename = getJournalFilename(filename)
+
+        replayed = 0
+        if os.path.exists(journal_filename):
+            replayed = self.replay(journal_filename)
+        if replayed:
+            self._file = open(journal_filename, "a", encoding='utf-8')
+        else:
+            self._create(filename, [])
+        return replayed
+
+    def replay(self, journal_filename):
+        """ Applies the records of a journal to the scene, the ones after a torn record are lost """
+        with open(journal_filename, "r", encoding='utf-8') as file:
+            try:
+                header = _decoder.decode(file.readline())
+            except ValueError:
+                header = None
+            if header is None or header.get('journal') != JOURNAL_VERSION or \
+                    header.get('base') != _baseStamp(self.filename):
+                print("SceneJournal: ignoring", journal_filename,
+                      "which was not started on the current scene file")
+                return 0
+
+            replayed = 0
+            with self.scene.bulkConstruction():
+                for line in file:
+                    if not line.endswith('\n'):
+                        break
+                    try:
+                        record = _decoder.decode(line)
+                    except ValueError:
+                        break
+                    self.scene.history.restoreStates(
+                        OrderedDict(record['nodes']), OrderedDict(record['edges']))
+                    replayed += 1
+
+        if DEBUG:
+            print("SceneJournal: replayed", replayed,
+                  "records from", journal_filename)
+        return replayed
+
+    def _create(self, filename, records):
+        """ Starts a new journal on the scene file as it is now, with records already written """
+        journal_filename = getJournalFilename(filename)
+        header = json.dumps(OrderedDict([
+            ('journal', JOURNAL_VERSION),
+            ('base', _baseStamp(filename)),
+        ]), separators=(',', ':')) + '\n'
+
+        if self._file is not None:
+            self._file.close()
+        with openAtomic(journal_filename, "w") as file:
+            file.write(header)
+            file.writelines(records)
+        self._file = open(journal_filename, "a", encoding='utf-8')
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+        self._nodes = OrderedDict()
+        self._edges = OrderedDict()
+        self._rebase_records = []
+        self._rebase_starts = []
+
+    def discard(self):
+        """ Closes and deletes the journal, the edits in it are no longer wanted """
+        filename = self.filename
+        self.close()
+        self.filename = None
+        if filename is not None:
+            try:
+                os.remove(getJournalFilename(filename))
+            except OSError:
+                pass
+
+    def onStatesCollected(self, nodes, edges):
+        if self._file is None and not self._rebase_starts:
+            return
+        for item_id, (before, after) in nodes.items():
+            self._nodes[item_id] = after
+        for item_id, (before, after) in edges.items():
+            self._edges[item_id] = after
+
+    def writeRecord(self):
+        """ Writes what changed since the last record, once it is part of history """
+        if not self._nodes and not self._edges:
+            return
+        record = _encodeRecord(self._nodes, self._edges)
+        self._nodes = OrderedDict()
+        self._edges = OrderedDict()
+
+        if self._rebase_starts:
+            self._rebase_records.append(record)
+        if self._file is not None:
+            self._file.write(record)
+            self._file.flush()
+            self._unsynced = True
+            if time.monotonic() - self._last_sync >= JOURNAL_SYNC_INTERVAL:
+                self.sync()
+
+    def sync(self):
+        """ Makes sure the records written so far survive a system crash """
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+            self._last_sync = time.monotonic()
+
+    def beginRebase(self):
+        """ Called when a snapshot of the scene is taken to be saved to the scene file, the records
+        written from now on start the journal of the new file once it is saved, see endRebase """
+        self._rebase_starts.append(len(self._rebase_records))
+
+    def endRebase(self, filename, success):
+        """ Called once the save started with the matching beginRebase is done, saves end in the order they began """
+        if not self._rebase_starts:
+            return
+        start = self._rebase_starts.pop(0)
+        records = self._rebase_records[start:]
+        if self._rebase_starts:
+            self._rebase_records = records
+            self._rebase_starts = [ix - start for ix in self._rebase_starts]
+        else:
+            self._rebase_records = []
+        if not success:
+            return
+
+        if filename != self.filename and self.filename is not None:
+            # saved as another file, the edits in the old journal are in there
+            try:
+                os.remove(getJournalFilename(self.filename))
+            except OSError:
+                pass
+        self.filename = filename
+        self._create(filename, records)
+        if DEBUG:
+            print("SceneJournal: rebased on", filename,
+                  "with", len(records), "records")
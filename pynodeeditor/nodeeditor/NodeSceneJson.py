@@ -0,0 +1,163 @@
+import re
+import json
+from collections import OrderedDict
+
+DEBUG = False
+
+JSON_INDENT = 4
+# characters read from the file at once when loading
+JSON_READ_CHUNK_SIZE = 64 * 1024
+
+# scene lists read and written one item at a time -> key the items are yielded with
+JSON_STREAMED_LISTS = OrderedDict([
+    ('nodes', 'node'),
+    ('edges', 'edge'),
+])
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class SceneJsonWriter():
+    """ Writes the same text as json.dump(scene.serialize()), one node/edge at a time """
+
+    def __init__(self, file, compact=False):
+        self.file = file
+        self.compact = compact
+        if compact:
+            self._newline, self._indent, self._separators = '', '', (',', ':')
+        else:
+            self._newline, self._indent, self._separators = '\n', ' ' * \
+                JSON_INDENT, (',', ': ')
+
+    def _dumps(self, data, level):
+        if self.compact:
+            return json.dumps(data, separators=self._separators)
+        # escaped strings never hold a raw newline, every one starts a line
+        return json.dumps(data, indent=JSON_INDENT).replace('\n', '\n' + self._indent * level)
+
+    def write(self, scene):
+        self._writeFields(scene.serializeHeader(),
+                          (node.serialize() for node in scene.iterNodes()),
+                          (edge.serialize() for edge in scene.iterEdges()))
+
+    def writeSnapshot(self, data):
+        """ Writes already serialized scene data, as returned by Scene.snapshot """
+        header = OrderedDict((key, value) for key, value in data.items()
+                             if key not in JSON_STREAMED_LISTS)
+        self._writeFields(header, data['nodes'], data['edges'])
+
+    def _writeFields(self, header, nodes, edges):
+        fields = list(header.items())
+        fields.append(('nodes', nodes))
+        fields.append(('edges', edges))
+
+        write = self.file.write
+        write('{')
+        for ix, (key, value) in enumerate(fields):
+            if ix:
+                write(self._separators[0])
+            write(self._newline + self._indent +
+                  json.dumps(key) + self._separators[1])
+
+            if key not in JSON_STREAMED_LISTS:
+                write(self._dumps(value, 1))
+                continue
+
+            write('[')
+            empty = True
+            for item_data in value:
+                if not empty:
+                    write(self._separators[0])
+                write(self._newline + self._indent * 2 +
+                      self._dumps(item_data, 2))
+                empty = False
+            if not empty:
+                write(self._newline + self._indent)
+            write(']')
+        write(self._newline + '}')
+
+
+class SceneJsonReader():
+    """ Reads a scene file in chunks, only the node/edge being decoded is kept as text """
+
+    def __init__(self, file, chunk_size=JSON_READ_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self._decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """ Appends the next chunk, dropping the text already decoded, False at the end of the file """
+        if self._eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """ Skips whitespace, returns the next character or '' at the end of the file """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError("Invalid scene file: expected %s, got %s" % (
+                " or ".join(repr(c) for c in chars), repr(char) if char else "end of file"))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # a number ending the buffer may go on in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """ Yields ``(key, value)`` for the scene fields, with ``('node', data)``
+        and ``('edge', data)`` for every single node/edge """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self._value()
+            self._expect(':')
+
+            if key in JSON_STREAMED_LISTS:
+                item_key = JSON_STREAMED_LISTS[key]
+                self._expect('[')
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield item_key, self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                yield key, self._value()
+
+            if self._expect(',}') == '}':
+                break
+
+        if DEBUG:
+            print("SceneJsonReader: done,", len(self._buffer), "characters buffered")
@@ -0,0 +1,214 @@
+import time
+from PySide2.QtCore import *
+
+from nodeeditor.NodeNode import Node, NODE_WIDTH, NODE_HEIGHT
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneJson import SceneJsonReader
+from nodeeditor.NodeSceneBinary import isSceneBinary, mapSceneBinary
+
+DEBUG = False
+
+# time (ms) spent building nodes/edges before control goes back to the event loop
+PROGRESSIVE_SLICE_TIME = 12
+# size assumed for nodes not built yet, when telling whether they are in view
+PROGRESSIVE_NODE_SIZE = (NODE_WIDTH, NODE_HEIGHT)
+
+
+class SceneParseThread(QThread):
+    """ Parses a scene file into plain node/edge data, off the GUI thread """
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.header = {}
+        self.nodes = []
+        self.edges = []
+        self.error = None
+
+    def run(self):
+        try:
+            if isSceneBinary(self.filename):
+                with mapSceneBinary(self.filename) as reader:
+                    self._collect(reader.items())
+            else:
+                with open(self.filename, "r", encoding='utf-8') as file:
+                    self._collect(SceneJsonReader(file).items())
+        except Exception as e:
+            self.error = e
+
+    def _collect(self, items):
+        for key, value in items:
+            if self.isInterruptionRequested():
+                return
+            if key == 'node':
+                self.nodes.append(value)
+            elif key == 'edge':
+                self.edges.append(value)
+            else:
+                self.header[key] = value
+
+
+class ProgressiveSceneLoader(QObject):
+    """ Loads a scene file without blocking the event loop. The file is parsed on a worker thread,
+    the nodes are then built in short slices on the GUI thread, those in or nearest to the view first.
+    The scene is left as it was until the file is parsed, ``started`` tells when it gets replaced """
+    started = Signal()
+    progress = Signal(int, int)
+    finished = Signal()
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, scene, view=None, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.view = view
+        self.filename = None
+
+        self._loading = False
+        self._thread = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.buildSlice)
+        self._reset()
+
+    def _reset(self):
+        # node data still to build, the one to build next is last
+        self._pending_nodes = []
+        # node id -> edges to build once the node is there
+        self._node_edges = {}
+        self._hashmap = {}
+        self._built_nodes = 0
+        self._total_nodes = 0
+        self._view_rect = None
+
+    def isLoading(self):
+        return self._loading
+
+    def load(self, filename):
+        if self._loading:
+            self.cancel()
+
+        self.filename = filename
+        self._loading = True
+
+        self._thread = SceneParseThread(filename, self)
+        self._thread.finished.connect(self.onParsed)
+        self._thread.start()
+
+    def cancel(self):
+        """ Stops loading and clears whatever was loaded so far, the scene is kept while the file is parsed """
+        if not self._loading:
+            return
+        self._timer.stop()
+        parsing = self._thread is not None
+        if parsing:
+            self._thread.finished.disconnect(self.onParsed)
+            self._thread.requestInterruption()
+            self._thread.wait()
+            self._thread = None
+        self._reset()
+        self._loading = False
+
+        if not parsing:
+            self.scene.clear()
+            self.scene.history.clear()
+            self.scene.history.storeInitialHistoryStamp()
+        self.cancelled.emit()
+
+    def onParsed(self):
+        thread, self._thread = self._thread, None
+        if thread.error is not None:
+            # nothing was touched, the scene and its history are the ones from before
+            self._loading = False
+            self.failed.emit(str(thread.error))
+            return
+
+        if DEBUG:
+            print("ProgressiveSceneLoader: parsed", len(thread.nodes),
+                  "nodes,", len(thread.edges), "edges")
+
+        self.scene.clear()
+        self.scene.history.clear()
+        self.started.emit()
+        if 'id' in thread.header:
+            self.scene.id = thread.header['id']
+
+        # edges are built with their second node, each one listed once per node it connects
+        socket_nodes = {}
+        for node_data in thread.nodes:
+            for socket_data in (node_data['inputs'] + node_data['outputs']):
+                socket_nodes[socket_data['id']] = node_data['id']
+        for edge_data in thread.edges:
+            start_node = socket_nodes.get(edge_data['start'])
+            end_node = socket_nodes.get(edge_data['end'])
+            self._node_edges.setdefault(start_node, []).append(edge_data)
+            if end_node != start_node:
+                self._node_edges.setdefault(end_node, []).append(edge_data)
+
+        self._pending_nodes = list(reversed(thread.nodes))
+        self._total_nodes = len(thread.nodes)
+
+        self.buildSlice()
+
+    def _prioritize(self):
+        """ Orders the nodes still to build by their distance from the view, whenever the view moved """
+        if self.view is None:
+            return
+        rect = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        if rect == self._view_rect:
+            return
+        self._view_rect = rect
+
+        width, height = PROGRESSIVE_NODE_SIZE
+        left, top = rect.left() - width, rect.top() - height
+        right, bottom = rect.right(), rect.bottom()
+
+        def distance(node_data):
+            x, y = node_data['pos_x'], node_data['pos_y']
+            dx = max(left - x, 0, x - right)
+            dy = max(top - y, 0, y - bottom)
+            return dx*dx + dy*dy
+
+        self._pending_nodes.sort(key=distance, reverse=True)
+
+    def buildSlice(self):
+        self._prioritize()
+        deadline = time.perf_counter() + PROGRESSIVE_SLICE_TIME / 1000.0
+
+        scene, hashmap = self.scene, self._hashmap
+        # the index stays on, the view keeps painting and picking from it between slices
+        with scene.bulkConstruction(suspend_index=False):
+            # at least one node per slice, however long sorting took
+            while self._pending_nodes:
+                node_data = self._pending_nodes.pop()
+                Node(scene).deserialize(node_data, hashmap, restore_id=True)
+                self._built_nodes += 1
+
+                for edge_data in self._node_edges.pop(node_data['id'], ()):
+                    start, end = hashmap.get(
+                        edge_data['start']), hashmap.get(edge_data['end'])
+                    # nodes may have been deleted while loading
+                    if start is None or end is None or not scene.hasNode(start.node) or not scene.hasNode(end.node):
+                        continue
+                    Edge(scene).deserialize(edge_data, hashmap, restore_id=True)
+
+                if time.perf_counter() >= deadline:
+                    break
+
+        self.progress.emit(self._built_nodes, self._total_nodes)
+        if self._pending_nodes:
+            self._timer.start()
+        else:
+            self._finish()
+
+    def _finish(self):
+        self._reset()
+        self._loading = False
+
+        # what was built while loading is the loaded state, not its history. The app view
+        # takes no edits while loading, see NodeEditorAppView.fileLoadProgressive
+        self.scene.history.clear()
+        self.scene.history.storeInitialHistoryStamp()
+        self.scene.has_been_modified = False
+        self.finished.emit()
@@ -0,0 +1,83 @@
+from PySide2.QtCore import *
+
+from nodeeditor.NodeScene import writeSnapshot
+
+DEBUG = False
+
+
+class SceneSaveThread(QThread):
+    """ Encodes and writes a scene snapshot, off the GUI thread """
+
+    def __init__(self, filename, data, compact=False, binary=False, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.data = data
+        self.compact = compact
+        self.binary = binary
+        self.error = None
+
+    def run(self):
+        try:
+            writeSnapshot(self.filename, self.data, self.compact, self.binary)
+        except Exception as e:
+            self.error = e
+
+
+class BackgroundSceneSaver(QObject):
+    """ Saves a scene without blocking the event loop. The snapshot is taken on the GUI thread
+    when saving is requested, later edits do not end up in the file """
+    saved = Signal(str)
+    failed = Signal(str, str)
+
+    def __init__(self, scene, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+
+        self._thread = None
+        # the latest save requested while another one was being written
+        self._pending = None
+
+    def isSaving(self):
+        return self._thread is not None
+
+    def save(self, filename, compact=False, binary=False):
+        data = self.scene.snapshot()
+        # edits made from now on mark the scene modified again
+        self.scene.has_been_modified = False
+
+        thread = SceneSaveThread(filename, data, compact, binary, self)
+        if self._thread is not None:
+            self._pending = thread
+        else:
+            self._start(thread)
+
+    def _start(self, thread):
+        self._thread = thread
+        thread.finished.connect(self.onThreadFinished)
+        thread.start()
+
+    def wait(self):
+        """ Blocks until every requested save is written """
+        while self._thread is not None:
+            self._thread.finished.disconnect(self.onThreadFinished)
+            self._thread.wait()
+            self.onThreadFinished()
+
+    def onThreadFinished(self):
+        thread, self._thread = self._thread, None
+        thread.deleteLater()
+
+        if thread.error is not None:
+            print("saving to", thread.filename, "failed:", thread.error)
+            # unless a newer save is on the way, the scene is not saved anywhere
+            if self._pending is None:
+                self.scene.has_been_modified = True
+            self.failed.emit(thread.filename, str(thread.error))
+        else:
+            if DEBUG:
+                print("saving to", thread.filename, "was successfull.")
+            self.saved.emit(thread.filename)
+
+        if self._pending is not None:
+            thread, self._pending = self._pending, None
+            self._start(thread)
@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+from PySide2.QtCore import *
+
+from nodeeditor.NodeGraphicsNode import EVAL_STATE_IDLE, EVAL_STATE_PENDING, EVAL_STATE_RUNNING, EVAL_STATE_ERROR
+
+DEBUG = False
+
+# threads computing nodes, None lets concurrent.futures pick from the number of cores
+EVALUATION_MAX_WORKERS = None
+
+
+class ParallelSceneEvaluator(QObject):
+    """ Computes the dirty nodes of a scene on a thread pool. A node is handed to the pool once
+    the nodes upstream of it are computed, so branches with no path between them run at the same
+    time. Results are stored on the GUI thread, where the scene is edited """
+    progress = Signal(int, int)
+    finished = Signal()
+
+    # emitted from the pool threads, queued to the thread of this object
+    _computed = Signal(object, object)
+    _progressed = Signal(object, float)
+
+    def __init__(self, scene, max_workers=EVALUATION_MAX_WORKERS, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.evaluator = scene.evaluator
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._running = False
+        # dirty nodes which could not be taken by the running pass
+        self._restart = False
+        self._reset()
+
+        self._computed.connect(self.onComputed, Qt.QueuedConnection)
+        self._progressed.connect(self.onProgressed, Qt.QueuedConnection)
+        self.evaluator.addProgressListener(self._progressed.emit)
+
+    def _reset(self):
+        # node -> nodes of the pass downstream of it
+        self._downstream = {}
+        # node -> number of nodes of the pass upstream of it, not computed yet
+        self._waiting = {}
+        self._ready = []
+        # nodes handed to the pool, not computed yet
+        self._in_pool = set()
+        self._done = 0
+        self._computed_nodes = []
+
+    def isRunning(self):
+        return self._running
+
+    def setMaxWorkers(self, max_workers):
+        """ Takes effect from the next pass, the threads of the current one finish their nodes """
+        self.max_workers = max_workers
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _getExecutor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='SceneEvaluator')
+        return self._executor
+
+    def shutdown(self):
+        """ Drops the nodes not started yet and waits for those being computed """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._running:
+            # whatever was not computed is still to compute
+            computed = set(self._computed_nodes)
+            for node in self._waiting:
+                if node not in computed and self.scene.hasNode(node):
+                    self.evaluator.markDirty(node)
+            self._reset()
+            self._running = False
+
+    def evaluate(self, nodes=None):
+        """ Starts computing the dirty nodes, or with ``nodes`` given, what is needed for their values.
+        While a pass is running, all the dirty nodes are computed once it is over """
+        if self._running:
+            self._restart = True
+            return
+
+        order = self.evaluator.takeDirtyNodes(nodes)
+        if not order:
+            return
+
+        for node in order:
+            self._downstream[node] = []
+            self._waiting[node] = 0
+        for node in order:
+            for downstream in self.evaluator.getDownstreamNodes(node):
+                if downstream in self._waiting:
+                    self._downstream[node].append(downstream)
+                    self._waiting[downstream] += 1
+            self.setNodeState(node, EVAL_STATE_PENDING)
+
+        # popped from the end, the first in topological order go first
+        self._ready = [node for node in reversed(order)
+                       if self._waiting[node] == 0]
+        self._running = True
+        if DEBUG:
+            print("ParallelSceneEvaluator: computing", len(order),
+                  "nodes,", len(self._ready), "ready")
+        self.progress.emit(0, len(order))
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._ready:
+            node = self._ready.pop()
+            if not self.scene.hasNode(node):
+                self._onNodeDone(node)
+                continue
+            try:
+                inputs = self.evaluator.getInputValues(node)
+            except Exception as e:
+                # failed upstream, the error is passed on without computing
+                self.evaluator.setResult(node, None, e)
+                self.setNodeState(node, EVAL_STATE_ERROR)
+                self._onNodeDone(node)
+                continue
+
+            self.setNodeState(node, EVAL_STATE_RUNNING)
+            future = self._getExecutor().submit(
+                self.evaluator.computeNode, node, inputs)
+            future.add_done_callback(
+                lambda future, node=node: self._computed.emit(node, future))
+            self._in_pool.add(node)
+
+        if self._running and not self._in_pool:
+            self._finish()
+
+    def onComputed(self, node, future):
+        if node not in self._in_pool or future.cancelled():
+            return
+        self._in_pool.remove(node)
+        values, error = future.result()
+        # a node deleted while being computed has no result to keep
+        if self.scene.hasNode(node):
+            self.evaluator.setResult(node, values, error)
+            self.setNodeState(node, EVAL_STATE_ERROR if error is not None
+                              else EVAL_STATE_IDLE)
+            self._computed_nodes.append(node)
+        self._onNodeDone(node)
+        self._dispatch()
+
+    def onProgressed(self, node, fraction):
+        if node in self._in_pool:
+            self.setNodeState(node, EVAL_STATE_RUNNING, fraction)
+
+    def _onNodeDone(self, node):
+        self._done += 1
+        self.progress.emit(self._done, len(self._waiting))
+        for downstream in self._downstream[node]:
+            self._waiting[downstream] -= 1
+            if self._waiting[downstream] == 0:
+                self._ready.append(downstream)
+
+    def _finish(self):
+        computed = self._computed_nodes
+        self._reset()
+        self._running = False
+        self.evaluator.notifyEvaluated(computed)
+        self.finished.emit()
+
+        # nodes got dirty while the pass was running
+        if self._restart or self.evaluator.isDirty():
+            self._restart = False
+            self.evaluate()
+
+    def setNodeState(self, node, state, progress=None):
+        if node.graphicsNode is not None:
+            node.graphicsNode.setEvaluationState(state, progress)
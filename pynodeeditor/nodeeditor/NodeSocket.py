@@ -1,6 +1,5 @@
 from collections import OrderedDict
 from nodeeditor.NodeSerializable import Serializable
-from nodeeditor.NodeGraphicsSocket import QDMGraphicsSocket
 
 LEFT_TOP = 1
 LEFT_BOTTOM = 2
@@ -19,17 +18,34 @@ class Socket(Serializable):
         self.position = position
         self.socket_type = socket_type
         self.is_multi_edges = multi_edges
+        self.is_input = position in (LEFT_TOP, LEFT_BOTTOM)
 
         if DEBUG:
             print("Socket -- creating with ", self.index,
                   self.position, "for node", self.node)
 
+        # offset from the node origin, see getLocalPosition
+        self._local_pos = None
+
+        self.graphicsSocket = None
+        if self.node.graphicsNode is not None:
+            self.initGraphics()
+
+        # connected edges, dict used as an ordered set
+        self._edges = {}
+        # other socket -> edges connecting it with this one
+        self._peers = {}
+
+        self.node.scene.addSocket(self)
+
+    def initGraphics(self):
+        from nodeeditor.NodeGraphicsSocket import QDMGraphicsSocket
         self.graphicsSocket = QDMGraphicsSocket(
             self, self.socket_type)
-        self.graphicsSocket.setPos(
-            *self.node.getSocketPosition(index, position))
+        self.graphicsSocket.setPos(*self.getLocalPosition())
 
-        self.edges = []
+    def onIdChanged(self, old_id):
+        self.node.scene.onSocketIdChanged(self, old_id)
 
     def __str__(self):
         return "<Socket %s %s..%s>" % ("ME" if self.is_multi_edges else "SE", hex(id(self))[2:5], hex(id(self))[-3:])
@@ -37,26 +53,76 @@ class Socket(Serializable):
     def getSocketPosition(self):
         if DEBUG:
             print("  GSP: ", self.index, self.position, "node:", self.node)
-        res = self.node.getSocketPosition(self.index, self.position)
+        res = list(self.getLocalPosition())
         if DEBUG:
             print("  res", res)
         return res
 
+    def getLocalPosition(self):
+        if self._local_pos is None:
+            self._local_pos = tuple(
+                self.node.getSocketPosition(self.index, self.position))
+        return self._local_pos
+
+    def getScenePosition(self):
+        local_x, local_y = self._local_pos or self.getLocalPosition()
+        return local_x + self.node._pos_x, local_y + self.node._pos_y
+
+    def invalidatePosition(self):
+        self._local_pos = None
+        if self.graphicsSocket is not None:
+            self.graphicsSocket.setPos(*self.getLocalPosition())
+
+    @property
+    def edges(self):
+        return list(self._edges)
+
+    def hasEdge(self, edge):
+        return edge in self._edges
+
+    def hasEdges(self):
+        return len(self._edges) > 0
+
     def addEdge(self, edge):
-        self.edges.append(edge)
+        if edge in self._edges:
+            return
+        self._edges[edge] = None
+        self.node.onEdgeConnected(self, edge)
 
     def removeEdge(self, edge):
-        if edge in self.edges:
-            self.edges.remove(edge)
+        if edge in self._edges:
+            del self._edges[edge]
+            self.node.onEdgeDisconnected(self, edge)
         else:
             print("!W:", "Socket::removeEdge", "wanna remove edge",
                   edge, "from self.edges but it's not in the list!")
 
     def removeAllEdges(self):
-        while self.edges:
-            edge = self.edges.pop(0)
+        for edge in self.edges:
             edge.remove()
 
+    def addPeer(self, socket, edge):
+        self._peers.setdefault(socket, {})[edge] = None
+
+    def removePeer(self, socket, edge):
+        edges = self._peers.get(socket)
+        if edges is not None:
+            edges.pop(edge, None)
+            if not edges:
+                del self._peers[socket]
+
+    def getPeers(self):
+        """ Sockets connected with this one by an edge """
+        return list(self._peers)
+
+    def getEdgeTo(self, socket):
+        """ Returns an edge already connecting this socket with ``socket`` or None """
+        edges = self._peers.get(socket)
+        return next(iter(edges)) if edges else None
+
+    def isConnectedTo(self, socket):
+        return socket in self._peers
+
     def serialize(self):
         return OrderedDict(
             [
@@ -71,6 +137,7 @@ class Socket(Serializable):
     def deserialize(self, data, hashmap={}, restore_id=True):
         if restore_id:
             self.id = data['id']
-        self.is_multi_edges = data['multi_edges']
+        # files saved before multi_edges was serialized keep the constructor's value
+        self.is_multi_edges = data.get('multi_edges', self.is_multi_edges)
         hashmap[data['id']] = self
         return True
@@ -0,0 +1,26 @@
+import gc
+import os
+import sys
+
+import pytest
+
+# the tests run from a checkout, without the package installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide2.QtWidgets import QApplication
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication([])
+    return app
+
+
+@pytest.fixture(autouse=True)
+def collectGarbage():
+    yield
+    # Qt objects left in reference cycles by a test must not be freed by a collection
+    # happening on a worker thread of a later one
+    gc.collect()
@@ -0,0 +1,137 @@
+import pytest
+
+from nodeeditor.NodeEditorAppView import NodeEditorAppView, QMessageBox
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+@pytest.fixture
+def appView(qapp):
+    view = NodeEditorAppView()
+    yield view
+    view.loader.cancel()
+    view.saver.wait()
+    view.scheduler.shutdown()
+    view.closeJournal()
+
+
+@pytest.fixture
+def warnings(monkeypatch):
+    shown = []
+    monkeypatch.setattr(QMessageBox, 'warning',
+                        lambda parent, title, text: shown.append((title, text)))
+    return shown
+
+
+def writeGraph(filename, count):
+    scene = Scene(headless=True)
+    nodes = [Node(scene, "Node %d" % ix, inputs=[1], outputs=[1])
+             for ix in range(count)]
+    for ix in range(1, count):
+        Edge(scene, nodes[ix - 1].outputs[0], nodes[ix].inputs[0])
+    scene.saveToFile(filename, compact=True)
+
+
+def test_load_error_shows_warning(appView, warnings, tmp_path):
+    filename = str(tmp_path / "truncated.json")
+    writeGraph(filename, 5)
+    with open(filename, "r", encoding='utf-8') as file:
+        text = file.read()
+    with open(filename, "w", encoding='utf-8') as file:
+        file.write(text[:len(text) // 2])
+    titles = sorted(node.title for node in appView.scene.nodes)
+
+    assert appView.fileLoad(filename) is False
+    assert len(warnings) == 1
+    assert sorted(node.title for node in appView.scene.nodes) == titles
+    assert appView.filename is None
+
+
+def test_missing_file_shows_warning(appView, warnings, tmp_path):
+    assert appView.fileLoad(str(tmp_path / "missing.json")) is False
+    assert len(warnings) == 1
+
+
+def test_load(appView, warnings, tmp_path):
+    filename = str(tmp_path / "graph.json")
+    writeGraph(filename, 5)
+
+    assert appView.fileLoad(filename) is True
+    assert warnings == []
+    assert len(appView.scene.nodes) == 5
+    assert len(appView.scene.edges) == 4
+    assert not appView.isModified()
+    assert not appView.canUndo()
+
+
+def test_progressive_load_takes_no_edits(appView, qapp, tmp_path):
+    filename = str(tmp_path / "graph.json")
+    writeGraph(filename, 300)
+
+    appView.fileLoadProgressive(filename)
+    assert appView.isLoading()
+    assert not appView.canEdit()
+    assert not appView.view.isInteractive()
+
+    while appView.isLoading():
+        qapp.processEvents()
+    assert appView.view.isInteractive()
+    assert appView.filename == filename
+    assert len(appView.scene.nodes) == 300
+    assert len(appView.scene.edges) == 299
+    assert not appView.isModified()
+
+
+def test_cancelled_load_takes_edits_again(appView, tmp_path):
+    filename = str(tmp_path / "graph.json")
+    writeGraph(filename, 50)
+
+    before = appView.scene.serialize()
+    appView.fileLoadProgressive(filename)
+    appView.loader.cancel()
+    assert appView.canEdit()
+    assert appView.view.isInteractive()
+    # cancelled while parsing, the scene was not touched yet
+    assert appView.scene.serialize() == before
+
+
+def test_cancel_while_building_clears_scene(appView, qapp, tmp_path):
+    filename = str(tmp_path / "graph.json")
+    writeGraph(filename, 3000)
+    appView.filename = str(tmp_path / "previous.json")
+
+    progress = []
+    appView.loader.progress.connect(lambda done, total: progress.append(done))
+    appView.fileLoadProgressive(filename)
+    while not progress:
+        qapp.processEvents()
+    assert 0 < progress[0] < 3000
+    appView.loader.cancel()
+    assert appView.canEdit()
+    assert appView.scene.nodes == []
+    assert appView.filename is None
+
+
+def test_failed_progressive_load_keeps_scene(appView, qapp, warnings, tmp_path):
+    filename = str(tmp_path / "truncated.json")
+    writeGraph(filename, 50)
+    with open(filename, "r", encoding='utf-8') as file:
+        text = file.read()
+    with open(filename, "w", encoding='utf-8') as file:
+        file.write(text[:len(text) // 2])
+    previous = str(tmp_path / "previous.json")
+    appView.filename = previous
+    before = appView.scene.serialize()
+    steps = len(appView.scene.history.history_stack)
+
+    failed = []
+    appView.loader.failed.connect(failed.append)
+    appView.fileLoadProgressive(filename)
+    while appView.isLoading():
+        qapp.processEvents()
+    assert len(failed) == 1
+    assert appView.view.isInteractive()
+    assert appView.filename == previous
+    assert appView.scene.serialize() == before
+    assert len(appView.scene.history.history_stack) == steps
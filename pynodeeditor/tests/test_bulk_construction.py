@@ -0,0 +1,58 @@
+import gc
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def test_modified_listeners_run_once_after_the_block():
+    scene = Scene(headless=True)
+    calls = []
+    scene.addHasBeenModifiedListener(lambda: calls.append(scene.nodes[:]))
+    with scene.bulkConstruction():
+        with scene.bulkConstruction():
+            Node(scene, "First")
+            scene.has_been_modified = True
+        Node(scene, "Second")
+        assert calls == []
+    assert len(calls) == 1 and len(calls[0]) == 2
+
+
+def test_collector_is_put_off_and_restored():
+    scene = Scene(headless=True)
+    assert gc.isenabled()
+    with scene.bulkConstruction():
+        assert not gc.isenabled()
+    assert gc.isenabled()
+
+    gc.disable()
+    try:
+        with scene.bulkConstruction():
+            pass
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+
+def test_edges_get_their_geometry_at_the_end(qapp):
+    scene = Scene()
+    with scene.bulkConstruction():
+        first = Node(scene, "First", inputs=[1], outputs=[1])
+        second = Node(scene, "Second", inputs=[1], outputs=[1])
+        second.setPos(400, 100)
+        edge = Edge(scene, first.outputs[0], second.inputs[0])
+        first.setPos(50, 60)
+    assert tuple(edge.graphicsEdge.posSource) == first.outputs[0].getScenePosition()
+    assert tuple(edge.graphicsEdge.posDestination) == second.inputs[0].getScenePosition()
+    assert edge in scene.edgeIndex.query(200, 100, 250, 150)
+
+
+def test_block_raising_still_ends_it():
+    scene = Scene(headless=True)
+    try:
+        with scene.bulkConstruction():
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert not scene.isBulkConstructing()
+    assert gc.isenabled()
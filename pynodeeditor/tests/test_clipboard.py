@@ -0,0 +1,62 @@
+import json
+
+from PySide2.QtCore import QPointF
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeGraphicsView import QDMGraphicsView
+
+
+def buildSelection():
+    scene = Scene()
+    view = QDMGraphicsView(scene.graphicsScene)
+    nodes = []
+    for ix in range(10):
+        node = Node(scene, "Node %d" % ix, inputs=[1], outputs=[1])
+        node.setPos(ix * 200, 0)
+        nodes.append(node)
+    for first, second in zip(nodes, nodes[1:]):
+        Edge(scene, first.outputs[0], second.inputs[0])
+    # the last node is left out, so is the edge to it
+    for item in scene.graphicsScene.items():
+        item.setSelected(True)
+    nodes[-1].graphicsNode.setSelected(False)
+    return scene, view
+
+
+def test_selection_copies_inner_edges_only(qapp):
+    scene, view = buildSelection()
+    data = scene.clipboard.serializeSelected()
+    assert len(data['nodes']) == 9
+    assert len(data['edges']) == 8
+
+
+def test_binary_payload_round_trip(qapp):
+    scene, view = buildSelection()
+    data = scene.clipboard.serializeSelected()
+    payload = scene.clipboard.encode(data)
+    assert len(payload) < len(json.dumps(data).encode('utf-8'))
+
+    decoded = scene.clipboard.decode(payload)
+    assert json.loads(json.dumps(decoded)) == json.loads(json.dumps(data))
+
+
+def test_paste_builds_new_items_around_the_mouse(qapp):
+    scene, view = buildSelection()
+    data = scene.clipboard.decode(
+        scene.clipboard.encode(scene.clipboard.serializeSelected()))
+    ids = set(node.id for node in scene.nodes)
+    view.last_scene_mouse_position = QPointF(5000, 3000)
+    scene.clipboard.deserializeFromClipboard(data)
+
+    pasted = [node for node in scene.nodes if node.id not in ids]
+    assert len(pasted) == 9
+    assert len(scene.edges) == 9 + 8
+    xs = [node.pos.x() for node in pasted]
+    assert (min(xs) + max(xs)) / 2 == 5000
+    assert all(node.pos.y() == 3000 for node in pasted)
+    for edge in scene.edges[9:]:
+        assert edge.start_socket.node in pasted and edge.end_socket.node in pasted
+        assert tuple(edge.graphicsEdge.posSource) == tuple(edge.start_socket.getScenePosition())
+    assert scene.history.history_stack[-1]['desc'] == "Pasted elements in scene"
@@ -0,0 +1,45 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+
+
+def test_content_is_built_on_demand(qapp):
+    scene = Scene()
+    node = Node(scene, "Node")
+    assert not node.hasContent()
+    assert node.graphicsNode.graphicsContent is None
+    # serializing does not need the widget
+    assert node.serialize()['content'] == node.getContentData()
+    assert not node.hasContent()
+
+    scene.graphicsScene.showContents([node])
+    assert node.hasContent()
+    assert node.graphicsNode.graphicsContent is not None
+
+
+def test_released_content_keeps_its_data(qapp):
+    scene = Scene()
+    node = Node(scene, "Node")
+    scene.graphicsScene.showContents([node])
+    node.content.wdg_text.setPlainText("typed")
+
+    scene.graphicsScene.releaseStaleContents(-1)
+    assert not node.hasContent()
+    assert node.graphicsNode.graphicsContent is None
+    assert scene.graphicsScene.getContentSnapshot(node) is not None
+    assert node.getContentData()['text'] == "typed"
+
+    scene.graphicsScene.showContents([node])
+    assert node.content.wdg_text.toPlainText() == "typed"
+
+
+def test_content_round_trips_without_widgets(qapp):
+    scene = Scene()
+    node = Node(scene, "Node")
+    node.content.wdg_text.setPlainText("typed")
+    data = scene.serialize()
+
+    loaded = Scene()
+    loaded.deserialize(data)
+    assert not loaded.nodes[0].hasContent()
+    assert loaded.nodes[0].getContentData() == node.getContentData()
+    assert loaded.nodes[0].content.wdg_text.toPlainText() == "typed"
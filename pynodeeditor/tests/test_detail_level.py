@@ -0,0 +1,41 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeGraphicsScene import LOD_LOW, LOD_MEDIUM, LOD_FULL
+from nodeeditor.NodeGraphicsView import QDMGraphicsView
+
+
+def test_levels_follow_the_scale(qapp):
+    graphicsScene = Scene().graphicsScene
+    assert graphicsScene.getDetailLevel(1.0) == LOD_FULL
+    assert graphicsScene.getDetailLevel(graphicsScene.lodMediumScale) == LOD_FULL
+    assert graphicsScene.getDetailLevel(graphicsScene.lodMediumScale * 0.9) == LOD_MEDIUM
+    assert graphicsScene.getDetailLevel(graphicsScene.lodLowScale * 0.9) == LOD_LOW
+
+
+def test_contents_are_hidden_below_full_detail(qapp):
+    scene = Scene()
+    view = QDMGraphicsView(scene.graphicsScene)
+    node = Node(scene, "Node")
+    scene.graphicsScene.showContents([node])
+    proxy = node.graphicsNode.graphicsContent
+    assert proxy.isVisible()
+
+    view.scale(0.5, 0.5)
+    view.updateDetailLevel()
+    assert scene.graphicsScene.detail_level == LOD_MEDIUM
+    assert not proxy.isVisible()
+
+    view.scale(4, 4)
+    view.updateDetailLevel()
+    assert scene.graphicsScene.detail_level == LOD_FULL
+    assert proxy.isVisible()
+
+
+def test_no_contents_are_built_zoomed_out(qapp):
+    scene = Scene()
+    view = QDMGraphicsView(scene.graphicsScene)
+    node = Node(scene, "Node")
+    view.scale(0.2, 0.2)
+    view.updateDetailLevel()
+    view.updateVisibleContents()
+    assert not node.hasContent()
@@ -0,0 +1,42 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def buildPair():
+    scene = Scene()
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    second.setPos(400, 0)
+    edge = Edge(scene, first.outputs[0], second.inputs[0])
+    return scene, first, edge
+
+
+def test_drag_updates_are_throttled_to_a_frame(qapp):
+    scene, first, edge = buildPair()
+    graphicsScene = scene.graphicsScene
+    first.graphicsNode.setSelected(True)
+    graphicsScene.startNodesDrag()
+
+    interval = graphicsScene._drag_update_timer.interval()
+    assert 0 < interval <= 1000
+    calls = []
+    graphicsScene.updateDraggedEdges = lambda: calls.append(None)
+    for ix in range(10):
+        first.graphicsNode.setPos(ix, ix)
+        graphicsScene.scheduleDragUpdate()
+    assert graphicsScene._drag_update_timer.isActive()
+    assert calls == []
+
+
+def test_drag_end_flushes_the_edges(qapp):
+    scene, first, edge = buildPair()
+    graphicsScene = scene.graphicsScene
+    first.graphicsNode.setSelected(True)
+    graphicsScene.startNodesDrag()
+    first.graphicsNode.setPos(50, 60)
+    graphicsScene.scheduleDragUpdate()
+
+    assert graphicsScene.endNodesDrag() == [first]
+    assert not graphicsScene._drag_update_timer.isActive()
+    assert tuple(edge.graphicsEdge.posSource) == tuple(first.outputs[0].getScenePosition())
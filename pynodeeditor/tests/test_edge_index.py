@@ -0,0 +1,52 @@
+from nodeeditor.NodeEdgeIndex import EdgeIndex, EDGE_INDEX_MAX_CELLS
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def test_query_finds_overlapping_boxes():
+    index = EdgeIndex(cell_size=100)
+    index.update('near', 10, 10, 50, 50)
+    index.update('far', 1000, 1000, 1050, 1050)
+    assert index.query(0, 0, 90, 90) == ['near']
+    assert index.query(990, 990, 1010, 1010) == ['far']
+    assert sorted(index.query(0, 0, 2000, 2000)) == ['far', 'near']
+    assert index.query(500, 500, 600, 600) == []
+
+
+def test_update_moves_and_remove_forgets():
+    index = EdgeIndex(cell_size=100)
+    index.update('edge', 10, 10, 50, 50)
+    index.update('edge', 510, 510, 550, 550)
+    assert index.query(0, 0, 90, 90) == []
+    assert index.query(500, 500, 590, 590) == ['edge']
+    index.remove('edge')
+    assert len(index) == 0
+    assert index.query(0, 0, 2000, 2000) == []
+
+
+def test_oversized_edges_are_always_candidates():
+    index = EdgeIndex(cell_size=10)
+    size = EDGE_INDEX_MAX_CELLS * 100
+    index.update('huge', 0, 0, size, size)
+    assert index.query(-500, -500, -490, -490) == ['huge']
+    index.remove('huge')
+    assert index.query(0, 0, 10, 10) == []
+
+
+def test_scene_edges_follow_their_nodes(qapp):
+    scene = Scene()
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    second.setPos(300, 0)
+    edge = Edge(scene, first.outputs[0], second.inputs[0])
+    assert edge in scene.edgeIndex.query(150, 0, 200, 100)
+
+    first.setPos(5000, 5000)
+    second.setPos(5300, 5000)
+    first.updateConnectedEdges()
+    assert edge not in scene.edgeIndex.query(150, 0, 200, 100)
+    assert edge in scene.edgeIndex.query(5150, 5000, 5200, 5100)
+
+    edge.remove()
+    assert len(scene.edgeIndex) == 0
@@ -0,0 +1,119 @@
+import pytest
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+class AddNode(Node):
+    """ Outputs the sum of its inputs plus its own value, counting how many times it was computed """
+
+    def __init__(self, scene, value=0):
+        super().__init__(scene, "Add", inputs=[1, 1], outputs=[1])
+        self.value = value
+        self.computed = 0
+
+    def compute(self, inputs):
+        self.computed += 1
+        if self.value is None:
+            raise ValueError("no value")
+        return self.value + sum(value or 0 for value in inputs)
+
+
+def connect(scene, start, end, index=0):
+    return Edge(scene, start.outputs[0], end.inputs[index])
+
+
+@pytest.fixture
+def chain():
+    """ source -> middle -> sink, plus an unrelated node """
+    scene = Scene(headless=True)
+    source, middle, sink, other = (AddNode(scene, value) for value in (1, 10, 100, 1000))
+    connect(scene, source, middle)
+    connect(scene, middle, sink)
+    return scene, source, middle, sink, other
+
+
+def test_evaluates_in_topological_order(chain):
+    scene, source, middle, sink, other = chain
+    evaluator = scene.evaluator
+    assert evaluator.isDirty()
+    computed = evaluator.evaluate()
+    assert computed.index(source) < computed.index(middle) < computed.index(sink)
+    assert sink.getOutputValue() == 111
+    assert not evaluator.isDirty()
+
+
+def test_only_dirty_cone_is_computed(chain):
+    scene, source, middle, sink, other = chain
+    scene.evaluator.evaluate()
+    middle.value = 20
+    middle.markDirty()
+    assert set(scene.evaluator.getDirtyNodes()) == {middle, sink}
+
+    assert scene.evaluator.evaluate() == [middle, sink]
+    assert (source.computed, middle.computed, sink.computed, other.computed) == (1, 2, 2, 1)
+    assert sink.getOutputValue() == 121
+
+
+def test_evaluate_given_nodes_only_computes_upstream(chain):
+    scene, source, middle, sink, other = chain
+    assert scene.evaluator.evaluate([middle]) == [source, middle]
+    assert scene.evaluator.isDirty(sink) and scene.evaluator.isDirty(other)
+
+
+def test_edges_mark_their_end_dirty(chain):
+    scene, source, middle, sink, other = chain
+    scene.evaluator.evaluate()
+    edge = connect(scene, other, sink, 1)
+    assert scene.evaluator.getDirtyNodes() == [sink]
+    scene.evaluator.evaluate()
+    assert sink.getOutputValue() == 1111
+
+    edge.remove()
+    assert scene.evaluator.getDirtyNodes() == [sink]
+    scene.evaluator.evaluate()
+    assert sink.getOutputValue() == 111
+
+
+def test_errors_are_passed_downstream(chain):
+    scene, source, middle, sink, other = chain
+    middle.value = None
+    scene.evaluator.evaluate()
+    assert isinstance(scene.evaluator.getError(middle), ValueError)
+    assert scene.evaluator.getError(sink) is scene.evaluator.getError(middle)
+    assert sink.computed == 0
+    assert scene.evaluator.getError(source) is None
+
+    middle.value = 10
+    middle.markDirty()
+    scene.evaluator.evaluate()
+    assert scene.evaluator.getError(sink) is None
+    assert sink.getOutputValue() == 111
+
+
+def test_only_nodes_on_a_cycle_get_the_cycle_error(chain):
+    scene, source, middle, sink, other = chain
+    # middle <-> sink, source upstream of the cycle, other downstream of it
+    connect(scene, sink, middle, 1)
+    connect(scene, sink, other)
+    scene.evaluator.evaluate()
+
+    evaluator = scene.evaluator
+    assert evaluator.getError(source) is None
+    assert source.getOutputValue() == 1
+    assert isinstance(evaluator.getError(middle), RecursionError)
+    assert isinstance(evaluator.getError(sink), RecursionError)
+    assert evaluator.getError(other) is not None
+    assert (middle.computed, sink.computed, other.computed) == (0, 0, 0)
+    assert evaluator.getOrder() == [source, other]
+
+
+def test_removed_nodes_are_forgotten(chain):
+    scene, source, middle, sink, other = chain
+    scene.evaluator.evaluate()
+    middle.remove()
+    assert scene.evaluator.getDirtyNodes() == [sink]
+    scene.evaluator.evaluate()
+    assert sink.getOutputValue() == 100
+    assert scene.evaluator.getValues(middle) == [None]
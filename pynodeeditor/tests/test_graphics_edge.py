@@ -0,0 +1,36 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def buildEdge():
+    scene = Scene()
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    second.setPos(400, 100)
+    return scene, first, Edge(scene, first.outputs[0], second.inputs[0])
+
+
+def test_path_is_cached_until_an_end_moves(qapp):
+    scene, first, edge = buildEdge()
+    graphicsEdge = edge.graphicsEdge
+    path = graphicsEdge.getPath()
+    assert graphicsEdge.getPath() is path
+
+    # same positions, nothing to rebuild
+    edge.updatePositions()
+    assert graphicsEdge.getPath() is path
+
+    first.setPos(0, 300)
+    edge.updatePositions()
+    moved = graphicsEdge.getPath()
+    assert moved is not path
+    assert moved.pointAtPercent(0) == graphicsEdge.mapFromScene(*first.outputs[0].getScenePosition())
+
+
+def test_bounding_rect_holds_the_pen(qapp):
+    scene, first, edge = buildEdge()
+    graphicsEdge = edge.graphicsEdge
+    rect = graphicsEdge.boundingRect()
+    assert rect.contains(graphicsEdge.getPath().boundingRect())
+    assert rect.width() > graphicsEdge.getPath().boundingRect().width()
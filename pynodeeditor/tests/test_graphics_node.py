@@ -0,0 +1,36 @@
+from PySide2.QtCore import QRectF
+from PySide2.QtGui import QImage, QPainter
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeGraphicsNode import getChromePaths
+
+
+def test_chrome_paths_are_shared(qapp):
+    scene = Scene()
+    first, second = Node(scene, "First"), Node(scene, "Second")
+    paths = getChromePaths(180, 240, 24.0, 10.0)
+    assert getChromePaths(180, 240, 24.0, 10.0) is paths
+    assert getChromePaths(300, 240, 24.0, 10.0) is not paths
+    assert paths[2].boundingRect().width() == first.graphicsNode.width
+
+
+def test_title_follows_the_node(qapp):
+    scene = Scene()
+    node = Node(scene, "First")
+    node.title = "Renamed"
+    assert node.graphicsNode._title_text.text() == "Renamed"
+    node.graphicsNode.setSize(300, 200)
+    assert node.graphicsNode._title_text.textWidth() == 300 - 2 * node.graphicsNode._padding
+
+
+def test_scene_renders(qapp):
+    scene = Scene()
+    for ix in range(3):
+        Node(scene, "Node %d" % ix, inputs=[1], outputs=[1]).setPos(ix * 200, 0)
+    image = QImage(400, 300, QImage.Format_ARGB32)
+    # zoomed in, then far enough out for the low level of detail
+    for source in ((-100, -100, 800, 600), (-8000, -8000, 16000, 12000)):
+        painter = QPainter(image)
+        scene.graphicsScene.render(painter, source=QRectF(*source))
+        painter.end()
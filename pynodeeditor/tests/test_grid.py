@@ -0,0 +1,26 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeGraphicsScene import GRID_MAX_TILE
+
+
+def test_brushes_are_cached_per_zoom_bucket(qapp):
+    graphicsScene = Scene().graphicsScene
+    brush = graphicsScene.getGridBrush(1.0)
+    assert graphicsScene.getGridBrush(1.0) is brush
+    # close enough to share the tile
+    assert graphicsScene.getGridBrush(1.05) is brush
+    assert graphicsScene.getGridBrush(0.5) is not brush
+
+
+def test_tiles_stay_bounded(qapp):
+    graphicsScene = Scene().graphicsScene
+    for ix in range(-20, 20):
+        brush = graphicsScene.getGridBrush(2 ** (ix / 2))
+        assert 0 < brush.texture().width() <= GRID_MAX_TILE
+    assert len(graphicsScene._grid_brushes) <= 17
+
+
+def test_style_change_builds_new_tiles(qapp):
+    graphicsScene = Scene().graphicsScene
+    brush = graphicsScene.getGridBrush(1.0)
+    graphicsScene.gridSize = graphicsScene.gridSize * 2
+    assert graphicsScene.getGridBrush(1.0) is not brush
@@ -0,0 +1,46 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSocket import LEFT_BOTTOM, RIGHT_TOP
+
+
+def test_headless_node_position():
+    scene = Scene(headless=True)
+    node = Node(scene, "Node", inputs=[1], outputs=[1])
+    node.setPos(30, 40)
+    assert node.graphicsNode is None
+    assert node.pos == (30, 40)
+
+
+def test_headless_socket_positions_match_graphics(qapp):
+    positions = []
+    for headless in (True, False):
+        scene = Scene(headless=headless)
+        node = Node(scene, "Node", inputs=[1, 2], outputs=[3])
+        node.setPos(100, 50)
+        positions.append([socket.getScenePosition() for socket in node.inputs + node.outputs] +
+                         [node.getSocketPosition(1, LEFT_BOTTOM), node.getSocketPosition(0, RIGHT_TOP)])
+    assert positions[0] == positions[1]
+
+
+def test_resized_node_moves_its_sockets(qapp):
+    scene = Scene()
+    node = Node(scene, "Node", inputs=[1], outputs=[1])
+    node.graphicsNode.setSize(300, 200)
+    assert node.width == 300
+    assert node.outputs[0].getScenePosition()[0] == 300
+    assert node.inputs[0].getScenePosition()[1] == 200 - 10 - 4
+
+
+def test_headless_scene_attaches_graphics(qapp):
+    scene = Scene(headless=True)
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    first.setPos(10, 20)
+    Edge(scene, first.outputs[0], second.inputs[0])
+    data = scene.serialize()
+
+    scene.attachGraphics()
+    assert first.graphicsNode is not None
+    assert (first.pos.x(), first.pos.y()) == (10, 20)
+    assert scene.serialize() == data
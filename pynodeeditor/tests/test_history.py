@@ -0,0 +1,100 @@
+import pytest
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneHistory import HISTORY_MODE_SNAPSHOT
+
+
+def sceneState(scene):
+    data = scene.serialize()
+    return (sorted(data['nodes'], key=lambda item: item['id']),
+            sorted(data['edges'], key=lambda item: item['id']))
+
+
+def editScene(scene):
+    """ Stores a few stamps, returns the state of the scene at each of them """
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    states = [sceneState(scene)]
+
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    history.storeHistory("Add nodes", setModified=True)
+    states.append(sceneState(scene))
+
+    Edge(scene, first.outputs[0], second.inputs[0])
+    history.storeHistory("Connect", setModified=True)
+    states.append(sceneState(scene))
+
+    second.setPos(200, 100)
+    first.title = "Renamed"
+    history.storeHistory("Move and rename", setModified=True)
+    states.append(sceneState(scene))
+
+    first.remove()
+    history.storeHistory("Delete", setModified=True)
+    states.append(sceneState(scene))
+    return states
+
+
+def checkUndoRedo(scene, states):
+    history = scene.history
+    for state in reversed(states[:-1]):
+        history.undo()
+        assert sceneState(scene) == state
+    assert not history.canUndo()
+    for state in states[1:]:
+        history.redo()
+        assert sceneState(scene) == state
+    assert not history.canRedo()
+
+
+def test_delta_stamps_hold_only_changes():
+    scene = Scene(headless=True)
+    editScene(scene)
+    stamp = scene.history.history_stack[3]
+    assert 'snapshot' not in stamp
+    # the moved and renamed nodes, no edge
+    assert len(stamp['nodes']) == 2 and stamp['edges'] == {}
+
+
+def test_delta_undo_redo_round_trip():
+    scene = Scene(headless=True)
+    checkUndoRedo(scene, editScene(scene))
+
+
+def test_snapshot_undo_redo_round_trip():
+    scene = Scene(headless=True)
+    scene.history.mode = HISTORY_MODE_SNAPSHOT
+    states = editScene(scene)
+    assert 'snapshot' in scene.history.history_stack[-1]
+    checkUndoRedo(scene, states)
+
+
+def test_restore_keeps_unchanged_nodes():
+    scene = Scene(headless=True)
+    scene.history.mode = HISTORY_MODE_SNAPSHOT
+    editScene(scene)
+    second = scene.getNodeById(scene.nodes[0].id)
+    scene.history.undo()
+    scene.history.undo()
+    # diff-applied, the node untouched by the stamps is the same object
+    assert any(node is second for node in scene.nodes)
+
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_undo_redo_drop_changes_not_stored(snapshot):
+    scene = Scene(headless=True)
+    if snapshot:
+        scene.history.mode = HISTORY_MODE_SNAPSHOT
+    states = editScene(scene)
+    Node(scene, "Unstored")
+    scene.history.undo()
+    assert sceneState(scene) == states[-2]
+
+    scene.nodes[0].setPos(500, 500)
+    scene.history.redo()
+    assert sceneState(scene) == states[-1]
+    scene.history.undo()
+    assert sceneState(scene) == states[-2]
@@ -0,0 +1,78 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeSceneHistory import HISTORY_UNPACKED_STAMPS
+
+NODE_COUNT = 200
+MOVE_COUNT = 30
+
+
+def storeMoves(scene):
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    nodes = [Node(scene, "Node %d" % ix) for ix in range(NODE_COUNT)]
+    history.storeHistory("Add nodes", setModified=True)
+    for ix in range(MOVE_COUNT):
+        for node in nodes:
+            node.setPos(ix, ix)
+        history.storeHistory("Move %d" % ix, setModified=True)
+        history.packer.wait()
+    history.manageMemory()
+
+
+def test_stamps_away_from_current_are_packed():
+    scene = Scene(headless=True)
+    storeMoves(scene)
+    stats = scene.history.getMemoryStats()
+    assert stats['stamps'] == MOVE_COUNT + 2
+    assert stats['unpacked'] <= HISTORY_UNPACKED_STAMPS + 1
+    assert stats['packed'] == stats['stamps']
+    assert stats['packed_bytes'] < stats['payload_bytes']
+
+
+def test_memory_budget_drops_oldest_stamps():
+    scene = Scene(headless=True)
+    history = scene.history
+    history.memory_budget = 192 * 1024
+    storeMoves(scene)
+    stats = history.getMemoryStats()
+    assert stats['memory_bytes'] <= history.memory_budget
+    assert stats['stamps'] < MOVE_COUNT + 2
+
+    # the stamps kept still undo
+    while history.canUndo():
+        history.undo()
+    assert len(scene.nodes) == NODE_COUNT
+    while history.canRedo():
+        history.redo()
+    assert {node.pos for node in scene.nodes} == {(MOVE_COUNT - 1, MOVE_COUNT - 1)}
+
+
+def test_spill_keeps_stamps_undoable():
+    scene = Scene(headless=True)
+    history = scene.history
+    history.memory_budget = 192 * 1024
+    history.spill_to_disk = True
+    storeMoves(scene)
+    stats = history.getMemoryStats()
+    assert stats['spilled'] > 0
+    assert stats['stamps'] == MOVE_COUNT + 2
+    assert stats['memory_bytes'] <= history.memory_budget
+
+    while history.canUndo():
+        history.undo()
+    assert scene.nodes == []
+    while history.canRedo():
+        history.redo()
+    assert {node.pos for node in scene.nodes} == {(MOVE_COUNT - 1, MOVE_COUNT - 1)}
+
+
+def test_spill_budget_drops_oldest_stamps():
+    scene = Scene(headless=True)
+    history = scene.history
+    history.memory_budget = 192 * 1024
+    history.spill_to_disk = True
+    history.spill_budget = 32 * 1024
+    storeMoves(scene)
+    stats = history.getMemoryStats()
+    assert stats['stamps'] < MOVE_COUNT + 2
+    assert stats['spilled_bytes'] <= history.spill_budget
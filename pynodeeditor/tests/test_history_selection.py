@@ -0,0 +1,48 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+
+
+def test_selection_only_stamps(qapp):
+    scene = Scene()
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    node = Node(scene, "Node")
+    history.storeHistory("Add node", setModified=True)
+
+    node.graphicsNode.setSelected(True)
+    history.storeSelection("Select")
+    stamp = history.history_stack[-1]
+    assert stamp.get('selection_only')
+    assert 'nodes' not in stamp and 'snapshot' not in stamp
+    assert stamp['selection']['nodes'] == [node.id]
+
+    history.undo()
+    assert not node.graphicsNode.isSelected()
+    assert scene.nodes == [node]
+    history.redo()
+    assert node.graphicsNode.isSelected()
+
+
+def test_selection_with_pending_changes_stores_them(qapp):
+    scene = Scene()
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    node = Node(scene, "Node")
+    node.graphicsNode.setSelected(True)
+    history.storeSelection("Select")
+    assert not history.history_stack[-1].get('selection_only')
+    history.undo()
+    assert scene.nodes == []
+
+
+def test_merged_selection_updates_the_current_stamp(qapp):
+    scene = Scene()
+    history = scene.history
+    history.merge_selection = True
+    history.storeInitialHistoryStamp()
+    node = Node(scene, "Node")
+    history.storeHistory("Add node", setModified=True)
+    node.graphicsNode.setSelected(True)
+    history.storeSelection("Select")
+    assert len(history.history_stack) == 2
+    assert history.history_stack[-1]['selection']['nodes'] == [node.id]
@@ -0,0 +1,56 @@
+import pytest
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def sceneState(scene):
+    data = scene.serialize()
+    return (sorted(data['nodes'], key=lambda item: item['id']),
+            sorted(data['edges'], key=lambda item: item['id']))
+
+
+def test_transaction_stores_one_stamp():
+    scene = Scene(headless=True)
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    with history.transaction("Build"):
+        first = Node(scene, "First", inputs=[1], outputs=[1])
+        history.storeHistory("Add first")
+        with history.transaction("Nested"):
+            second = Node(scene, "Second", inputs=[1], outputs=[1])
+            history.storeHistory("Add second")
+        Edge(scene, first.outputs[0], second.inputs[0])
+        history.storeHistory("Connect")
+    assert len(history.history_stack) == 2
+    assert history.history_stack[-1]['desc'] == "Build"
+
+    history.undo()
+    assert scene.nodes == [] and scene.edges == []
+    history.redo()
+    assert len(scene.nodes) == 2 and len(scene.edges) == 1
+
+
+def test_transaction_rolls_back_on_error():
+    scene = Scene(headless=True)
+    history = scene.history
+    history.storeInitialHistoryStamp()
+    node = Node(scene, "Node")
+    history.storeHistory("Add node", setModified=True)
+    # changed before the transaction, kept by the rollback
+    node.setPos(10, 20)
+    before = sceneState(scene)
+
+    with pytest.raises(RuntimeError):
+        with history.transaction("Failing"):
+            node.setPos(300, 300)
+            node.title = "Changed"
+            Node(scene, "Added")
+            raise RuntimeError("failed")
+    assert sceneState(scene) == before
+    assert len(history.history_stack) == 2
+
+    history.storeHistory("Move", setModified=True)
+    history.undo()
+    assert node.pos == (0.0, 0.0)
@@ -0,0 +1,106 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneJournal import SceneJournal, getJournalFilename
+
+
+def sceneState(scene):
+    data = scene.serialize()
+    return (sorted(data['nodes'], key=lambda item: item['id']),
+            sorted(data['edges'], key=lambda item: item['id']))
+
+
+def openScene(filename):
+    scene = Scene(headless=True)
+    scene.loadFromFile(filename)
+    scene.history.storeInitialHistoryStamp()
+    journal = SceneJournal(scene)
+    replayed = journal.open(filename)
+    return scene, journal, replayed
+
+
+def editAndCrash(filename):
+    """ Saves a scene, edits it with a journal and leaves the journal behind like a crash would """
+    scene = Scene(headless=True)
+    Node(scene, "Saved", inputs=[1], outputs=[1])
+    scene.saveToFile(filename)
+
+    scene, journal, replayed = openScene(filename)
+    assert replayed == 0
+    saved = scene.nodes[0]
+    added = Node(scene, "Added", inputs=[1], outputs=[1])
+    scene.history.storeHistory("Add node", setModified=True)
+    Edge(scene, saved.outputs[0], added.inputs[0])
+    saved.setPos(40, 50)
+    scene.history.storeHistory("Connect", setModified=True)
+    added.remove()
+    scene.history.storeHistory("Delete", setModified=True)
+    scene.history.undo()
+    journal.close()
+    return scene
+
+
+def test_journal_replays_edits(tmp_path):
+    filename = str(tmp_path / "scene.json")
+    edited = editAndCrash(filename)
+
+    scene, journal, replayed = openScene(filename)
+    assert replayed == 4
+    assert sceneState(scene) == sceneState(edited)
+    journal.close()
+
+
+def test_torn_record_is_dropped(tmp_path):
+    filename = str(tmp_path / "scene.json")
+    editAndCrash(filename)
+    journal_filename = getJournalFilename(filename)
+    with open(journal_filename, "r", encoding='utf-8') as file:
+        lines = file.readlines()
+    with open(journal_filename, "w", encoding='utf-8') as file:
+        file.writelines(lines[:2])
+        file.write(lines[2][:len(lines[2]) // 2])
+
+    scene, journal, replayed = openScene(filename)
+    assert replayed == 1
+    assert sorted(node.title for node in scene.nodes) == ["Added", "Saved"]
+    assert scene.edges == []
+    journal.close()
+
+
+def test_journal_of_another_file_is_ignored(tmp_path):
+    filename = str(tmp_path / "scene.json")
+    editAndCrash(filename)
+    scene = Scene(headless=True)
+    Node(scene, "Other")
+    scene.saveToFile(filename)
+
+    scene, journal, replayed = openScene(filename)
+    assert replayed == 0
+    assert [node.title for node in scene.nodes] == ["Other"]
+    journal.close()
+
+
+def test_rebase_keeps_edits_made_while_saving(tmp_path):
+    filename = str(tmp_path / "scene.json")
+    scene = Scene(headless=True)
+    scene.saveToFile(filename)
+    scene, journal, replayed = openScene(filename)
+
+    Node(scene, "Saved")
+    scene.history.storeHistory("Add saved", setModified=True)
+    journal.beginRebase()
+    data = scene.snapshot()
+    Node(scene, "Later")
+    scene.history.storeHistory("Add later", setModified=True)
+
+    saved = Scene(headless=True)
+    saved.deserialize(data)
+    saved.saveToFile(filename)
+    journal.endRebase(filename, True)
+    journal.close()
+
+    scene, journal, replayed = openScene(filename)
+    assert replayed == 1
+    assert sorted(node.title for node in scene.nodes) == ["Later", "Saved"]
+    journal.discard()
+    assert not (tmp_path / "scene.json.journal").exists()
@@ -0,0 +1,84 @@
+import sys
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeGraphicsView import QDMGraphicsView
+from nodeeditor.NodeSceneLoader import ProgressiveSceneLoader
+
+NODE_COUNT = 40
+NODE_SPACING = 1000
+# node the view is centered on
+TARGET = 12
+
+loader_module = sys.modules[ProgressiveSceneLoader.__module__]
+
+
+def writeRow(filename):
+    """ Nodes in a row, far enough apart for the view to hold a few of them """
+    scene = Scene(headless=True)
+    previous = None
+    for ix in range(NODE_COUNT):
+        node = Node(scene, "Node %d" % ix, inputs=[1], outputs=[1])
+        node.setPos(ix * NODE_SPACING, 0)
+        if previous is not None:
+            Edge(scene, previous.outputs[0], node.inputs[0])
+        previous = node
+    scene.saveToFile(filename, compact=True)
+    return scene
+
+
+def loadAll(qapp, loader, filename):
+    loader.load(filename)
+    while loader.isLoading():
+        qapp.processEvents()
+
+
+def test_nodes_in_view_are_built_first(qapp, monkeypatch, tmp_path):
+    # one node per slice
+    monkeypatch.setattr(loader_module, 'PROGRESSIVE_SLICE_TIME', 0)
+    filename = str(tmp_path / "row.json")
+    saved = writeRow(filename)
+
+    scene = Scene()
+    view = QDMGraphicsView(scene.graphicsScene)
+    view.resize(400, 300)
+    view.centerOn(TARGET * NODE_SPACING, 0)
+    loader = ProgressiveSceneLoader(scene, view)
+    progress = []
+    loader.progress.connect(lambda done, total: progress.append((done, total)))
+    loadAll(qapp, loader, filename)
+
+    built = [int(node.title.split()[1]) for node in scene.nodes]
+    assert abs(built[0] - TARGET) <= 1
+    # further and further away from the view
+    distances = [abs(ix - TARGET) for ix in built]
+    assert distances == sorted(distances)
+    assert progress == [(ix + 1, NODE_COUNT) for ix in range(NODE_COUNT)]
+
+    data = scene.serialize()
+    assert sorted(node['id'] for node in data['nodes']) == sorted(node.id for node in saved.nodes)
+    assert len(scene.edges) == NODE_COUNT - 1
+    assert scene.history.history_current_step == 0
+    assert not scene.isModified()
+
+
+def test_edges_to_nodes_deleted_while_loading_are_skipped(qapp, monkeypatch, tmp_path):
+    monkeypatch.setattr(loader_module, 'PROGRESSIVE_SLICE_TIME', 0)
+    filename = str(tmp_path / "row.json")
+    writeRow(filename)
+
+    scene = Scene(headless=True)
+    loader = ProgressiveSceneLoader(scene)
+    removed = []
+
+    def removeFirst(done, total):
+        if done == 1:
+            removed.append(scene.nodes[0].title)
+            scene.nodes[0].remove()
+    loader.progress.connect(removeFirst)
+    loadAll(qapp, loader, filename)
+
+    assert removed == ["Node 0"]
+    assert len(scene.nodes) == NODE_COUNT - 1
+    assert len(scene.edges) == NODE_COUNT - 2
@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from nodeeditor.NodeScene import Scene, InvalidFile
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneBinary import isSceneBinary, mapSceneBinary
+
+
+def buildScene(count=4):
+    scene = Scene(headless=True)
+    nodes = []
+    for ix in range(count):
+        node = Node(scene, "Node %d" % ix, inputs=[1, 2], outputs=[3])
+        node.setPos(ix * 200, ix * 50)
+        nodes.append(node)
+    for ix in range(1, count):
+        Edge(scene, nodes[ix - 1].outputs[0], nodes[ix].inputs[0])
+    return scene
+
+
+def sceneState(scene):
+    """ Serialized nodes/edges sorted by id, their order changes when items are built again """
+    data = scene.serialize()
+    return (sorted(data['nodes'], key=lambda node: node['id']),
+            sorted(data['edges'], key=lambda edge: edge['id']))
+
+
+def test_truncated_file_keeps_scene(tmp_path):
+    filename = str(tmp_path / "graph.json")
+    buildScene().saveToFile(filename)
+    with open(filename, "r", encoding='utf-8') as file:
+        text = file.read()
+    with open(filename, "w", encoding='utf-8') as file:
+        file.write(text[:len(text) * 2 // 3])
+
+    scene = Scene(headless=True)
+    Node(scene, "keep me", inputs=[1], outputs=[1])
+    before = sceneState(scene)
+
+    with pytest.raises(InvalidFile):
+        scene.loadFromFile(filename)
+    assert sceneState(scene) == before
+
+
+def test_invalid_item_keeps_scene():
+    scene = buildScene(2)
+    before = sceneState(scene)
+    data = buildScene(3).serialize()
+    del data['edges'][-1]['start']
+
+    with pytest.raises(KeyError):
+        scene.deserialize(data)
+    assert sceneState(scene) == before
+
+
+def test_failed_load_keeps_modified_flag(tmp_path):
+    filename = str(tmp_path / "broken.json")
+    with open(filename, "w", encoding='utf-8') as file:
+        file.write('{"id": 1, "nodes": [{"id": 2,')
+
+    scene = buildScene(2)
+    scene.has_been_modified = True
+    with pytest.raises(InvalidFile):
+        scene.loadFromFile(filename)
+    assert scene.isModified()
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_json_round_trip(tmp_path, compact):
+    filename = str(tmp_path / "graph.json")
+    scene = buildScene()
+    scene.nodes[0].title = 'Quoted "title"\nwith a newline'
+    scene.saveToFile(filename, compact=compact)
+    with open(filename, "r", encoding='utf-8') as file:
+        data = json.load(file)
+    assert data == json.loads(json.dumps(scene.serialize()))
+
+    loaded = Scene(headless=True)
+    loaded.loadFromFile(filename)
+    assert loaded.id == scene.id
+    assert sceneState(loaded) == sceneState(scene)
+    assert not loaded.has_been_modified
+
+
+def test_compact_json_is_smaller(tmp_path):
+    scene = buildScene(20)
+    scene.saveToFile(str(tmp_path / "indented.json"))
+    scene.saveToFile(str(tmp_path / "compact.json"), compact=True)
+    assert (tmp_path / "compact.json").stat().st_size < (tmp_path / "indented.json").stat().st_size
+
+
+def test_binary_round_trip(tmp_path):
+    filename = str(tmp_path / "graph.scene")
+    scene = buildScene()
+    scene.nodes[0].title = "Ünïcode title"
+    scene.saveToFile(filename, binary=True)
+    assert isSceneBinary(filename)
+
+    loaded = Scene(headless=True)
+    loaded.loadFromFile(filename)
+    assert loaded.id == scene.id
+    assert sceneState(loaded) == sceneState(scene)
+
+
+def test_binary_reads_positions_only(tmp_path):
+    filename = str(tmp_path / "graph.scene")
+    scene = buildScene()
+    scene.saveToFile(filename, binary=True)
+    with mapSceneBinary(filename) as reader:
+        pos_x, pos_y = reader.getNodePositions()
+        positions = list(zip(pos_x.tolist(), pos_y.tolist()))
+        pos_x.release()
+        pos_y.release()
+    assert positions == [(node.pos[0], node.pos[1]) for node in scene.nodes]
+
+
+def test_binary_is_smaller_than_json(tmp_path):
+    scene = buildScene(50)
+    scene.saveToFile(str(tmp_path / "graph.json"), compact=True)
+    scene.saveToFile(str(tmp_path / "graph.scene"), binary=True)
+    assert (tmp_path / "graph.scene").stat().st_size < (tmp_path / "graph.json").stat().st_size
+
+
+def test_binary_in_memory_round_trip():
+    scene = buildScene()
+    loaded = Scene(headless=True)
+    loaded.deserializeBinary(scene.serializeBinary())
+    assert sceneState(loaded) == sceneState(scene)
+
+
+@pytest.mark.parametrize('keep', [0.1, 0.5, 0.99])
+def test_truncated_binary_file_keeps_scene(tmp_path, keep):
+    filename = str(tmp_path / "graph.scene")
+    buildScene().saveToFile(filename, binary=True)
+    with open(filename, "rb") as file:
+        data = file.read()
+    with open(filename, "wb") as file:
+        file.write(data[:int(len(data) * keep)])
+
+    scene = buildScene(2)
+    before = sceneState(scene)
+    with pytest.raises(InvalidFile):
+        scene.loadFromFile(filename)
+    assert sceneState(scene) == before
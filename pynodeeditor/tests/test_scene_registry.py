@@ -0,0 +1,41 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def buildChain(scene, count):
+    nodes = [Node(scene, "Node %d" % ix, inputs=[1], outputs=[1]) for ix in range(count)]
+    for first, second in zip(nodes, nodes[1:]):
+        Edge(scene, first.outputs[0], second.inputs[0])
+    return nodes
+
+
+def test_nodes_property_is_a_copy():
+    scene = Scene(headless=True)
+    buildChain(scene, 3)
+    nodes = scene.nodes
+    nodes.pop()
+    assert len(scene.nodes) == 3
+
+
+def test_iter_nodes_is_live():
+    scene = Scene(headless=True)
+    view = scene.iterNodes()
+    edges = scene.iterEdges()
+    buildChain(scene, 3)
+    assert len(view) == 3
+    assert len(edges) == 2
+    assert list(view) == scene.nodes
+
+
+def test_clear_removes_everything():
+    scene = Scene(headless=True)
+    buildChain(scene, 4)
+    scene.clear()
+    assert scene.nodes == [] and scene.edges == []
+
+
+def test_evaluation_order_follows_edges():
+    scene = Scene(headless=True)
+    nodes = buildChain(scene, 5)
+    assert scene.evaluator.getOrder() == nodes
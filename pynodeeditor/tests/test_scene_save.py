@@ -0,0 +1,74 @@
+import json
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneSaver import BackgroundSceneSaver
+
+
+def buildScene(headless=True):
+    scene = Scene(headless=headless)
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    Edge(scene, first.outputs[0], second.inputs[0])
+    scene.history.storeInitialHistoryStamp()
+    return scene
+
+
+def test_snapshot_matches_serialize():
+    scene = buildScene()
+    scene.nodes[0].setPos(100, 20)
+    scene.nodes[1].title = "Renamed"
+    assert scene.snapshot() == scene.serialize()
+
+    scene.history.storeHistory("edit")
+    scene.nodes[0].remove()
+    assert scene.snapshot() == scene.serialize()
+
+
+def test_snapshot_takes_content_being_edited(qapp):
+    scene = buildScene(headless=False)
+    node = scene.nodes[0]
+    # typed into the focused text edit, editing is not over yet
+    node.content.wdg_text.setPlainText("typed")
+
+    data = scene.snapshot()
+    assert data['nodes'][0]['content']['text'] == "typed"
+
+
+def test_background_save(qapp, tmp_path):
+    filename = str(tmp_path / "graph.json")
+    scene = buildScene(headless=False)
+    scene.nodes[1].content.wdg_text.setPlainText("typed")
+    scene.has_been_modified = True
+
+    saved = []
+    saver = BackgroundSceneSaver(scene)
+    saver.saved.connect(saved.append)
+    saver.save(filename)
+    assert not scene.isModified()
+    saver.wait()
+
+    assert saved == [filename]
+    with open(filename, "r", encoding='utf-8') as file:
+        data = json.load(file)
+    assert data['nodes'][1]['content']['text'] == "typed"
+
+    loaded = Scene(headless=True)
+    loaded.loadFromFile(filename)
+    assert loaded.serialize() == scene.serialize()
+
+
+def test_failed_background_save_keeps_modified(qapp, tmp_path):
+    scene = buildScene()
+    scene.has_been_modified = True
+
+    failed = []
+    saver = BackgroundSceneSaver(scene)
+    saver.failed.connect(lambda filename, message: failed.append(filename))
+    filename = str(tmp_path / "missing" / "graph.json")
+    saver.save(filename)
+    saver.wait()
+
+    assert failed == [filename]
+    assert scene.isModified()
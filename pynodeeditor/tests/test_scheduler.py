@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+from PySide2.QtCore import QCoreApplication, QEventLoop
+
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+from nodeeditor.NodeSceneScheduler import ParallelSceneEvaluator
+
+BRANCH_COUNT = 4
+NODE_WAIT = 0.05
+
+
+class WaitNode(Node):
+    """ Sleeps, releasing the GIL, and keeps how many nodes were computing at the same time """
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+
+    def __init__(self, scene, value=1):
+        super().__init__(scene, "Wait", inputs=[1], outputs=[1])
+        self.value = value
+
+    def compute(self, inputs):
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.most_running = max(cls.most_running, cls.running)
+        time.sleep(NODE_WAIT)
+        with cls.lock:
+            cls.running -= 1
+        if self.value is None:
+            raise ValueError("no value")
+        return (inputs[0] or 0) + self.value
+
+
+def buildBranches(scene):
+    """ A source with BRANCH_COUNT branches of two nodes each, returns the source and the branch ends """
+    source = WaitNode(scene)
+    ends = []
+    for ix in range(BRANCH_COUNT):
+        first, second = WaitNode(scene), WaitNode(scene)
+        Edge(scene, source.outputs[0], first.inputs[0])
+        Edge(scene, first.outputs[0], second.inputs[0])
+        ends.append(second)
+    return source, ends
+
+
+def waitIdle(scheduler, timeout=5.0):
+    """ Runs the event loop until the scheduler is done, results come back through queued signals """
+    deadline = time.monotonic() + timeout
+    while scheduler.isRunning() and time.monotonic() < deadline:
+        QCoreApplication.processEvents(QEventLoop.AllEvents, 10)
+        time.sleep(0.001)
+    assert not scheduler.isRunning()
+
+
+def runPass(scheduler):
+    scheduler.evaluate()
+    waitIdle(scheduler)
+
+
+@pytest.fixture
+def scheduler(qapp):
+    WaitNode.most_running = 0
+    scene = Scene(headless=True)
+    scheduler = ParallelSceneEvaluator(scene, max_workers=BRANCH_COUNT)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_branches_run_in_parallel(scheduler):
+    source, ends = buildBranches(scheduler.scene)
+    progress = []
+    scheduler.progress.connect(lambda done, total: progress.append((done, total)))
+    start = time.perf_counter()
+    runPass(scheduler)
+    elapsed = time.perf_counter() - start
+
+    assert [end.getOutputValue() for end in ends] == [3] * BRANCH_COUNT
+    assert WaitNode.most_running > 1
+    # one node after the other would take a wait per node
+    assert elapsed < NODE_WAIT * (1 + 2 * BRANCH_COUNT)
+    assert progress[0] == (0, 1 + 2 * BRANCH_COUNT)
+    assert progress[-1] == (1 + 2 * BRANCH_COUNT, 1 + 2 * BRANCH_COUNT)
+    assert not scheduler.evaluator.isDirty()
+
+
+def test_errors_are_passed_downstream(scheduler):
+    source, ends = buildBranches(scheduler.scene)
+    source.value = None
+    runPass(scheduler)
+    evaluator = scheduler.evaluator
+    assert isinstance(evaluator.getError(source), ValueError)
+    for end in ends:
+        assert evaluator.getError(end) is evaluator.getError(source)
+
+
+def test_nodes_dirty_while_running_are_computed_after(scheduler):
+    source, ends = buildBranches(scheduler.scene)
+    evaluated = []
+    scheduler.evaluator.addEvaluatedListener(evaluated.append)
+
+    scheduler.evaluate()
+    ends[0].value = 10
+    ends[0].markDirty()
+    scheduler.evaluate()
+    waitIdle(scheduler)
+
+    assert not scheduler.evaluator.isDirty()
+    assert ends[0].getOutputValue() == 12
+    assert len(evaluated) == 2 and evaluated[1] == [ends[0]]
+
+
+def test_shutdown_keeps_unfinished_nodes_dirty(scheduler):
+    source, ends = buildBranches(scheduler.scene)
+    scheduler.evaluate()
+    scheduler.shutdown()
+    assert not scheduler.isRunning()
+    # the source was being computed, the branches were not started
+    for end in ends:
+        assert scheduler.evaluator.isDirty(end)
@@ -0,0 +1,34 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def test_scene_positions_follow_the_node(qapp):
+    scene = Scene()
+    node = Node(scene, "Node", inputs=[1, 2], outputs=[1])
+    local = [socket.getLocalPosition() for socket in node.inputs + node.outputs]
+    node.setPos(120, 80)
+    assert [socket.getScenePosition() for socket in node.inputs + node.outputs] == \
+        [(x + 120, y + 80) for x, y in local]
+    # the offsets are cached, moving the node does not change them
+    assert [socket.getLocalPosition() for socket in node.inputs + node.outputs] == local
+
+
+def test_resize_invalidates_the_offsets(qapp):
+    scene = Scene()
+    node = Node(scene, "Node", inputs=[1], outputs=[1])
+    before = node.outputs[0].getLocalPosition()
+    node.graphicsNode.setSize(260, 240)
+    after = node.outputs[0].getLocalPosition()
+    assert after == (260, before[1])
+    assert (node.outputs[0].graphicsSocket.pos().x(), node.outputs[0].graphicsSocket.pos().y()) == after
+
+
+def test_edges_follow_a_moved_node(qapp):
+    scene = Scene()
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    edge = Edge(scene, first.outputs[0], second.inputs[0])
+    second.setPos(400, 100)
+    second.updateConnectedEdges()
+    assert tuple(edge.graphicsEdge.posDestination) == second.inputs[0].getScenePosition()
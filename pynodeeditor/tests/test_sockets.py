@@ -0,0 +1,58 @@
+from nodeeditor.NodeScene import Scene
+from nodeeditor.NodeNode import Node
+from nodeeditor.NodeEdge import Edge
+
+
+def buildPair():
+    scene = Scene(headless=True)
+    first = Node(scene, "First", inputs=[1], outputs=[1])
+    second = Node(scene, "Second", inputs=[1], outputs=[1])
+    return scene, first, second
+
+
+def test_connect_links_sockets_and_nodes():
+    scene, first, second = buildPair()
+    output, input = first.outputs[0], second.inputs[0]
+    edge = Edge(scene, output, input)
+
+    assert output.hasEdge(edge) and input.hasEdge(edge)
+    assert output.getPeers() == [input] and input.getPeers() == [output]
+    assert output.getEdgeTo(input) is edge
+    assert first.getConnectedEdges() == [edge] == second.getConnectedEdges()
+    assert second.getUpstreamEdges() == [edge]
+    assert first.getDownstreamEdges() == [edge]
+
+
+def test_remove_unlinks_everything():
+    scene, first, second = buildPair()
+    output, input = first.outputs[0], second.inputs[0]
+    edge = Edge(scene, output, input)
+    edge.remove()
+
+    assert not output.hasEdges() and not input.hasEdges()
+    assert output.getPeers() == [] and input.getPeers() == []
+    assert output.getEdgeTo(input) is None
+    assert first.getConnectedEdges() == [] and second.getConnectedEdges() == []
+
+
+def test_removing_a_node_removes_its_edges():
+    scene, first, second = buildPair()
+    third = Node(scene, "Third", inputs=[1], outputs=[1])
+    Edge(scene, first.outputs[0], second.inputs[0])
+    kept = Edge(scene, first.outputs[0], third.inputs[0])
+    second.remove()
+
+    assert scene.edges == [kept]
+    assert first.outputs[0].getPeers() == [third.inputs[0]]
+
+
+def test_parallel_edges_keep_the_peer():
+    scene, first, second = buildPair()
+    second.inputs[0].is_multi_edges = True
+    output, input = first.outputs[0], second.inputs[0]
+    one = Edge(scene, output, input)
+    two = Edge(scene, output, input)
+    one.remove()
+    assert output.getPeers() == [input]
+    assert output.getEdgeTo(input) is two
+